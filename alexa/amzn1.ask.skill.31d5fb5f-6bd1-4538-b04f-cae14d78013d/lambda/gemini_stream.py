@@ -0,0 +1,106 @@
+import json
+import re
+import socket
+import time
+from datetime import datetime
+
+# A sentence ends at ., ! or ? followed by whitespace or the end of the text.
+SENTENCE_END = re.compile(r"[.!?](?=\s|$)")
+
+
+class StreamResult:
+    def __init__(self, text, complete, first_chunk_sec, elapsed_sec):
+        self.text = text
+        self.complete = complete                # False when the deadline cut the stream short
+        self.first_chunk_sec = first_chunk_sec  # None if no text arrived at all
+        self.elapsed_sec = elapsed_sec
+
+
+def chunk_text(payload):
+    """Concatenate the text parts of one streamed Gemini chunk."""
+    text = []
+    for candidate in payload.get("candidates", [])[:1]:
+        for part in candidate.get("content", {}).get("parts", []):
+            text.append(part.get("text", ""))
+    return "".join(text)
+
+
+def complete_sentences(text):
+    """The prefix of `text` up to and including its last finished sentence."""
+    last = None
+    for match in SENTENCE_END.finditer(text):
+        last = match
+    return text[:last.end()].strip() if last else ""
+
+
+def stream_generate(pool, url, body, deadline):
+    """POST to streamGenerateContent (alt=sse) and collect text until done or `deadline`.
+
+    `deadline` is a time.monotonic() value. Reads use the remaining budget as
+    the socket timeout, so the call returns at the deadline with whatever text
+    has arrived; a cut-short connection is closed rather than pooled.
+    """
+    start = time.monotonic()
+    first_chunk_sec = None
+    parts = []
+    conn, response = pool.open(
+        "POST", url, body=body, headers={"Content-Type": "application/json"},
+        timeout=max(deadline - start, 0.05),
+    )
+    try:
+        if response.status >= 400:
+            raise RuntimeError(f"Gemini returned HTTP {response.status}: {response.read(200)!r}")
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise socket.timeout("summary deadline reached")
+            if conn.sock is not None:
+                conn.sock.settimeout(remaining)
+            line = response.readline()
+            if not line:
+                break
+            line = line.strip()
+            if not line.startswith(b"data:"):
+                continue
+            text = chunk_text(json.loads(line[5:]))
+            if text:
+                if first_chunk_sec is None:
+                    first_chunk_sec = time.monotonic() - start
+                parts.append(text)
+    except (socket.timeout, TimeoutError):
+        conn.close()
+        return StreamResult("".join(parts), False, first_chunk_sec, time.monotonic() - start)
+    except Exception:
+        conn.close()
+        raise
+    pool.release(url, conn, response)
+    return StreamResult("".join(parts).strip(), True, first_chunk_sec, time.monotonic() - start)
+
+
+def _spoken_time(start):
+    try:
+        parsed = datetime.fromisoformat(start)
+    except ValueError:
+        return None
+    if len(start) <= 10:
+        return "all day"
+    return parsed.strftime("%I:%M %p").lstrip("0")
+
+
+def local_calendar_summary(cal_events, limit=4):
+    """Fast summary without the LLM, from the "start: summary" strings the Pi sends."""
+    if not cal_events:
+        return "You have nothing on your calendar today."
+    items = []
+    for event in cal_events[:limit]:
+        start, sep, title = str(event).partition(": ")
+        if not sep:
+            items.append(start)
+            continue
+        when = _spoken_time(start)
+        items.append(f"{title} {when}" if when == "all day" else f"{title} at {when}" if when else title)
+    count = len(cal_events)
+    summary = f"You have {count} event{'s' if count != 1 else ''} today: " + "; ".join(items)
+    if count > limit:
+        summary += f"; and {count - limit} more"
+    return summary + "."
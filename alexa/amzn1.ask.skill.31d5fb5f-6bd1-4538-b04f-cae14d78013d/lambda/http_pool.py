@@ -0,0 +1,117 @@
+import http.client
+import json
+import threading
+import urllib.parse
+
+# Errors that mean a pooled keep-alive connection went stale between invocations.
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.CannotSendRequest,
+    http.client.BadStatusLine,
+    BrokenPipeError,
+    ConnectionResetError,
+    ConnectionAbortedError,
+)
+
+
+class HTTPResponse:
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body.decode("utf-8"))
+
+    def header(self, name, default=None):
+        """Case-insensitive header lookup."""
+        name = name.lower()
+        return next((value for key, value in self.headers.items() if key.lower() == name), default)
+
+
+class ConnectionPool:
+    """Keep-alive http.client connections per (scheme, host, port).
+
+    Created at module level so warm Lambda invocations reuse open TCP/TLS
+    connections instead of paying a new handshake per request. Thread-safe:
+    each request checks a connection out and returns it when done.
+    """
+
+    def __init__(self, max_idle_per_host=4):
+        self.max_idle_per_host = max_idle_per_host
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _checkout(self, key, timeout):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                conn = idle.pop()
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                return conn, True
+        return self._connect(key, timeout), False
+
+    @staticmethod
+    def _connect(key, timeout):
+        scheme, host, port = key
+        conn_cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return conn_cls(host, port, timeout=timeout)
+
+    def _checkin(self, key, conn):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def open(self, method, url, body=None, headers=None, timeout=5):
+        """Send a request and return (conn, response) for callers that stream the body.
+
+        Call release(url, conn, response) once the body has been consumed.
+        """
+        parsed = urllib.parse.urlsplit(url)
+        key = (parsed.scheme, parsed.hostname, parsed.port)
+        path = parsed.path or "/"
+        if parsed.query:
+            path = f"{path}?{parsed.query}"
+
+        conn, reused = self._checkout(key, timeout)
+        try:
+            conn.request(method, path, body=body, headers=headers or {})
+            return conn, conn.getresponse()
+        except STALE_CONNECTION_ERRORS:
+            conn.close()
+            if not reused:
+                raise
+        except Exception:
+            conn.close()
+            raise
+        # The server closed an idle connection; retry once on a fresh one.
+        conn = self._connect(key, timeout)
+        try:
+            conn.request(method, path, body=body, headers=headers or {})
+            return conn, conn.getresponse()
+        except Exception:
+            conn.close()
+            raise
+
+    def release(self, url, conn, response):
+        parsed = urllib.parse.urlsplit(url)
+        if response.will_close or not response.isclosed():
+            conn.close()
+            return
+        self._checkin((parsed.scheme, parsed.hostname, parsed.port), conn)
+
+    def request(self, method, url, body=None, headers=None, timeout=5):
+        """Perform a request and read the whole body; returns an HTTPResponse."""
+        conn, response = self.open(method, url, body=body, headers=headers, timeout=timeout)
+        try:
+            payload = response.read()
+        except Exception:
+            conn.close()
+            raise
+        self.release(url, conn, response)
+        return HTTPResponse(response.status, dict(response.getheaders()), payload)
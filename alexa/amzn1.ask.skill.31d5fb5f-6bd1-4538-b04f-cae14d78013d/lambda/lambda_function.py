@@ -1,9 +1,12 @@
 import json
 import logging
+import os
+import threading
 import urllib.request
 import urllib.error
 import urllib.parse
 import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 
 from ask_sdk_core.skill_builder import SkillBuilder
 from ask_sdk_core.utils import is_request_type, is_intent_name
@@ -11,89 +14,195 @@ from ask_sdk_core.handler_input import HandlerInput
 from ask_sdk_model import Response
 from datetime import datetime, timedelta
 from key import GEMINI_API_KEY
+from gemini_stream import complete_sentences, local_calendar_summary, stream_generate
+from http_pool import ConnectionPool
+from summary_cache import (
+    SummaryCache,
+    build_calendar_prompt,
+    default_store,
+    gemini_request_body,
+    summary_key,
+)
 
 sb = SkillBuilder()
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 GEMINI_MODEL = "gemini-2.5-flash"
-GEMINI_URL = (
-    f"https://generativelanguage.googleapis.com/v1beta/models/"
-    f"{GEMINI_MODEL}:generateContent?key={GEMINI_API_KEY}"
+# Overridable so the streaming path can be exercised against a local stub server.
+GEMINI_BASE_URL = os.environ.get("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com")
+GEMINI_STREAM_URL = (
+    f"{GEMINI_BASE_URL}/v1beta/models/"
+    f"{GEMINI_MODEL}:streamGenerateContent?alt=sse&key={GEMINI_API_KEY}"
 )
+# Budget for the summary when the user is waiting; Alexa gives up at ~8 s.
+SUMMARY_DEADLINE_SEC = float(os.environ.get("SUMMARY_DEADLINE_SEC", "4.5"))
+# Budget for the prefetch started at launch, while the user is still answering.
+PREFETCH_DEADLINE_SEC = float(os.environ.get("PREFETCH_DEADLINE_SEC", "15"))
 
 DOOR_API_BASE_URL = "https://deliberative-michell-nonloyal.ngrok-free.dev"
+DOOR_DATA_TTL_SEC = 10          # How long a door reading is reused across handlers
+DOOR_FETCH_WAIT_SEC = 6         # Max wait on a door fetch (its HTTP timeout is 5 s)
+SUMMARY_WAIT_SEC = 4.5          # Max wait on a prefetched summary (Alexa allows ~8 s)
+PREFETCH_MAX_AGE_SEC = 300      # Forget prefetched summaries nobody asked for
+CALENDAR_UNAVAILABLE = "Sorry, I couldn't get your calendar right now."
+
+# Module-level state is kept across warm invocations of the same container.
+http_pool = ConnectionPool()
+EXECUTOR_THREAD_PREFIX = "skill-worker"
+executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix=EXECUTOR_THREAD_PREFIX)
+_door_lock = threading.Lock()
+_door_cache = {}         # user_id -> (fetched_at, data, etag)
+_door_inflight = {}      # user_id -> Future of a fetch in progress
+_summary_prefetch = {}   # session_id -> (started_at, Future)
+summary_cache = SummaryCache(store=default_store())
 
-def fetch_door_data(user_id: str = "subhon") -> dict:
-    """Call your Flask /weather endpoint and return the JSON as a dict."""
+
+def _fetch_door_data_uncached(user_id, previous=None):
+    """GET /weather; `previous` is an earlier (data, etag) to revalidate with If-None-Match."""
     query = urllib.parse.urlencode({"userId": user_id})
     url = f"{DOOR_API_BASE_URL}/weather?{query}"
 
     logger.info(f"Fetching door data from: {url}")
 
-    with urllib.request.urlopen(url, timeout=5) as resp:
-        body = resp.read().decode("utf-8")
-        data = json.loads(body)
+    headers = {"If-None-Match": previous[1]} if previous and previous[1] else None
+    resp = http_pool.request("GET", url, headers=headers, timeout=5)
+    if resp.status == 304 and previous:
+        logger.info("Door data unchanged (304)")
+        return previous
+    if resp.status >= 400:
+        raise urllib.error.HTTPError(url, resp.status, "Door API error", resp.headers, None)
+    data = resp.json()
 
     logger.info(f"Door API response: {data}")
-    return data
+    return data, resp.header("ETag")
+
+
+def fetch_door_data(user_id: str = "subhon", max_age: float = DOOR_DATA_TTL_SEC) -> dict:
+    """Call your Flask /weather endpoint and return the JSON as a dict.
+
+    A result younger than `max_age` seconds is reused, and concurrent callers
+    share a single in-flight request. Raises FutureTimeoutError after DOOR_FETCH_WAIT_SEC.
+    """
+    now = time.monotonic()
+    with _door_lock:
+        cached = _door_cache.get(user_id)
+        if cached and now - cached[0] < max_age:
+            return cached[1]
+        future = _door_inflight.get(user_id)
+        owner = future is None
+        if owner:
+            previous = cached[1:] if cached else None
+            # Already on the executor (e.g. the summary prefetch): fetch on this thread rather
+            # than queue behind ourselves and block a worker of the same pool on it.
+            inline = threading.current_thread().name.startswith(EXECUTOR_THREAD_PREFIX)
+            future = Future() if inline else executor.submit(_fetch_door_data_uncached, user_id, previous)
+            _door_inflight[user_id] = future
+    if owner:
+        # Registered outside the lock: an already-finished future runs the callback right here.
+        future.add_done_callback(lambda f, started=now: _store_door_data(user_id, started, f))
+        if inline:
+            try:
+                future.set_result(_fetch_door_data_uncached(user_id, previous))
+            except Exception as exc:
+                future.set_exception(exc)
+    return future.result(timeout=DOOR_FETCH_WAIT_SEC)[0]
+
+
+def cached_door_data(user_id: str = "subhon"):
+    """The last door data fetched for `user_id`, at any age, or None; never touches the network."""
+    with _door_lock:
+        cached = _door_cache.get(user_id)
+    return cached[1] if cached else None
+
+
+def _store_door_data(user_id, started, future):
+    with _door_lock:
+        _door_inflight.pop(user_id, None)
+        if future.exception() is None:
+            _door_cache[user_id] = (started,) + future.result()
+
+
+def start_summary_prefetch(session_id):
+    """Kick off the calendar summary in the background so "yes" can be answered at once."""
+    now = time.monotonic()
+    with _door_lock:
+        for stale_id in [sid for sid, (started, _) in _summary_prefetch.items()
+                         if now - started > PREFETCH_MAX_AGE_SEC]:
+            del _summary_prefetch[stale_id]
+        if session_id not in _summary_prefetch:
+            _summary_prefetch[session_id] = (
+                now, executor.submit(summarize_calendar_with_gemini, PREFETCH_DEADLINE_SEC)
+            )
+
+
+def take_prefetched_summary(session_id):
+    """Return the prefetched summary for this session, or None if there is none.
+
+    Raises FutureTimeoutError if it is not ready within SUMMARY_WAIT_SEC.
+    """
+    with _door_lock:
+        entry = _summary_prefetch.pop(session_id, None)
+    if entry is None:
+        return None
+    return entry[1].result(timeout=SUMMARY_WAIT_SEC)
 
 # ---------------------------------------------------------
 # Gemini: Summarize Calendar
 # ---------------------------------------------------------
-def summarize_calendar_with_gemini():
+def summarize_calendar_with_gemini(deadline_sec: float = SUMMARY_DEADLINE_SEC):
+    """Summarize today's calendar within `deadline_sec`.
+
+    Streams the Gemini response; if the deadline hits first, speaks the
+    complete sentences received so far, or a local summary if there are none.
+    """
     if not GEMINI_API_KEY:
         logger.error("Gemini API key missing.")
         return "Your schedule summary is unavailable because the API key is missing."
-        
+
+    deadline = time.monotonic() + deadline_sec
     data = fetch_door_data()
     calEvents = data.get("calendarEvents")
 
-    prompt = (
-        "You are an assistant that summarizes schedules"
-        "Given the following day calendar, create a clear, friendly spoken summary, no greeting is needed for the user "
-        "of the main events, commitments, and patterns. Keep it short and natural.\n\n"
-        f"{calEvents}"
-    )
+    prompt = build_calendar_prompt(calEvents)
+    cache_key = summary_key(GEMINI_MODEL, prompt)
+    cached = summary_cache.get(cache_key)
+    if cached is not None:
+        logger.info("Calendar summary cache hit %s", cache_key[:12])
+        return cached
 
-    body = {
-        "contents": [
-            {
-                "role": "user",
-                "parts": [
-                    {"text": prompt}
-                ]
-            }
-        ],
-    }
-
-    data = json.dumps(body).encode("utf-8")
-    request = urllib.request.Request(
-        GEMINI_URL,
-        data=data,
-        headers={"Content-Type": "application/json"}
-    )
+    body = json.dumps(gemini_request_body(prompt)).encode("utf-8")
 
     try:
-        with urllib.request.urlopen(request, timeout=10) as response:
-            payload = json.loads(response.read().decode("utf-8"))
+        result = stream_generate(http_pool, GEMINI_STREAM_URL, body, deadline)
+    except Exception as e:
+        logger.exception("Gemini request failed: %s", e)
+        return local_calendar_summary(calEvents)
+
+    logger.info(
+        "Gemini stream: first text %s ms, total %.0f ms, complete=%s",
+        f"{result.first_chunk_sec * 1000:.0f}" if result.first_chunk_sec is not None else "-",
+        result.elapsed_sec * 1000,
+        result.complete,
+    )
 
-        logger.info("Gemini payload: %s", payload)
+    if result.complete and result.text:
+        summary_cache.put(cache_key, result.text)
+        return result.text
 
-        # Extract response text
-        candidates = payload.get("candidates", [])
-        if candidates:
-            content = candidates[0].get("content", {})
-            parts = content.get("parts", [])
-            if parts and "text" in parts[0]:
-                return parts[0]["text"].strip()
+    partial = complete_sentences(result.text)
+    if partial:
+        return partial
+    return local_calendar_summary(calEvents)
 
-        return "I couldn't summarize your schedule."
 
-    except Exception as e:
-        logger.exception("Gemini request failed: %s", e)
-        return "I couldn't retrieve your schedule summary due to an error."
-        
+def cached_calendar_summary():
+    """Local summary of the last fetched calendar, with no network call."""
+    data = cached_door_data()
+    if data is None:
+        return CALENDAR_UNAVAILABLE
+    return local_calendar_summary(data.get("calendarEvents"))
+
 
 # ---------------------------------------------------------
 # Alexa Handlers
@@ -104,7 +213,9 @@ def launch_request_handler(handler_input: HandlerInput):
         "Welcome, You can say  'summarize my calendar' "
         "or 'check door monitor'. What would you like to do?"
     )
-    
+
+    # Start the summary now (it shares the door fetch below) so "yes" is answered from it.
+    start_summary_prefetch(handler_input.request_envelope.session.session_id)
     data = fetch_door_data()
 
     door = data.get("doorStatus")
@@ -130,7 +241,21 @@ def launch_request_handler(handler_input: HandlerInput):
     
 @sb.request_handler(can_handle_func=is_intent_name("GetCalendarSummaryIntent"))
 def get_calendar_summary_handler(handler_input: HandlerInput):
-    summary = summarize_calendar_with_gemini()
+    session_id = handler_input.request_envelope.session.session_id
+    try:
+        summary = take_prefetched_summary(session_id)
+    except FutureTimeoutError:
+        # Out of time for this turn: answer from the calendar the launch already fetched.
+        summary = cached_calendar_summary()
+    except Exception as exc:
+        logger.exception("Summary prefetch failed: %s", exc)
+        summary = cached_calendar_summary()
+    if summary is None:
+        try:
+            summary = summarize_calendar_with_gemini()
+        except Exception as exc:
+            logger.exception("Calendar summary failed: %s", exc)
+            summary = CALENDAR_UNAVAILABLE
     return (
         handler_input.response_builder
         .speak(summary)
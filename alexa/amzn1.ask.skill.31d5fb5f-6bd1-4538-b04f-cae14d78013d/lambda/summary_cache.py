@@ -0,0 +1,166 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_TTL_SEC = int(os.environ.get("SUMMARY_TTL_SEC", "3600"))
+SUMMARY_CACHE_PREFIX = "calendar-summaries/"
+
+
+def build_calendar_prompt(cal_events):
+    """The Gemini prompt for a day's calendar; shared with the server-side precompute."""
+    return (
+        "You are an assistant that summarizes schedules"
+        "Given the following day calendar, create a clear, friendly spoken summary, no greeting is needed for the user "
+        "of the main events, commitments, and patterns. Keep it short and natural.\n\n"
+        f"{cal_events}"
+    )
+
+
+def gemini_request_body(prompt):
+    return {
+        "contents": [
+            {
+                "role": "user",
+                "parts": [
+                    {"text": prompt}
+                ]
+            }
+        ],
+    }
+
+
+def extract_summary_text(payload):
+    """Pull the first candidate's text out of a Gemini response, or None."""
+    candidates = payload.get("candidates", [])
+    if candidates:
+        content = candidates[0].get("content", {})
+        parts = content.get("parts", [])
+        if parts and "text" in parts[0]:
+            return parts[0]["text"].strip()
+    return None
+
+
+def summary_key(model, prompt):
+    """Content address of a summary: the model plus the exact prompt (which embeds the events)."""
+    digest = hashlib.sha256(json.dumps([model, prompt], ensure_ascii=False).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class FileSummaryStore:
+    """One JSON file per key in a local directory (tests, or the server precompute)."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                record = json.load(f)
+            return record["createdAt"], record["summary"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, key, summary, created_at):
+        tmp_path = f"{self._path(key)}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"createdAt": created_at, "summary": summary}, f)
+        os.replace(tmp_path, self._path(key))
+
+
+class S3SummaryStore:
+    """Summaries under SUMMARY_CACHE_PREFIX in the skill's S3 persistence bucket."""
+
+    def get(self, key):
+        from utils import s3_get_text
+
+        body = s3_get_text(SUMMARY_CACHE_PREFIX + key)
+        if body is None:
+            return None
+        try:
+            record = json.loads(body)
+            return record["createdAt"], record["summary"]
+        except (ValueError, KeyError):
+            return None
+
+    def put(self, key, summary, created_at):
+        from utils import s3_put_text
+
+        s3_put_text(SUMMARY_CACHE_PREFIX + key, json.dumps({"createdAt": created_at, "summary": summary}))
+
+
+class SummaryCache:
+    """In-memory LRU of summaries in front of an optional persistent store.
+
+    Entries older than `ttl_sec` are ignored everywhere, so a summary written
+    for one day's calendar does not outlive the window it describes.
+    """
+
+    def __init__(self, store=None, max_entries=64, ttl_sec=SUMMARY_TTL_SEC):
+        self.store = store
+        self.max_entries = max_entries
+        self.ttl_sec = ttl_sec
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (created_at, summary)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] < self.ttl_sec:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self._entries.pop(key, None)
+
+        entry = None
+        if self.store is not None:
+            try:
+                entry = self.store.get(key)
+            except Exception as e:
+                logger.warning("Summary store read failed: %s", e)
+        if entry is None or now - entry[0] >= self.ttl_sec:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+            self._remember(key, entry)
+        return entry[1]
+
+    def put(self, key, summary):
+        entry = (time.time(), summary)
+        with self._lock:
+            self._remember(key, entry)
+        if self.store is not None:
+            try:
+                self.store.put(key, summary, entry[0])
+            except Exception as e:
+                logger.warning("Summary store write failed: %s", e)
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+def default_store():
+    """SUMMARY_CACHE_DIR selects a local directory, else the S3 persistence bucket if configured."""
+    directory = os.environ.get("SUMMARY_CACHE_DIR")
+    if directory:
+        return FileSummaryStore(directory)
+    if os.environ.get("S3_PERSISTENCE_BUCKET"):
+        return S3SummaryStore()
+    return None
@@ -24,4 +24,40 @@ def create_presigned_url(object_name):
         return None
 
     # The response contains the presigned URL
-    return response
\ No newline at end of file
+    return response
+
+def _s3_client():
+    return boto3.client('s3',
+                        region_name=os.environ.get('S3_PERSISTENCE_REGION'),
+                        config=boto3.session.Config(signature_version='s3v4',s3={'addressing_style': 'path'}))
+
+
+def s3_get_text(object_name):
+    """Read an S3 object from the persistence bucket as text
+
+    :param object_name: string
+    :return: Object body as string. If missing or error, returns None.
+    """
+    try:
+        response = _s3_client().get_object(Bucket=os.environ.get('S3_PERSISTENCE_BUCKET'), Key=object_name)
+        return response['Body'].read().decode('utf-8')
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') not in ('NoSuchKey', '404'):
+            logging.error(e)
+        return None
+
+
+def s3_put_text(object_name, body):
+    """Write text to an S3 object in the persistence bucket
+
+    :param object_name: string
+    :param body: string
+    :return: True if the object was written, else False.
+    """
+    try:
+        _s3_client().put_object(Bucket=os.environ.get('S3_PERSISTENCE_BUCKET'), Key=object_name,
+                                Body=body.encode('utf-8'), ContentType='application/json')
+    except ClientError as e:
+        logging.error(e)
+        return False
+    return True
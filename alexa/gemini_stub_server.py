@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Gemini generateContent / streamGenerateContent API.
+
+Streams a canned summary as SSE chunks with configurable delays so the
+lambda's deadline and fallback behaviour can be exercised without the real
+API. Point the skill at it with GEMINI_BASE_URL=http://127.0.0.1:<port>.
+
+    python3 gemini_stub_server.py --port 8090 --first-delay 1.0 --chunk-delay 0.5
+    python3 gemini_stub_server.py --measure   # time-to-first-speech at several deadlines
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+DEFAULT_TEXT = (
+    "You start the day with a team standup at nine. "
+    "Lunch with Sam is at noon, so keep that hour free. "
+    "The afternoon is mostly open apart from a design review at three. "
+    "You finish with a gym session at six."
+)
+
+
+def split_chunks(text, words_per_chunk=6):
+    words = text.split(" ")
+    return [" ".join(words[i:i + words_per_chunk]) + " " for i in range(0, len(words), words_per_chunk)]
+
+
+def make_handler(text, first_delay, chunk_delay):
+    class GeminiStubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", "0"))
+            json.loads(self.rfile.read(length) or b"{}")
+            if ":streamGenerateContent" in self.path:
+                self._stream()
+            elif ":generateContent" in self.path:
+                time.sleep(first_delay + chunk_delay * len(split_chunks(text)))
+                body = json.dumps({"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}]})
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body.encode())
+            else:
+                self.send_error(404)
+
+        def _stream(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            time.sleep(first_delay)
+            try:
+                for index, piece in enumerate(split_chunks(text)):
+                    if index:
+                        time.sleep(chunk_delay)
+                    chunk = {"candidates": [{"content": {"role": "model", "parts": [{"text": piece}]}}]}
+                    self._write_chunk(f"data: {json.dumps(chunk)}\r\n\r\n".encode())
+                self._write_chunk(b"")
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # the client hit its deadline and hung up
+
+        def _write_chunk(self, data):
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+    return GeminiStubHandler
+
+
+def start_server(port, text, first_delay, chunk_delay):
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(text, first_delay, chunk_delay))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def measure(args):
+    """Run the lambda's streaming client against the stub at several deadlines."""
+    lambda_dir = next(Path(__file__).resolve().parent.glob("*/lambda"))
+    sys.path.insert(0, str(lambda_dir))
+    from gemini_stream import complete_sentences, local_calendar_summary, stream_generate
+    from http_pool import ConnectionPool
+
+    server = start_server(0, args.text, args.first_delay, args.chunk_delay)
+    url = f"http://127.0.0.1:{server.server_address[1]}/v1beta/models/stub:streamGenerateContent?alt=sse&key=x"
+    body = json.dumps({"contents": [{"role": "user", "parts": [{"text": "summarize"}]}]}).encode()
+    pool = ConnectionPool()
+    events = ["2025-01-01T09:00:00-08:00: Standup", "2025-01-01T12:00:00-08:00: Lunch with Sam"]
+    for deadline_sec in (0.5, 1.5, 2.5, 10.0):
+        start = time.monotonic()
+        result = stream_generate(pool, url, body, start + deadline_sec)
+        speech = result.text if result.complete else complete_sentences(result.text)
+        source = "full" if result.complete else "partial" if speech else "fallback"
+        if not speech:
+            speech = local_calendar_summary(events)
+        first = f"{result.first_chunk_sec * 1000:.0f} ms" if result.first_chunk_sec is not None else "-"
+        print(f"deadline {deadline_sec:4.1f}s: first text {first:>7}, returned after "
+              f"{(time.monotonic() - start) * 1000:5.0f} ms [{source}] {speech[:70]!r}")
+    server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--first-delay", type=float, default=0.8, help="seconds before the first chunk")
+    parser.add_argument("--chunk-delay", type=float, default=0.3, help="seconds between chunks")
+    parser.add_argument("--text", default=DEFAULT_TEXT)
+    parser.add_argument("--measure", action="store_true")
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(args)
+        return
+    server = start_server(args.port, args.text, args.first_delay, args.chunk_delay)
+    print(f"Gemini stub listening on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
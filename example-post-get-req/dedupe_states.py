@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+One-off migration: remove duplicate weatherState documents and add the
+unique userId index.
+
+Upserts racing on a state collection without that index could insert more
+than one document for a userId, and then MongoStore cannot create the index
+on startup. In that case it logs a warning and keeps a plain userId index
+instead. Run this once, preferably while no server is writing, and every
+start after that finds the unique index in place.
+
+    python3 dedupe_states.py --dry-run     # count duplicates, change nothing
+    python3 dedupe_states.py               # mongo_uri from weatherAppKey.py
+    python3 dedupe_states.py --uri mongodb://localhost:27017 --db alexaDB
+"""
+
+import argparse
+
+from weather_storage import MongoStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", help="defaults to mongo_uri in weatherAppKey.py")
+    parser.add_argument("--db", default="alexaDB")
+    parser.add_argument("--dry-run", action="store_true", help="only count the documents that would be deleted")
+    args = parser.parse_args()
+
+    uri = args.uri
+    if uri is None:
+        from weatherAppKey import mongo_uri as uri
+
+    store = MongoStore(uri, db_name=args.db, serverSelectionTimeoutMS=5000)
+    try:
+        removed = store.remove_duplicate_states(dry_run=args.dry_run)
+    finally:
+        store.close()
+    if args.dry_run:
+        print(f"{removed} duplicate {store.collection.name} document(s) would be deleted")
+    else:
+        print(f"Deleted {removed} duplicate {store.collection.name} document(s); unique userId index in place")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Virtual device fleet simulator for the weatherApp API.
+
+Runs `--doors` virtual doors and `--readers` virtual Alexa skill instances on
+one asyncio loop, sharing a bounded pool of keep-alive connections, and
+reports per-route throughput, error rates, latency percentiles and a latency
+histogram.
+
+Each door behaves like a Pi running door_sync_poster.py: door events arrive
+as a Poisson process (`--event-rate` per door per minute), alternate open and
+closed with a walk-through on some openings, and carry drifting indoor
+temperature and humidity. Its calendar changes now and then; it is uploaded
+with PUT /weather/calendar and the readings carry only its calendarHash, with
+a `--legacy` fraction of doors embedding calendarEvents in every POST as the
+old firmware did. Readers poll GET /weather for a few doors each with
+If-None-Match, the way the skill's cache revalidates, so 304s are counted.
+
+With --spawn the in-repo app is started on a free port with a throwaway
+SQLite database that all workers share, or with --store memory on a single
+worker (each process would have its own dict). A GET that answers 404 for a
+door that has already posted, or a POST that reports calendarMissing right
+after the calendar was accepted, counts as an error: the server lost a write.
+
+    python3 fleet_sim.py --spawn --doors 2000 --readers 50 --duration 60
+    python3 fleet_sim.py --spawn --store memory --event-rate 6 --legacy 0.2
+    python3 fleet_sim.py --url http://127.0.0.1:8000 --doors 500
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+import time
+import urllib.parse
+from pathlib import Path
+
+from loadtest import AsyncHTTPClient, free_port, percentile, spawn_server
+
+CALENDAR_TITLES = (
+    "Standup", "CSE 118 lecture", "Lab section", "Office hours", "Gym", "Dentist",
+    "Team sync", "Grocery run", "Dinner", "Project demo", "Study group", "Laundry",
+)
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+HISTOGRAM_WIDTH = 50
+
+
+class RouteStats:
+    __slots__ = ("latencies", "statuses", "failures", "lost", "bytes_sent")
+
+    def __init__(self):
+        self.latencies = []
+        self.statuses = {}
+        self.failures = 0      # connection errors and timeouts: no status at all
+        self.lost = 0          # answers that miss an earlier accepted write
+        self.bytes_sent = 0
+
+    def errors(self, ok_statuses):
+        return self.failures + self.lost + sum(n for status, n in self.statuses.items() if status not in ok_statuses)
+
+    @property
+    def requests(self):
+        return len(self.latencies) + self.failures
+
+
+class ConnectionPool:
+    """Hands out at most `size` keep-alive connections; callers wait when all are busy."""
+
+    def __init__(self, host, port, size, timeout):
+        self._clients = [AsyncHTTPClient(host, port, timeout) for _ in range(size)]
+        self._idle = asyncio.Queue()
+        for client in self._clients:
+            self._idle.put_nowait(client)
+
+    async def request(self, stats, method, path, payload=None, headers=None):
+        """Send one request and record it; returns (status, headers, body) or None on failure."""
+        body = None
+        if payload is not None:
+            body = json.dumps(payload, separators=(",", ":")).encode()
+            headers = dict(headers or {}, **{"Content-Type": "application/json"})
+            stats.bytes_sent += len(body)
+        # Latency includes the wait for a free connection, as a device would see it.
+        start = time.perf_counter()
+        client = await self._idle.get()
+        try:
+            status, response_headers, response_body = await client.request(method, path, body, headers)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+            stats.failures += 1
+            return None
+        finally:
+            self._idle.put_nowait(client)
+        stats.latencies.append(time.perf_counter() - start)
+        stats.statuses[status] = stats.statuses.get(status, 0) + 1
+        return status, response_headers, response_body
+
+    async def close(self):
+        await asyncio.gather(*(client.close() for client in self._clients))
+
+
+async def pause(seconds, deadline):
+    """Sleep, but never past the end of the run."""
+    await asyncio.sleep(max(min(seconds, deadline - time.perf_counter()), 0.0))
+
+
+def door_id(index):
+    return f"fleet-{index:05d}"
+
+
+def make_calendar(rng, now):
+    """A few upcoming events in the "start: summary" form calendar_refresher produces."""
+    events = []
+    start = now
+    for _ in range(rng.randint(0, 6)):
+        start += rng.uniform(0.5, 8) * 3600
+        stamp = time.strftime("%Y-%m-%dT%H:%M:00-08:00", time.localtime(start))
+        events.append(f"{stamp}: {rng.choice(CALENDAR_TITLES)}")
+    return events
+
+
+async def run_door(index, pool, stats, posted, deadline, args):
+    rng = random.Random(args.seed * 100_003 + index)
+    user_id = door_id(index)
+    legacy = rng.random() < args.legacy
+    temp_f = rng.uniform(64.0, 76.0)
+    humidity = rng.uniform(30.0, 55.0)
+    calendar = make_calendar(rng, time.time())
+    calendar_hash = None
+    door_open = False
+    rate = args.event_rate / 60.0
+
+    # The first event lands uniformly in one mean interval so the fleet does not start in lockstep.
+    await pause(rng.uniform(0, 1 / rate), deadline)
+    while time.perf_counter() < deadline:
+        door_open = not door_open
+        walk = door_open and rng.random() < args.walk_ratio
+        temp_f = min(max(temp_f + rng.gauss(0, 0.2), 55.0), 90.0)
+        humidity = min(max(humidity + rng.gauss(0, 0.5), 10.0), 90.0)
+        if rng.random() < args.calendar_change:
+            calendar = make_calendar(rng, time.time())
+            calendar_hash = None
+
+        payload = {
+            "userId": user_id,
+            "doorStatus": "Open" if door_open else "Closed",
+            "walkThroughStatus": "True" if walk else "False",
+            "indoorTemp": f"{temp_f:.1f}",
+            "humidity": f"{humidity:.0f}",
+            "ts": time.time(),
+        }
+        if not legacy and calendar_hash is None:
+            result = await pool.request(stats["calendar PUT"], "PUT", "/weather/calendar",
+                                        {"userId": user_id, "calendarEvents": calendar})
+            if result is not None and result[0] == 200:
+                calendar_hash = json.loads(result[2])["calendarHash"]
+        if calendar_hash is not None:
+            payload["calendarHash"] = calendar_hash
+        else:
+            payload["calendarEvents"] = calendar
+
+        result = await pool.request(stats["door POST"], "POST", "/weather", payload)
+        if result is not None and result[0] == 200:
+            posted.add(user_id)
+            if b'"calendarMissing"' in result[2]:
+                # The server accepted this calendar earlier in the run, so it lost it.
+                stats["door POST"].lost += 1
+                calendar_hash = None
+
+        # A closing follows its opening within seconds; the next opening is minutes away.
+        if door_open:
+            await pause(rng.uniform(3.0, 20.0), deadline)
+        else:
+            await pause(rng.expovariate(rate), deadline)
+
+
+async def run_reader(index, pool, stats, posted, deadline, args):
+    rng = random.Random(args.seed * 7919 + index)
+    # A skill instance serves one household, so it keeps asking about the same few doors.
+    watched = [door_id(i) for i in rng.sample(range(args.doors), min(args.watch, args.doors))]
+    etags = {}
+    await pause(rng.uniform(0, 1 / args.read_rate), deadline)
+    while time.perf_counter() < deadline:
+        user_id = rng.choice(watched)
+        path = "/weather?" + urllib.parse.urlencode({"userId": user_id})
+        headers = {"If-None-Match": etags[user_id]} if user_id in etags else None
+        result = await pool.request(stats["GET"], "GET", path, headers=headers)
+        if result is not None and result[0] == 200 and "etag" in result[1]:
+            etags[user_id] = result[1]["etag"]
+        elif result is not None and result[0] == 404 and user_id in posted:
+            stats["GET"].lost += 1
+        await pause(rng.expovariate(args.read_rate), deadline)
+
+
+async def run_fleet(host, port, args):
+    stats = {name: RouteStats() for name in ("door POST", "calendar PUT", "GET")}
+    pool = ConnectionPool(host, port, min(args.connections, args.doors + args.readers), args.timeout)
+    posted = set()   # doors with an accepted POST; a later 404 for one means a lost write
+    deadline = time.perf_counter() + args.duration
+    start = time.perf_counter()
+    tasks = [run_door(i, pool, stats, posted, deadline, args) for i in range(args.doors)]
+    tasks += [run_reader(i, pool, stats, posted, deadline, args) for i in range(args.readers)]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        await pool.close()
+    return stats, time.perf_counter() - start
+
+
+def print_histogram(latencies):
+    counts = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+    for latency in latencies:
+        ms = latency * 1e3
+        for i, bound in enumerate(HISTOGRAM_BUCKETS_MS):
+            if ms < bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+    peak = max(counts) or 1
+    labels = [f"< {bound} ms" for bound in HISTOGRAM_BUCKETS_MS] + [f">= {HISTOGRAM_BUCKETS_MS[-1]} ms"]
+    for label, count in zip(labels, counts):
+        if count:
+            bar = "#" * max(1, round(count / peak * HISTOGRAM_WIDTH))
+            print(f"  {label:>10s}  {count:8d}  {bar}")
+
+
+def report(stats, elapsed, args):
+    # 404: a reader asked for a door that has not posted yet (later ones are counted as lost);
+    # 304: the skill's copy was current.
+    ok = {"door POST": {200}, "calendar PUT": {200}, "GET": {200, 304, 404}}
+    print(f"fleet:  {args.doors} doors at {args.event_rate:g} events/min ({args.legacy:.0%} legacy calendar), "
+          f"{args.readers} readers at {args.read_rate:g} req/s, {args.connections} connections, {elapsed:.1f} s")
+    print(f"{'route':14s} {'requests':>9s} {'req/s':>8s} {'errors':>8s} {'err %':>6s} "
+          f"{'p50 ms':>7s} {'p90 ms':>7s} {'p99 ms':>7s} {'p99.9':>7s} {'avg body':>9s}")
+    everything = []
+    total_requests = total_errors = 0
+    for name, route in stats.items():
+        latencies = sorted(route.latencies)
+        everything.extend(latencies)
+        errors = route.errors(ok[name])
+        total_requests += route.requests
+        total_errors += errors
+        body = f"{route.bytes_sent / route.requests:.0f} B" if route.bytes_sent and route.requests else "-"
+        print(f"{name:14s} {route.requests:9d} {route.requests / elapsed:8.1f} {errors:8d} "
+              f"{errors / route.requests * 100 if route.requests else 0:6.2f} "
+              + " ".join(f"{percentile(latencies, pct) * 1e3:7.1f}" for pct in (50, 90, 99, 99.9))
+              + f" {body:>9s}")
+    print(f"{'total':14s} {total_requests:9d} {total_requests / elapsed:8.1f} {total_errors:8d} "
+          f"{total_errors / total_requests * 100 if total_requests else 0:6.2f}")
+
+    reads = stats["GET"].statuses
+    if reads:
+        served = sum(reads.values())
+        print(f"GET: {reads.get(304, 0) / served:.0%} not modified (304), "
+              f"{reads.get(404, 0) - stats['GET'].lost} not found yet")
+    for name, route in stats.items():
+        unexpected = {status: n for status, n in route.statuses.items() if status not in ok[name]}
+        if unexpected or route.failures or route.lost:
+            print(f"{name} errors: {dict(sorted(unexpected.items()))}, {route.failures} connection failures, "
+                  f"{route.lost} lost writes")
+    print("latency histogram (all routes):")
+    print_histogram(everything)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="target server (ignored with --spawn)")
+    parser.add_argument("--spawn", action="store_true", help="start the in-repo app on a free port")
+    parser.add_argument("--server", choices=["gunicorn", "dev"], default="gunicorn")
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn workers with --spawn")
+    parser.add_argument("--store", choices=["sqlite", "memory"], default="sqlite",
+                        help="store with --spawn (memory runs a single worker)")
+    parser.add_argument("--doors", type=int, default=2000)
+    parser.add_argument("--event-rate", type=float, default=2.0, help="door openings per door per minute")
+    parser.add_argument("--walk-ratio", type=float, default=0.6, help="openings with a walk-through")
+    parser.add_argument("--calendar-change", type=float, default=0.02, help="chance per event the calendar changed")
+    parser.add_argument("--legacy", type=float, default=0.1, help="fraction of doors embedding calendarEvents")
+    parser.add_argument("--readers", type=int, default=50, help="simulated Alexa skill instances")
+    parser.add_argument("--read-rate", type=float, default=2.0, help="GET /weather per reader per second")
+    parser.add_argument("--watch", type=int, default=4, help="doors each reader asks about")
+    parser.add_argument("--connections", type=int, default=256, help="shared keep-alive connections")
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=118)
+    args = parser.parse_args()
+    if args.doors < 1 or args.watch < 1 or args.event_rate <= 0 or args.read_rate <= 0:
+        parser.error("--doors, --watch, --event-rate and --read-rate must be positive")
+
+    proc = None
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.spawn:
+            host, port = "127.0.0.1", free_port()
+            sqlite_path = Path(tmp) / "fleet.db" if args.store == "sqlite" else None
+            proc = spawn_server(args.server, port, args.workers, args.store, sqlite_path)
+        else:
+            parsed = urllib.parse.urlsplit(args.url)
+            host, port = parsed.hostname, parsed.port or 80
+        try:
+            stats, elapsed = asyncio.run(run_fleet(host, port, args))
+        finally:
+            if proc is not None:
+                proc.terminate()
+                proc.wait(10)
+    report(stats, elapsed, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+gunicorn settings for weatherApp (see wsgi.py). Override with environment
+variables: WEATHER_BIND, WEB_CONCURRENCY (worker processes), WEATHER_THREADS.
+
+Threaded workers suit this app: request handlers spend most of their time
+waiting on the database, and the pymongo pool is shared by a worker's threads.
+Keep WEATHER_MONGO_MAX_POOL_SIZE >= WEATHER_THREADS.
+
+Each worker has its own stream broker and GET /weather cache, so with more
+than one worker accepted updates are relayed through a SQLite file shared by
+the workers (WEATHER_STREAM_RELAY, a temporary file unless set), and every
+worker applies them to both. Each open stream
+also holds one of its worker's threads; weatherApp caps subscribers per worker
+below WEATHER_THREADS.
+
+Metrics are per worker too: /metrics (and /metrics/profile) answer with the
+counters of whichever worker took the scrape, not the whole server. Run with
+WEB_CONCURRENCY=1 where exact Prometheus totals matter.
+"""
+
+import multiprocessing
+import os
+import tempfile
+
+bind = os.environ.get("WEATHER_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", min(multiprocessing.cpu_count() * 2 + 1, 8)))
+worker_class = "gthread"
+threads = int(os.environ.get("WEATHER_THREADS", "16"))
+# Devices keep their connection open between posts.
+keepalive = 30
+timeout = 30
+graceful_timeout = 10
+backlog = 2048
+# Never preload: the storage client must be created after the fork.
+preload_app = False
+accesslog = os.environ.get("WEATHER_ACCESS_LOG") or None
+
+# Set before the workers fork, so they all inherit the same relay path.
+_own_relay = workers > 1 and not os.environ.get("WEATHER_STREAM_RELAY")
+if _own_relay:
+    os.environ["WEATHER_STREAM_RELAY"] = os.path.join(tempfile.gettempdir(), f"weather-stream-{os.getpid()}.db")
+
+
+def on_exit(server):
+    if _own_relay:
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(os.environ["WEATHER_STREAM_RELAY"] + suffix)
+            except OSError:
+                pass
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Reproducible HTTP load test for weatherApp using only the standard library.
+
+Simulates `--devices` concurrent keep-alive clients, each alternating door
+POSTs and GET /weather reads, and reports requests/s and latency percentiles.
+With --spawn it first starts the in-repo app on a free port (gunicorn via
+gunicorn.conf.py, or the dev server with --server dev) on a scratch SQLite
+file that all workers share. --store memory measures the HTTP layer without
+a database, but each process would have its own dict, so it runs one worker.
+
+    python3 loadtest.py --spawn --devices 300 --duration 20
+    python3 loadtest.py --spawn --store memory --devices 300
+    python3 loadtest.py --url http://127.0.0.1:8000 --devices 500
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent
+
+
+class AsyncHTTPClient:
+    """Minimal HTTP/1.1 keep-alive client over one asyncio connection."""
+
+    def __init__(self, host, port, timeout=10.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._reader = None
+        self._writer = None
+
+    async def _connect(self):
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except ConnectionError:
+                pass
+            self._writer = None
+
+    async def request(self, method, path, body=None, headers=None):
+        """Return (status, headers, body bytes); reconnects once if the server closed the socket."""
+        for attempt in (0, 1):
+            if self._writer is None:
+                await self._connect()
+            try:
+                return await asyncio.wait_for(self._roundtrip(method, path, body, headers), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                await self.close()
+                if attempt:
+                    raise
+            except asyncio.TimeoutError:
+                await self.close()
+                raise
+
+    async def _roundtrip(self, method, path, body, headers):
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", "Connection: keep-alive"]
+        for name, value in (headers or {}).items():
+            lines.append(f"{name}: {value}")
+        if body is not None:
+            lines.append(f"Content-Length: {len(body)}")
+        self._writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + (body or b""))
+        await self._writer.drain()
+
+        status_line = await self._reader.readuntil(b"\r\n")
+        status = int(status_line.split(b" ", 2)[1])
+        response_headers = {}
+        while True:
+            line = await self._reader.readuntil(b"\r\n")
+            if line == b"\r\n":
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+
+        if response_headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await self._reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                chunk = await self._reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                chunks.append(chunk[:-2])
+            payload = b"".join(chunks)
+        else:
+            payload = await self._reader.readexactly(int(response_headers.get("content-length", "0")))
+
+        if response_headers.get("connection", "").lower() == "close":
+            await self.close()
+        return status, response_headers, payload
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return float("nan")
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def device_payload(user_id, rng):
+    return {
+        "userId": user_id,
+        "doorStatus": rng.choice(["Open", "Closed"]),
+        "walkThroughStatus": rng.choice(["True", "False"]),
+        "indoorTemp": f"{rng.uniform(60, 80):.1f}",
+        "humidity": f"{rng.uniform(20, 60):.0f}",
+        "ts": time.time(),
+    }
+
+
+async def run_device(index, host, port, deadline, read_ratio, think_sec, stats):
+    rng = random.Random(index)
+    user_id = f"load-{index}"
+    client = AsyncHTTPClient(host, port)
+    get_path = "/weather?" + urllib.parse.urlencode({"userId": user_id})
+    # Stagger start-up so all devices do not connect in the same instant.
+    await asyncio.sleep(rng.uniform(0, 0.5))
+    wrote = False
+    try:
+        while time.perf_counter() < deadline:
+            if rng.random() < read_ratio:
+                method, path, body, headers = "GET", get_path, None, None
+            else:
+                method, path = "POST", "/weather"
+                body = json.dumps(device_payload(user_id, rng)).encode()
+                headers = {"Content-Type": "application/json"}
+            start = time.perf_counter()
+            try:
+                status, _, _ = await client.request(method, path, body, headers)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                stats["errors"] += 1
+            else:
+                stats["latencies"].append(time.perf_counter() - start)
+                # 404 is expected only for a device's reads before its first accepted write.
+                if status >= 500 or (status >= 400 and (status != 404 or wrote)):
+                    stats["errors"] += 1
+                wrote = wrote or (method == "POST" and status == 200)
+            if think_sec:
+                await asyncio.sleep(rng.expovariate(1 / think_sec))
+    finally:
+        await client.close()
+
+
+async def run_load(host, port, devices, duration, read_ratio, think_sec):
+    stats = {"latencies": [], "errors": 0}
+    deadline = time.perf_counter() + duration
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        run_device(i, host, port, deadline, read_ratio, think_sec, stats) for i in range(devices)
+    ))
+    stats["elapsed"] = time.perf_counter() - start
+    return stats
+
+
+def report(stats, devices):
+    latencies = sorted(stats["latencies"])
+    total = len(latencies) + stats["errors"]
+    print(f"devices:     {devices}")
+    print(f"requests:    {total} in {stats['elapsed']:.1f}s")
+    print(f"throughput:  {len(latencies) / stats['elapsed']:.0f} req/s")
+    print(f"errors:      {stats['errors']} ({stats['errors'] / total * 100 if total else 0:.2f}%)")
+    for pct in (50, 90, 99, 99.9):
+        print(f"p{pct:<5}      {percentile(latencies, pct) * 1e3:.1f} ms")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def spawn_server(kind, port, workers, store="memory", sqlite_path=None):
+    """Start the in-repo app (in-memory store unless `store` says otherwise) and wait until it answers."""
+    env = dict(os.environ, WEATHER_STORE=store, WEATHER_BIND=f"127.0.0.1:{port}")
+    if sqlite_path:
+        env["WEATHER_SQLITE_PATH"] = str(sqlite_path)
+    if store == "memory" and workers > 1:
+        # Workers would each have their own dict: writes on one would be 404s on the others.
+        print(f"memory store is per process: running 1 worker instead of {workers}")
+        workers = 1
+    if kind == "gunicorn":
+        env["WEB_CONCURRENCY"] = str(workers)
+        cmd = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"]
+    else:
+        cmd = [sys.executable, "-c",
+               f"import weatherApp; weatherApp.app.run(host='127.0.0.1', port={port}, threaded=True)"]
+    proc = subprocess.Popen(cmd, cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"Server exited early (code {proc.returncode}): {' '.join(cmd)}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.terminate()
+    raise SystemExit("Server did not start within 15s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="target server (ignored with --spawn)")
+    parser.add_argument("--spawn", action="store_true", help="start the in-repo app on a free port")
+    parser.add_argument("--server", choices=["gunicorn", "dev"], default="gunicorn")
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn workers with --spawn")
+    parser.add_argument("--store", choices=["sqlite", "memory"], default="sqlite",
+                        help="store with --spawn (memory runs a single worker)")
+    parser.add_argument("--devices", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--read-ratio", type=float, default=0.5, help="fraction of requests that are GETs")
+    parser.add_argument("--think", type=float, default=0.0, help="mean pause between a device's requests (s)")
+    args = parser.parse_args()
+
+    proc = None
+    with tempfile.TemporaryDirectory() as scratch:
+        if args.spawn:
+            host, port = "127.0.0.1", free_port()
+            proc = spawn_server(args.server, port, args.workers, args.store, Path(scratch) / "weather.db")
+        else:
+            parsed = urllib.parse.urlsplit(args.url)
+            host, port = parsed.hostname, parsed.port or 80
+        try:
+            stats = asyncio.run(run_load(host, port, args.devices, args.duration, args.read_ratio, args.think))
+        finally:
+            if proc is not None:
+                proc.terminate()
+                proc.wait(10)
+    report(stats, args.devices)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Precompute the Alexa calendar summary when a user's calendar changes.
+
+The summary is written into the same content-addressed cache the skill reads
+(the lambda's summary_cache module, loaded from the repo), so by the time
+someone asks, the Gemini call has already been paid for. Enabled only when
+GEMINI_API_KEY is set and a store shared with the skill is configured
+(SUMMARY_CACHE_DIR, or S3_PERSISTENCE_BUCKET for the skill's S3 bucket).
+"""
+
+import hashlib
+import json
+import os
+import sys
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+GEMINI_MODEL = os.environ.get("GEMINI_MODEL", "gemini-2.5-flash")
+GEMINI_TIMEOUT_SEC = 30
+
+
+def load_summary_module():
+    """Load summary_cache from the Alexa lambda in this repo; returns module or None."""
+    lambda_dir = os.environ.get("SUMMARY_LAMBDA_DIR")
+    if not lambda_dir:
+        repo_root = Path(__file__).resolve().parents[1]
+        lambda_dir = next((repo_root / "alexa").glob("*/lambda"), None)
+    if lambda_dir is None:
+        return None
+    if str(lambda_dir) not in sys.path:
+        sys.path.append(str(lambda_dir))
+    try:
+        import summary_cache
+    except Exception as exc:
+        print(f"Summary cache module load failed: {exc}")
+        return None
+    return summary_cache
+
+
+class SummaryPrecomputer:
+    def __init__(self, module, api_key, model=GEMINI_MODEL):
+        self.module = module
+        self.api_key = api_key
+        self.model = model
+        self.cache = module.SummaryCache(store=module.default_store())
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summary-precompute")
+        self._last_hash = {}  # userId -> hash of the calendar last queued
+
+    def calendar_changed(self, user_id, events):
+        """Queue a summary for `events` unless this user's calendar is unchanged."""
+        if not events:
+            return False
+        digest = hashlib.sha256(json.dumps(events, sort_keys=True).encode("utf-8")).hexdigest()
+        if self._last_hash.get(user_id) == digest:
+            return False
+        self._last_hash[user_id] = digest
+        self._executor.submit(self._precompute, events)
+        return True
+
+    def _precompute(self, events):
+        prompt = self.module.build_calendar_prompt(events)
+        key = self.module.summary_key(self.model, prompt)
+        if self.cache.get(key) is not None:
+            return
+        url = (
+            f"https://generativelanguage.googleapis.com/v1beta/models/"
+            f"{self.model}:generateContent?key={self.api_key}"
+        )
+        request = urllib.request.Request(
+            url,
+            data=json.dumps(self.module.gemini_request_body(prompt)).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=GEMINI_TIMEOUT_SEC) as response:
+                payload = json.loads(response.read().decode("utf-8"))
+        except Exception as exc:
+            print(f"Summary precompute failed: {exc}")
+            return
+        summary = self.module.extract_summary_text(payload)
+        if summary:
+            self.cache.put(key, summary)
+
+
+def create_precomputer():
+    """Return a SummaryPrecomputer, or None when precompute is not configured."""
+    api_key = os.environ.get("GEMINI_API_KEY")
+    if not api_key or not (os.environ.get("SUMMARY_CACHE_DIR") or os.environ.get("S3_PERSISTENCE_BUCKET")):
+        return None
+    module = load_summary_module()
+    if module is None:
+        return None
+    return SummaryPrecomputer(module, api_key)
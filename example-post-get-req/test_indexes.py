@@ -0,0 +1,190 @@
+"""
+Checks that every query MongoStore issues is served by an index.
+
+The store's collections are wrapped so the filters its methods actually send
+are recorded. Against mongomock (the default) each filter's fields must form a
+prefix of one of the collection's indexes, which is when the query planner
+picks an IXSCAN. With MONGO_URI set, the tests run against that server in a
+scratch database (dropped afterwards), and the real explain plan of every
+recorded query must contain no COLLSCAN.
+
+    python3 -m pytest example-post-get-req/test_indexes.py
+    MONGO_URI=mongodb://localhost:27017 python3 -m pytest example-post-get-req/test_indexes.py
+"""
+
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from weather_storage import MongoStore
+
+MONGO_URI = os.environ.get("MONGO_URI")
+SCRATCH_DB = "weatherIndexTest"
+USER_ID = "index-test"
+
+
+class RecordingCollection:
+    """Passes every call through to `collection`, recording (method, filter or pipeline)."""
+
+    def __init__(self, collection, calls):
+        self._collection = collection
+        self._calls = calls
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+    def find_one(self, filter=None, *args, **kwargs):
+        self._calls.append((self._collection, "find", filter))
+        return self._collection.find_one(filter, *args, **kwargs)
+
+    def update_one(self, filter, *args, **kwargs):
+        self._calls.append((self._collection, "find", filter))
+        return self._collection.update_one(filter, *args, **kwargs)
+
+    def bulk_write(self, requests, *args, **kwargs):
+        for request in requests:
+            self._calls.append((self._collection, "find", request._filter))
+        return self._collection.bulk_write(requests, *args, **kwargs)
+
+    def aggregate(self, pipeline, *args, **kwargs):
+        self._calls.append((self._collection, "aggregate", pipeline))
+        return self._collection.aggregate(pipeline, *args, **kwargs)
+
+
+@pytest.fixture
+def client():
+    if MONGO_URI:
+        from pymongo import MongoClient
+
+        client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+    else:
+        mongomock = pytest.importorskip("mongomock")
+        client = mongomock.MongoClient()
+    client.drop_database(SCRATCH_DB)
+    if not MONGO_URI:
+        # mongomock has no time-series collections; a plain history collection gets the same index.
+        client[SCRATCH_DB].create_collection("weatherHistory")
+    yield client
+    client.drop_database(SCRATCH_DB)
+    client.close()
+
+
+def recording_store(client):
+    """A MongoStore on the scratch database and the list its queries are recorded into."""
+    store = MongoStore(None, db_name=SCRATCH_DB, client=client)
+    calls = []
+    store.collection = RecordingCollection(store.collection, calls)
+    store.history = RecordingCollection(store.history, calls)
+    store.calendars = RecordingCollection(store.calendars, calls)
+    return store, calls
+
+
+def filter_fields(query):
+    """Field names a filter or a pipeline's leading $match constrains, in order."""
+    if isinstance(query, list):
+        query = query[0].get("$match", {}) if query else {}
+    return [name for name in query if not name.startswith("$")]
+
+
+def check_prefix(collection, fields):
+    for index in collection.index_information().values():
+        keys = [key for key, _ in index["key"]]
+        if keys[:len(fields)] == fields:
+            return True
+    return False
+
+
+def plan_stages(plan, found=None):
+    """Every stage name anywhere in an explain document."""
+    found = [] if found is None else found
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            found.append(plan["stage"])
+        for value in plan.values():
+            plan_stages(value, found)
+    elif isinstance(plan, list):
+        for value in plan:
+            plan_stages(value, found)
+    return found
+
+
+def check_explain(collection, kind, query):
+    if kind == "aggregate":
+        command = {"aggregate": collection.name, "pipeline": query, "cursor": {}}
+    else:
+        command = {"find": collection.name, "filter": query}
+    # Aggregations on time-series collections nest their plans under stages, so search everywhere.
+    stages = plan_stages(collection.database.command({"explain": command, "verbosity": "queryPlanner"}))
+    return bool(stages) and "COLLSCAN" not in stages
+
+
+def assert_indexed(calls):
+    assert calls
+    for collection, kind, query in calls:
+        if MONGO_URI:
+            assert check_explain(collection, kind, query), f"{collection.name} {kind} {query} scans the collection"
+        else:
+            fields = filter_fields(query)
+            assert check_prefix(collection, fields), f"no {collection.name} index starts with {fields}"
+
+
+def test_hot_queries_use_an_index(client):
+    store, calls = recording_store(client)
+    now = datetime.now(timezone.utc)
+    doc = {"userId": USER_ID, "doorStatus": "Open", "walkThroughStatus": "False", "indoorTemp": "68",
+           "humidity": "40", "calendarHash": "0" * 32}
+
+    store.upsert_state(doc)
+    store.bulk_upsert_states([doc, {**doc, "userId": "other"}])
+    assert store.get_state(USER_ID, ("userId", "doorStatus"))["doorStatus"] == "Open"
+    store.append_history([{"userId": USER_ID, "ts": now.replace(tzinfo=None), "indoorTemp": 68.0}])
+    store.query_history(USER_ID, now - timedelta(days=1), now + timedelta(minutes=1), "hour", 1)
+    store.put_calendar("0" * 32, ["2026-10-17T09:00:00-07:00: Standup"])
+    assert store.get_calendar("0" * 32) == ["2026-10-17T09:00:00-07:00: Standup"]
+
+    assert {collection.name for collection, _, _ in calls} == {
+        store.collection.name, store.history.name, store.calendars.name}
+    assert_indexed(calls)
+
+
+def seed_duplicates(client):
+    """State docs as racing upserts without the unique index leave them."""
+    collection = client[SCRATCH_DB]["weatherState"]
+    collection.insert_many([
+        {"userId": USER_ID, "doorStatus": "Closed"},
+        {"userId": USER_ID, "doorStatus": "Open"},
+        {"userId": "other", "doorStatus": "Closed"},
+    ])
+    return collection
+
+
+def unique_userid_index(collection):
+    return any(index.get("unique") for index in collection.index_information().values()
+               if [key for key, _ in index["key"]] == ["userId"])
+
+
+def test_startup_keeps_duplicates_and_an_index(client, capsys):
+    collection = seed_duplicates(client)
+    store, calls = recording_store(client)
+
+    assert "dedupe_states.py" in capsys.readouterr().out
+    assert collection.count_documents({"userId": USER_ID}) == 2
+    assert not unique_userid_index(collection)
+    store.get_state(USER_ID)
+    assert_indexed(calls)
+
+
+def test_remove_duplicate_states_keeps_the_oldest(client):
+    collection = seed_duplicates(client)
+    oldest = collection.find_one({"userId": USER_ID}, sort=[("_id", 1)])["_id"]
+    store = MongoStore(None, db_name=SCRATCH_DB, client=client)
+
+    assert store.remove_duplicate_states(dry_run=True) == 1
+    assert collection.count_documents({}) == 3
+    assert store.remove_duplicate_states() == 1
+    assert [doc["_id"] for doc in collection.find({"userId": USER_ID})] == [oldest]
+    assert unique_userid_index(collection)
+    # A restart now finds the unique index and leaves the collection alone.
+    MongoStore(None, db_name=SCRATCH_DB, client=client)
+    assert collection.count_documents({}) == 2
@@ -1,83 +1,575 @@
-from flask import Flask, request, jsonify
-from pymongo import MongoClient
+import hashlib
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
 
-from weatherAppKey import mongo_uri
+from flask import Flask, Response, g, request, jsonify, stream_with_context
+
+from summary_precompute import create_precomputer
+from weather_cache import TTLCache
+from weather_storage import RESOLUTION_SECONDS, TimedStore, create_store
+from weather_stream import SqliteRelay, StateBroker
+
+# Metrics registry shared with the Pi agent, from the repo's shared/ folder.
+SHARED_DIR = Path(__file__).resolve().parents[1] / "shared"
+if str(SHARED_DIR) not in sys.path:
+    sys.path.append(str(SHARED_DIR))
+from metrics import CONTENT_TYPE, REGISTRY, SIZE_BUCKETS, profiler_from_env  # noqa: E402
+from wire_format import (  # noqa: E402
+    IDENTITY, JSON_TYPE, WireError, content_codings, decode, decompress, encode, is_msgpack, media_types,
+    normalize_reading,
+)
 
 app = Flask(__name__)
 
-client = MongoClient(mongo_uri)
+# Storage backend: "mongo" (default), "sqlite" or "memory".
+STORE_KIND = os.environ.get("WEATHER_STORE", "mongo")
+SQLITE_PATH = os.environ.get("WEATHER_SQLITE_PATH", "weather.db")
+
+# Mongo connection pool, per server process. Size it to at least the number of
+# request threads in that process (gunicorn threads) so requests never queue on it.
+MONGO_MAX_POOL_SIZE = int(os.environ.get("WEATHER_MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.environ.get("WEATHER_MONGO_MIN_POOL_SIZE", "4"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get("WEATHER_MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get("WEATHER_MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+
+DEBUG = os.environ.get("WEATHER_DEBUG", "0") in ("1", "true", "True")
+
+
+def build_store():
+    if STORE_KIND == "mongo":
+        from weatherAppKey import mongo_uri
+
+        return create_store(
+            "mongo",
+            uri=mongo_uri,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        )
+    if STORE_KIND == "sqlite":
+        return create_store("sqlite", path=SQLITE_PATH)
+    return create_store(STORE_KIND)
+
+
+# Per-process metrics: each gunicorn worker keeps its own, so /metrics shows the
+# worker that answered (see gunicorn.conf.py). Scrape with WEB_CONCURRENCY=1 for totals.
+request_seconds = REGISTRY.histogram(
+    "weather_http_request_seconds", "Request handling time by route", ("method", "route"))
+request_total = REGISTRY.counter(
+    "weather_http_requests_total", "Requests by route and status", ("method", "route", "status"))
+request_bytes = REGISTRY.histogram(
+    "weather_http_request_bytes", "Request body size by route", ("method", "route"), buckets=SIZE_BUCKETS)
+response_bytes = REGISTRY.histogram(
+    "weather_http_response_bytes", "Response body size by route", ("method", "route"), buckets=SIZE_BUCKETS)
+store_seconds = REGISTRY.histogram(
+    "weather_store_seconds", "Storage backend call time", ("backend", "operation"))
+store_errors = REGISTRY.counter(
+    "weather_store_errors_total", "Storage backend calls that raised", ("backend", "operation"))
+
+# Opt-in sampling profiler: WEATHER_PROFILE_MS=5 samples every 5 ms, read at /metrics/profile.
+profiler = profiler_from_env("WEATHER_PROFILE_MS")
+
+
+def observe_store(operation, seconds, failed):
+    store_seconds.labels(store.name, operation).observe(seconds)
+    if failed:
+        store_errors.labels(store.name, operation).inc()
+
+
+store = TimedStore(build_store(), observe_store)
+
+REQUIRED_FIELDS = ("userId", "doorStatus", "walkThroughStatus", "indoorTemp", "humidity")
+# The state refers to the user's calendar by content hash; the events are stored once per hash.
+STATE_FIELDS = REQUIRED_FIELDS + ("calendarHash",)
+# State docs written before calendars were stored by hash embed the event list instead.
+LEGACY_STATE_FIELDS = STATE_FIELDS + ("calendarEvents",)
+MAX_BATCH_ITEMS = 5000
+MAX_CALENDAR_EVENTS = 500
+MAX_HISTORY_POINTS = 10_000
+DEFAULT_HISTORY_WINDOW = timedelta(hours=24)
+# resolution query value -> bucket unit and binSize
+HISTORY_RESOLUTIONS = {
+    "1s": ("second", 1), "10s": ("second", 10), "1m": ("minute", 1), "5m": ("minute", 5),
+    "15m": ("minute", 15), "1h": ("hour", 1), "6h": ("hour", 6), "1d": ("day", 1),
+}
+
+# Read-through cache for GET /weather, kept current by the POST handlers.
+CACHE_ENABLED = os.environ.get("WEATHER_CACHE_ENABLED", "1") not in ("0", "false", "False")
+CACHE_TTL_SEC = float(os.environ.get("WEATHER_CACHE_TTL_SEC", "30"))
+CACHE_MAX_ENTRIES = int(os.environ.get("WEATHER_CACHE_MAX_ENTRIES", "1024"))
+
+state_cache = TTLCache(max_entries=CACHE_MAX_ENTRIES, ttl_sec=CACHE_TTL_SEC, enabled=CACHE_ENABLED)
+# A hash always names the same events, so calendar entries only expire to bound memory.
+CALENDAR_CACHE_TTL_SEC = 3600.0
+calendar_cache = TTLCache(max_entries=CACHE_MAX_ENTRIES, ttl_sec=CALENDAR_CACHE_TTL_SEC, enabled=CACHE_ENABLED)
+
+# Server-Sent Events push of accepted updates (GET /weather/stream).
+STREAM_BUFFER = int(os.environ.get("WEATHER_STREAM_BUFFER", "16"))
+# Each open stream holds one gthread worker thread; keep STREAM_RESERVED_THREADS free for
+# normal requests, whatever WEATHER_STREAM_MAX_SUBSCRIBERS asks for.
+WORKER_THREADS = int(os.environ.get("WEATHER_THREADS", "16"))
+STREAM_RESERVED_THREADS = 4
+STREAM_MAX_SUBSCRIBERS = max(min(int(os.environ.get("WEATHER_STREAM_MAX_SUBSCRIBERS", "256")),
+                                 WORKER_THREADS - STREAM_RESERVED_THREADS), 1)
+STREAM_HEARTBEAT_SEC = 15.0
+# Shared SQLite file that carries updates between gunicorn workers; gunicorn.conf.py sets it
+# when it starts more than one worker. Unset, updates stay in this process.
+STREAM_RELAY_PATH = os.environ.get("WEATHER_STREAM_RELAY")
+
+broker = StateBroker(max_buffer=STREAM_BUFFER, max_subscribers=STREAM_MAX_SUBSCRIBERS)
+
+
+def apply_relayed(user_id, doc, seq):
+    """Relay delivery: refresh this worker's cached state, then push it to its subscribers."""
+    # Every worker applies every accepted update, so a GET never serves another worker's old state.
+    state_cache.put(user_id, {name: doc.get(name) for name in STATE_FIELDS})
+    broker.publish(user_id, doc, seq)
+
+
+relay = SqliteRelay(STREAM_RELAY_PATH, apply_relayed).start() if STREAM_RELAY_PATH else None
+
+
+def publish(user_id, doc):
+    """Push an accepted state to stream subscribers and state caches in every worker."""
+    if relay is not None:
+        relay.publish(user_id, doc)
+    else:
+        broker.publish(user_id, doc)
+
+# Warms the Alexa skill's calendar summary cache when a calendar changes (None if not configured).
+summary_precomputer = create_precomputer()
+
+REGISTRY.gauge("weather_stream_subscribers", "Open /weather/stream connections").set_function(
+    lambda: broker.subscriber_count)
+cache_entries = REGISTRY.gauge("weather_cache_entries", "Entries held per cache", ("cache",))
+cache_entries.labels("state").set_function(lambda: state_cache.stats()["size"])
+cache_entries.labels("calendar").set_function(lambda: calendar_cache.stats()["size"])
+REGISTRY.gauge("weather_state_cache_hit_ratio", "GET /weather cache hit ratio since start").set_function(
+    lambda: state_cache.stats()["hitRatio"])
+
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request(response):
+    started = g.pop("request_started", None)
+    if started is None:
+        return response
+    route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    request_seconds.labels(request.method, route).observe(time.perf_counter() - started)
+    request_total.labels(request.method, route, response.status_code).inc()
+    if request.content_length:
+        request_bytes.labels(request.method, route).observe(request.content_length)
+    if response.content_length is not None and not response.is_streamed:
+        response_bytes.labels(request.method, route).observe(response.content_length)
+    return response
+
+
+def missing_fields(data):
+    """Names of required fields that are absent (userId must also be non-empty)."""
+    return [
+        name for name in REQUIRED_FIELDS
+        if data.get(name) is None or (name == "userId" and not data.get(name))
+    ]
+
+
+def state_doc(data):
+    """The per-user state document stored by an upsert."""
+    return {name: data.get(name) for name in STATE_FIELDS}
+
+
+def calendar_hash(events):
+    """Content hash of an event list: the same events always get the same hash."""
+    body = json.dumps(events, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()[:32]
+
+
+def save_calendar(user_id, events):
+    """Store `events` under their hash (written once per hash) and return the hash."""
+    digest = calendar_hash(events)
+    if calendar_cache.get(digest) is None:
+        store.put_calendar(digest, events)
+        calendar_cache.put(digest, events)
+    if summary_precomputer is not None:
+        summary_precomputer.calendar_changed(user_id, events)
+    return digest
+
+
+def load_calendar(digest):
+    """The events stored for a calendar hash, or None if the hash is unknown."""
+    events = calendar_cache.get(digest)
+    if events is None:
+        events = store.get_calendar(digest)
+        if events is not None:
+            calendar_cache.put(digest, events)
+    return events
+
+
+def attach_calendar(data):
+    """Older clients embed calendarEvents in every reading; store them by hash instead."""
+    events = data.get("calendarEvents")
+    if isinstance(events, list) and not data.get("calendarHash"):
+        data["calendarHash"] = save_calendar(data["userId"], events)
+
+
+def read_state(user_id):
+    """The cached or stored state doc for user_id, or None; a legacy doc is migrated on first read."""
+    doc = state_cache.get(user_id)
+    if doc is not None:
+        return doc
+    found = store.get_state(user_id, LEGACY_STATE_FIELDS)
+    if not found:
+        return None
+    doc = state_doc(found)
+    events = found.get("calendarEvents")
+    if isinstance(events, list) and not doc["calendarHash"]:
+        # Store the embedded events by hash; the upsert also drops the old field.
+        doc["calendarHash"] = save_calendar(user_id, events)
+        store.upsert_state(doc)
+    state_cache.put(user_id, doc)
+    return doc
+
+
+def public_doc(doc):
+    """The state as clients see it: state fields plus the resolved calendarEvents."""
+    digest = doc.get("calendarHash")
+    events = load_calendar(digest) if digest else None
+    return {**{name: doc.get(name) for name in STATE_FIELDS}, "calendarEvents": events}
+
+
+def state_etag(doc):
+    """Strong validator for GET /weather; calendarHash covers the calendar contents."""
+    body = json.dumps([doc.get(name) for name in STATE_FIELDS], separators=(",", ":"))
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()[:32]
+
+
+def parse_time(value, default=None):
+    """Parse epoch seconds or an ISO 8601 string into an aware UTC datetime."""
+    if value is None or value == "":
+        return default
+    try:
+        return datetime.fromtimestamp(float(value), tz=timezone.utc)
+    except (TypeError, ValueError, OverflowError, OSError):
+        pass
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return default
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def as_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def as_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ("true", "open", "1", "yes")
+    return bool(value)
+
+
+def history_doc(data, received_at):
+    """One time-series reading with typed fields; `ts` is the device time when sent."""
+    return {
+        "ts": parse_time(data.get("ts"), received_at),
+        "userId": data.get("userId"),
+        "doorStatus": data.get("doorStatus"),
+        "doorOpen": as_bool(data.get("doorStatus")),
+        "walkThrough": as_bool(data.get("walkThroughStatus")),
+        "indoorTemp": as_float(data.get("indoorTemp")),
+        "humidity": as_float(data.get("humidity")),
+    }
+
+
+@app.errorhandler(WireError)
+def wire_error(exc):
+    return jsonify({"error": str(exc)}), exc.status
+
+
+def read_body():
+    """The request body as JSON or msgpack, gzip/zstd-decoded; None if it does not parse."""
+    return decode(request.get_data(), request.content_type, request.headers.get("Content-Encoding"))
+
+
+def negotiate():
+    """(content type, content coding) for the response, from Accept and Accept-Encoding."""
+    content_type = request.accept_mimetypes.best_match(media_types(), JSON_TYPE)
+    coding = request.accept_encodings.best_match(content_codings() + [IDENTITY], IDENTITY)
+    return content_type, coding
+
+
+def variant_etag(etag, content_type, coding):
+    """Strong ETags differ per representation; plain JSON keeps the bare state hash."""
+    if content_type == JSON_TYPE and coding == IDENTITY:
+        return etag
+    return f"{etag}-{'m' if is_msgpack(content_type) else 'j'}{'' if coding == IDENTITY else coding}"
+
+
+def respond(body, status=200, negotiated=None):
+    """jsonify(), unless the client accepts msgpack or a compressed body."""
+    content_type, coding = negotiated or negotiate()
+    if content_type == JSON_TYPE and coding == IDENTITY:
+        response = jsonify(body)
+    else:
+        payload, applied = encode(body, content_type, coding)
+        response = Response(payload, content_type=content_type)
+        if applied != IDENTITY:
+            response.headers["Content-Encoding"] = applied
+    response.status_code = status
+    response.vary.update(("Accept", "Accept-Encoding"))
+    return response
 
-db = client["alexaDB"]                # database name (will be created automatically)
-collection = db["weatherState"]       # collection name
 
 @app.route("/weather", methods=["POST"])
 def send_data():
-    data = request.get_json(force=True, silent=True) or {}
+    data = read_body()
+    data = normalize_reading(data) if isinstance(data, dict) else {}
+
+    missing = missing_fields(data)
+    if missing:
+        return jsonify({"error": f"Missing fields: {', '.join(missing)}"}), 400
+
+    attach_calendar(data)
+    doc = state_doc(data)
+    store.upsert_state(doc)
+    state_cache.put(doc["userId"], doc)
+    publish(doc["userId"], public_doc(doc))
+    store.append_history([history_doc(data, datetime.now(timezone.utc))])
+
+    body = {"status": "ok", **doc}
+    if doc["calendarHash"] and load_calendar(doc["calendarHash"]) is None:
+        # e.g. the server lost its calendars; the device re-uploads on seeing this.
+        body["calendarMissing"] = True
+    return respond(body)
+
+
+@app.route("/weather/calendar", methods=["PUT", "POST"])
+def put_calendar():
+    """Upload a user's calendar once per change; door readings then carry only its hash."""
+    data = read_body()
+    data = data if isinstance(data, dict) else {}
     user_id = data.get("userId")
-    door_status = data.get("doorStatus")
-    walk_through_status = data.get("walkThroughStatus")
-    indoor_temp = data.get("indoorTemp")
-    humidity = data.get("humidity")
-    calendar_events = data.get("calendarEvents")
-
-    missing_fields = [
-        name for name, value in [
-            ("userId", user_id),
-            ("doorStatus", door_status),
-            ("walkThroughStatus", walk_through_status),
-            ("indoorTemp", indoor_temp),
-            ("humidity", humidity),
-        ]
-        if value is None or (name == "userId" and not value)
-    ]
+    events = data.get("calendarEvents")
+    if not user_id or not isinstance(events, list):
+        return jsonify({"error": "Expected userId and a calendarEvents list"}), 400
+    if len(events) > MAX_CALENDAR_EVENTS:
+        return jsonify({"error": f"Too many events (max {MAX_CALENDAR_EVENTS})"}), 413
 
-    if missing_fields:
-        return jsonify({"error": f"Missing fields: {', '.join(missing_fields)}"}), 400
-
-    collection.update_one(
-        {"userId": user_id},
-        {
-            "$set": {
-                "userId": user_id,
-                "doorStatus": door_status,
-                "walkThroughStatus": walk_through_status,
-                "indoorTemp": indoor_temp,
-                "humidity": humidity,
-                "calendarEvents": calendar_events,
-            }
-        },
-        upsert=True
-    )
+    digest = save_calendar(user_id, events)
+    current = read_state(user_id)
+    if current and current.get("calendarHash") != digest:
+        # Point the existing state at the new calendar now rather than at the next door event.
+        doc = {**{name: current.get(name) for name in STATE_FIELDS}, "calendarHash": digest}
+        store.upsert_state(doc)
+        state_cache.put(user_id, doc)
+        publish(user_id, public_doc(doc))
+
+    return respond({"status": "ok", "calendarHash": digest})
+
+
+def parse_batch_body():
+    """Return a list of readings (or per-line parse errors) from a JSON / msgpack array or NDJSON body."""
+    if request.mimetype in ("application/x-ndjson", "application/jsonl", "application/json-seq"):
+        items = []
+        text = decompress(request.get_data(), request.headers.get("Content-Encoding")).decode("utf-8", "replace")
+        for line in text.splitlines():
+            line = line.strip().lstrip("\x1e")
+            if not line:
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError as exc:
+                items.append(ValueError(f"Invalid JSON: {exc}"))
+        return items
+
+    data = read_body()
+    if isinstance(data, dict) and isinstance(data.get("readings"), list):
+        data = data["readings"]
+    return data if isinstance(data, list) else None
 
-    return jsonify({
-        "status": "ok",
-        "userId": user_id,
-        "doorStatus": door_status,
-        "walkThroughStatus": walk_through_status,
-        "indoorTemp": indoor_temp,
-        "humidity": humidity,
-        "calendarEvents": calendar_events,
-    }), 200
+
+@app.route("/weather/batch", methods=["POST"])
+def send_batch():
+    """Upsert many readings in one bulk store write; returns per-item status."""
+    items = parse_batch_body()
+    if items is None:
+        return jsonify({"error": "Expected a JSON array or NDJSON body"}), 400
+    if len(items) > MAX_BATCH_ITEMS:
+        return jsonify({"error": f"Batch too large (max {MAX_BATCH_ITEMS} items)"}), 413
+
+    results = []
+    latest = {}  # userId -> index of that user's last valid reading
+    for index, item in enumerate(items):
+        if isinstance(item, Exception):
+            results.append({"index": index, "status": "error", "error": str(item)})
+            continue
+        if not isinstance(item, dict):
+            results.append({"index": index, "status": "error", "error": "Reading must be an object"})
+            continue
+        normalize_reading(item)
+        missing = missing_fields(item)
+        if missing:
+            results.append({"index": index, "status": "error", "error": f"Missing fields: {', '.join(missing)}"})
+            continue
+        if item["userId"] in latest:
+            # Unordered writes to one user could land in any order; only the newest is written.
+            results[latest[item["userId"]]]["status"] = "superseded"
+        latest[item["userId"]] = index
+        results.append({"index": index, "status": "ok", "userId": item["userId"]})
+
+    written_index = list(latest.values())
+    for index in written_index:
+        attach_calendar(items[index])
+    errors = store.bulk_upsert_states([state_doc(items[index]) for index in written_index])
+    for index in written_index:
+        user_id = items[index]["userId"]
+        if user_id in errors:
+            # A store failure, not a bad reading: the client should keep it and send it again.
+            results[index].update(status="error", error=errors[user_id], retryable=True)
+            state_cache.invalidate(user_id)
+        else:
+            doc = state_doc(items[index])
+            state_cache.put(user_id, doc)
+            publish(user_id, public_doc(doc))
+
+    # History keeps every valid reading, including ones superseded in the state upsert, up to
+    # the first retryable error: the client resends everything from there on, and those
+    # readings are recorded when they arrive again rather than once per attempt.
+    resent_from = min((result["index"] for result in results if result.get("retryable")), default=len(results))
+    received_at = datetime.now(timezone.utc)
+    readings = [
+        history_doc(items[result["index"]], received_at)
+        for result in results[:resent_from] if result["status"] in ("ok", "superseded")
+    ]
+    if readings:
+        store.append_history(readings)
+
+    written = sum(1 for result in results if result["status"] == "ok")
+    failed = sum(1 for result in results if result["status"] == "error")
+    return respond({"status": "ok", "written": written, "failed": failed, "results": results})
 
 
 @app.route("/weather", methods=["GET"])
 def get_data():
     user_id = request.args.get("userId", "default")
-    doc = collection.find_one({"userId": user_id})
-    if not doc:
+    doc = read_state(user_id)
+    if doc is None:
         return jsonify({"error": "not found"}), 404
 
+    negotiated = negotiate()
+    etag = variant_etag(state_etag(doc), *negotiated)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304, headers={"ETag": f'"{etag}"', "Cache-Control": "no-cache"})
+        response.vary.update(("Accept", "Accept-Encoding"))
+        return response
+    response = respond(public_doc(doc), negotiated=negotiated)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+@app.route("/weather/history", methods=["GET"])
+def get_history():
+    """Downsampled readings for one user between `from` and `to`, bucketed by `resolution`."""
+    user_id = request.args.get("userId")
+    if not user_id:
+        return jsonify({"error": "Missing userId"}), 400
+
+    resolution = request.args.get("resolution", "1h")
+    if resolution not in HISTORY_RESOLUTIONS:
+        return jsonify({"error": f"resolution must be one of {', '.join(HISTORY_RESOLUTIONS)}"}), 400
+    unit, bin_size = HISTORY_RESOLUTIONS[resolution]
+
+    end = parse_time(request.args.get("to"), datetime.now(timezone.utc))
+    start = parse_time(request.args.get("from"), end - DEFAULT_HISTORY_WINDOW)
+    if start >= end:
+        return jsonify({"error": "from must be earlier than to"}), 400
+    buckets = (end - start).total_seconds() / (RESOLUTION_SECONDS[unit] * bin_size)
+    if buckets > MAX_HISTORY_POINTS:
+        return jsonify({"error": f"Range too large for {resolution} resolution (max {MAX_HISTORY_POINTS} points)"}), 400
+
+    points = [
+        {**bucket, "ts": bucket["ts"].isoformat()}
+        for bucket in store.query_history(user_id, start, end, unit, bin_size)
+    ]
+
     return jsonify({
-        "userId": doc["userId"],
-        "doorStatus": doc.get("doorStatus"),
-        "walkThroughStatus": doc.get("walkThroughStatus"),
-        "indoorTemp": doc.get("indoorTemp"),
-        "humidity": doc.get("humidity"),
-        "calendarEvents": doc.get("calendarEvents"),
+        "userId": user_id,
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "resolution": resolution,
+        "points": points,
     }), 200
 
 
+def sse_event(event_id, doc):
+    return f"id: {event_id}\nevent: state\ndata: {json.dumps(doc, separators=(',', ':'))}\n\n"
+
+
+@app.route("/weather/stream", methods=["GET"])
+def stream_data():
+    """Server-Sent Events: the current state, then every accepted update for userId."""
+    user_id = request.args.get("userId")
+    if not user_id:
+        return jsonify({"error": "Missing userId"}), 400
+    subscription = broker.subscribe(user_id)
+    if subscription is None:
+        return jsonify({"error": "Too many stream subscribers"}), 503
+
+    def events():
+        try:
+            current = read_state(user_id)
+            if current:
+                yield sse_event(0, public_doc(current))
+            while True:
+                event = subscription.get(STREAM_HEARTBEAT_SEC)
+                if event is None:
+                    # Comment line keeps proxies from closing an idle stream.
+                    yield ": keepalive\n\n"
+                    continue
+                yield sse_event(*event)
+        finally:
+            broker.unsubscribe(subscription)
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/weather/cache", methods=["GET"])
+def cache_stats():
+    return jsonify(state_cache.stats()), 200
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+
+@app.route("/metrics/profile", methods=["GET"])
+def metrics_profile():
+    """Collapsed stacks from the sampling profiler (flamegraph.pl / speedscope input)."""
+    if profiler is None:
+        return jsonify({"error": "Profiler not enabled; set WEATHER_PROFILE_MS"}), 404
+    return Response(profiler.collapsed(), mimetype="text/plain")
+
+
 
 if __name__ == "__main__":
-    # runs on http://localhost:5000
-    app.run(host="0.0.0.0", port=8000, debug=True)
+    # Development server on http://localhost:8000; see wsgi.py for production.
+    app.run(host="0.0.0.0", port=8000, debug=DEBUG, threaded=True)
@@ -0,0 +1,491 @@
+"""
+Storage backends for weatherApp: MongoDB, SQLite and an in-process dict.
+
+Every backend stores the latest state document per user plus an append-only
+history of readings, and answers bucketed history queries. Calendars are
+stored once per content hash; state documents refer to them by calendarHash. Routes only talk
+to the WeatherStore interface; create_store() picks the implementation.
+
+State documents are the dicts built by weatherApp.state_doc(); history
+readings are the dicts built by weatherApp.history_doc() (`ts` is an aware
+UTC datetime). query_history() returns one dict per non-empty bucket with
+keys ts, samples, indoorTemp, indoorTempMin, indoorTempMax, humidity,
+doorOpenRatio, walkThroughs and doorStatus (the last status in the bucket).
+"""
+
+import json
+import sqlite3
+from abc import ABC, abstractmethod
+import threading
+import time
+from bisect import insort
+from datetime import datetime, timezone
+
+RESOLUTION_SECONDS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+EPOCH = datetime(1970, 1, 1)          # Naive, as BSON dates decode; the server reads it as UTC
+
+
+class WeatherStore(ABC):
+    """Interface shared by all backends."""
+
+    name = "base"
+
+    @abstractmethod
+    def upsert_state(self, doc):
+        """Insert or replace the state doc for doc["userId"]."""
+
+    @abstractmethod
+    def bulk_upsert_states(self, docs):
+        """Upsert many state docs (at most one per userId); return {userId: error} for failures."""
+
+    @abstractmethod
+    def get_state(self, user_id, fields=None):
+        """Return the state doc for user_id (only `fields`, when given), or None."""
+
+    @abstractmethod
+    def append_history(self, readings):
+        """Append history readings."""
+
+    @abstractmethod
+    def query_history(self, user_id, start, end, unit, bin_size):
+        """Bucket user_id's readings in [start, end) into epoch-aligned bins of bin_size units."""
+
+    @abstractmethod
+    def put_calendar(self, calendar_hash, events):
+        """Store the event list for calendar_hash; a no-op if it is already stored."""
+
+    @abstractmethod
+    def get_calendar(self, calendar_hash):
+        """Return the event list stored for calendar_hash, or None."""
+
+    def close(self):
+        pass
+
+
+def _project(doc, fields):
+    return {name: doc[name] for name in fields if name in doc} if fields else doc
+
+
+def _bucket_start(ts, bin_seconds):
+    epoch = ts.timestamp()
+    return datetime.fromtimestamp(epoch - (epoch % bin_seconds), tz=timezone.utc)
+
+
+class MongoStore(WeatherStore):
+    """Indexes are provisioned on startup: a unique userId index on the state
+    collection (every state read and upsert filters on userId) and (userId, ts)
+    on history. Calendars are looked up by _id. Duplicate state docs left by
+    older unindexed upserts are removed only by dedupe_states.py, never on
+    startup. test_indexes.py checks the hot queries against the indexes."""
+
+    name = "mongo"
+    STATE_INDEX = "userId_unique"
+    # Upserts drop the event list state docs embedded before calendars were stored by hash.
+    LEGACY_UNSET = {"calendarEvents": ""}
+
+    def __init__(self, uri, db_name="alexaDB", state_collection="weatherState",
+                 history_collection="weatherHistory", calendar_collection="weatherCalendars",
+                 client=None, **client_options):
+        from pymongo import MongoClient
+
+        # `client` lets a check script pass an existing client (e.g. mongomock) instead of a URI.
+        self.client = client if client is not None else MongoClient(uri, **client_options)
+        self.db = self.client[db_name]
+        self.collection = self.db[state_collection]
+        self.calendars = self.db[calendar_collection]
+        self._ensure_state_index()
+        self.history = self._ensure_history_collection(history_collection)
+
+    def _ensure_state_index(self):
+        """Create the unique userId index; with duplicate state docs, warn and keep a plain one."""
+        from pymongo import ASCENDING
+        from pymongo.errors import DuplicateKeyError
+
+        stale = []
+        for name, index in self.collection.index_information().items():
+            if [tuple(key) for key in index["key"]] == [("userId", 1)]:
+                if index.get("unique"):
+                    return True
+                stale.append(name)
+        for name in stale:
+            # A plain userId index has the same keys; it would block creating the unique one.
+            self.collection.drop_index(name)
+        try:
+            self.collection.create_index([("userId", ASCENDING)], unique=True, name=self.STATE_INDEX)
+            return True
+        except DuplicateKeyError:
+            # Deleting documents is not something to do from every worker's startup;
+            # reads stay indexed until dedupe_states.py has been run once.
+            print(f"{self.collection.name} has duplicate userId documents; run dedupe_states.py. "
+                  "Keeping a non-unique userId index until then.")
+            self.collection.create_index([("userId", ASCENDING)])
+            return False
+
+    def remove_duplicate_states(self, dry_run=False):
+        """Keep the oldest doc per userId, delete the rest, then add the unique index.
+
+        A one-off migration (see dedupe_states.py). Without an index, find_one and
+        update_one hit the first match in natural order, which is the oldest
+        insert, so that is the doc that has been read and kept current. Returns
+        how many docs were (or, with dry_run, would be) deleted.
+        """
+        pipeline = [
+            {"$sort": {"_id": 1}},
+            {"$group": {"_id": "$userId", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+            {"$match": {"count": {"$gt": 1}}},
+        ]
+        removed = 0
+        for _ in range(2):
+            extra = [doc_id for group in self.collection.aggregate(pipeline, allowDiskUse=True)
+                     for doc_id in group["ids"][1:]]
+            if dry_run:
+                return len(extra)
+            if extra:
+                self.collection.delete_many({"_id": {"$in": extra}})
+            removed += len(extra)
+            if self._ensure_state_index():
+                return removed
+            # Another unindexed upsert inserted a duplicate meanwhile; sweep once more.
+        raise RuntimeError(f"{self.collection.name} still has duplicate userId documents")
+
+    def _ensure_history_collection(self, name):
+        """Create the time-series history collection and its (userId, ts) index if missing."""
+        from pymongo import ASCENDING
+        from pymongo.errors import CollectionInvalid, OperationFailure
+
+        if name not in self.db.list_collection_names():
+            try:
+                self.db.create_collection(
+                    name,
+                    timeseries={"timeField": "ts", "metaField": "userId", "granularity": "seconds"},
+                )
+            except (CollectionInvalid, OperationFailure):
+                # Pre-5.0 servers have no time-series collections; a plain one works with the same
+                # index, and query_history() only needs 4.0 operators.
+                pass
+        history = self.db[name]
+        history.create_index([("userId", ASCENDING), ("ts", ASCENDING)])
+        return history
+
+    def upsert_state(self, doc):
+        self.collection.update_one({"userId": doc["userId"]}, {"$set": doc, "$unset": self.LEGACY_UNSET},
+                                   upsert=True)
+
+    def bulk_upsert_states(self, docs):
+        from pymongo import UpdateOne
+        from pymongo.errors import BulkWriteError
+
+        if not docs:
+            return {}
+        operations = [UpdateOne({"userId": doc["userId"]}, {"$set": doc, "$unset": self.LEGACY_UNSET}, upsert=True)
+                      for doc in docs]
+        try:
+            self.collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as exc:
+            return {
+                docs[error["index"]]["userId"]: error.get("errmsg", "write failed")
+                for error in exc.details.get("writeErrors", [])
+            }
+        return {}
+
+    def get_state(self, user_id, fields=None):
+        projection = {"_id": 0, **{name: 1 for name in fields}} if fields else {"_id": 0}
+        return self.collection.find_one({"userId": user_id}, projection)
+
+    def append_history(self, readings):
+        if readings:
+            self.history.insert_many(readings, ordered=False)
+
+    def query_history(self, user_id, start, end, unit, bin_size):
+        # Buckets are aligned to the Unix epoch on epoch millis, like the other backends.
+        # Date arithmetic works on every server version, where $dateTrunc would need 5.0.
+        bin_ms = RESOLUTION_SECONDS[unit] * bin_size * 1000
+        epoch_ms = {"$subtract": ["$ts", EPOCH]}
+        pipeline = [
+            {"$match": {"userId": user_id, "ts": {"$gte": start, "$lt": end}}},
+            {"$sort": {"ts": 1}},
+            {"$group": {
+                "_id": {"$subtract": ["$ts", {"$mod": [epoch_ms, bin_ms]}]},
+                "samples": {"$sum": 1},
+                "indoorTemp": {"$avg": "$indoorTemp"},
+                "indoorTempMin": {"$min": "$indoorTemp"},
+                "indoorTempMax": {"$max": "$indoorTemp"},
+                "humidity": {"$avg": "$humidity"},
+                "doorOpenRatio": {"$avg": {"$cond": ["$doorOpen", 1, 0]}},
+                "walkThroughs": {"$sum": {"$cond": ["$walkThrough", 1, 0]}},
+                "doorStatus": {"$last": "$doorStatus"},
+            }},
+            {"$sort": {"_id": 1}},
+        ]
+        buckets = []
+        for bucket in self.history.aggregate(pipeline):
+            ts = bucket.pop("_id")
+            if ts.tzinfo is None:
+                ts = ts.replace(tzinfo=timezone.utc)
+            buckets.append({"ts": ts, **bucket})
+        return buckets
+
+    def put_calendar(self, calendar_hash, events):
+        # Content-addressed, so an existing document never needs rewriting.
+        self.calendars.update_one(
+            {"_id": calendar_hash},
+            {"$setOnInsert": {"events": events, "createdAt": datetime.now(timezone.utc)}},
+            upsert=True,
+        )
+
+    def get_calendar(self, calendar_hash):
+        doc = self.calendars.find_one({"_id": calendar_hash}, {"events": 1})
+        return doc["events"] if doc is not None else None
+
+    def close(self):
+        self.client.close()
+
+
+class SqliteStore(WeatherStore):
+    """SQLite in WAL mode; one connection per thread, parameterised statements
+    so sqlite3's per-connection statement cache reuses the prepared queries."""
+
+    name = "sqlite"
+
+    UPSERT_STATE = (
+        "INSERT INTO weather_state (user_id, doc) VALUES (?, ?) "
+        "ON CONFLICT(user_id) DO UPDATE SET doc = excluded.doc"
+    )
+    SELECT_STATE = "SELECT doc FROM weather_state WHERE user_id = ?"
+    INSERT_CALENDAR = "INSERT OR IGNORE INTO weather_calendar (hash, events) VALUES (?, ?)"
+    SELECT_CALENDAR = "SELECT events FROM weather_calendar WHERE hash = ?"
+    INSERT_HISTORY = (
+        "INSERT INTO weather_history (user_id, ts, door_status, door_open, walk_through, indoor_temp, humidity) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)"
+    )
+    # Buckets are aligned to the Unix epoch, as in MongoStore.query_history().
+    SELECT_HISTORY = (
+        "SELECT CAST(ts / ? AS INTEGER) AS bucket, COUNT(*), AVG(indoor_temp), MIN(indoor_temp), "
+        "MAX(indoor_temp), AVG(humidity), AVG(door_open), SUM(walk_through) "
+        "FROM weather_history WHERE user_id = ? AND ts >= ? AND ts < ? "
+        "GROUP BY bucket ORDER BY bucket"
+    )
+    SELECT_LAST_STATUS = (
+        "SELECT bucket, door_status FROM ("
+        " SELECT CAST(ts / ? AS INTEGER) AS bucket, door_status,"
+        " ROW_NUMBER() OVER (PARTITION BY CAST(ts / ? AS INTEGER) ORDER BY ts DESC, rowid DESC) AS rn"
+        " FROM weather_history WHERE user_id = ? AND ts >= ? AND ts < ?"
+        ") WHERE rn = 1"
+    )
+
+    def __init__(self, path="weather.db"):
+        self.path = str(path)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(
+            "CREATE TABLE IF NOT EXISTS weather_state ("
+            " user_id TEXT PRIMARY KEY,"
+            " doc TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS weather_history ("
+            " user_id TEXT NOT NULL,"
+            " ts REAL NOT NULL,"
+            " door_status TEXT,"
+            " door_open INTEGER,"
+            " walk_through INTEGER,"
+            " indoor_temp REAL,"
+            " humidity REAL);"
+            "CREATE INDEX IF NOT EXISTS weather_history_user_ts ON weather_history (user_id, ts);"
+            "CREATE TABLE IF NOT EXISTS weather_calendar ("
+            " hash TEXT PRIMARY KEY,"
+            " events TEXT NOT NULL);"
+        )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, cached_statements=64)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def upsert_state(self, doc):
+        with self._conn() as conn:
+            conn.execute(self.UPSERT_STATE, (doc["userId"], json.dumps(doc)))
+
+    def bulk_upsert_states(self, docs):
+        try:
+            with self._conn() as conn:
+                conn.executemany(self.UPSERT_STATE, [(doc["userId"], json.dumps(doc)) for doc in docs])
+        except sqlite3.Error as exc:
+            return {doc["userId"]: str(exc) for doc in docs}
+        return {}
+
+    def get_state(self, user_id, fields=None):
+        row = self._conn().execute(self.SELECT_STATE, (user_id,)).fetchone()
+        return _project(json.loads(row[0]), fields) if row else None
+
+    def append_history(self, readings):
+        rows = [
+            (r["userId"], r["ts"].timestamp(), r["doorStatus"], int(r["doorOpen"]), int(r["walkThrough"]),
+             r["indoorTemp"], r["humidity"])
+            for r in readings
+        ]
+        with self._conn() as conn:
+            conn.executemany(self.INSERT_HISTORY, rows)
+
+    def query_history(self, user_id, start, end, unit, bin_size):
+        bin_seconds = RESOLUTION_SECONDS[unit] * bin_size
+        bounds = (user_id, start.timestamp(), end.timestamp())
+        conn = self._conn()
+        last_status = dict(conn.execute(self.SELECT_LAST_STATUS, (bin_seconds, bin_seconds) + bounds))
+        return [
+            {
+                "ts": datetime.fromtimestamp(bucket * bin_seconds, tz=timezone.utc),
+                "samples": samples,
+                "indoorTemp": temp_avg,
+                "indoorTempMin": temp_min,
+                "indoorTempMax": temp_max,
+                "humidity": humidity,
+                "doorOpenRatio": door_open,
+                "walkThroughs": walk_throughs,
+                "doorStatus": last_status.get(bucket),
+            }
+            for bucket, samples, temp_avg, temp_min, temp_max, humidity, door_open, walk_throughs
+            in conn.execute(self.SELECT_HISTORY, (bin_seconds,) + bounds)
+        ]
+
+    def put_calendar(self, calendar_hash, events):
+        with self._conn() as conn:
+            conn.execute(self.INSERT_CALENDAR, (calendar_hash, json.dumps(events)))
+
+    def get_calendar(self, calendar_hash):
+        row = self._conn().execute(self.SELECT_CALENDAR, (calendar_hash,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class MemoryStore(WeatherStore):
+    """Dict-backed store for local load tests and Mongo-less edge deployments."""
+
+    name = "memory"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._states = {}
+        self._history = {}  # userId -> list of (epoch, seq, reading), kept sorted
+        self._calendars = {}
+        self._seq = 0
+
+    def upsert_state(self, doc):
+        with self._lock:
+            self._states.setdefault(doc["userId"], {}).update(doc)
+
+    def bulk_upsert_states(self, docs):
+        for doc in docs:
+            self.upsert_state(doc)
+        return {}
+
+    def get_state(self, user_id, fields=None):
+        with self._lock:
+            doc = self._states.get(user_id)
+            return dict(_project(doc, fields)) if doc is not None else None
+
+    def append_history(self, readings):
+        with self._lock:
+            for reading in readings:
+                self._seq += 1
+                insort(self._history.setdefault(reading["userId"], []),
+                       (reading["ts"].timestamp(), self._seq, reading))
+
+    def query_history(self, user_id, start, end, unit, bin_size):
+        bin_seconds = RESOLUTION_SECONDS[unit] * bin_size
+        lo, hi = start.timestamp(), end.timestamp()
+        with self._lock:
+            rows = [r for epoch, _, r in self._history.get(user_id, []) if lo <= epoch < hi]
+
+        buckets = {}
+        for reading in rows:
+            key = _bucket_start(reading["ts"], bin_seconds)
+            buckets.setdefault(key, []).append(reading)
+
+        result = []
+        for ts in sorted(buckets):
+            readings = buckets[ts]
+            temps = [r["indoorTemp"] for r in readings if r["indoorTemp"] is not None]
+            humidities = [r["humidity"] for r in readings if r["humidity"] is not None]
+            result.append({
+                "ts": ts,
+                "samples": len(readings),
+                "indoorTemp": sum(temps) / len(temps) if temps else None,
+                "indoorTempMin": min(temps) if temps else None,
+                "indoorTempMax": max(temps) if temps else None,
+                "humidity": sum(humidities) / len(humidities) if humidities else None,
+                "doorOpenRatio": sum(1 for r in readings if r["doorOpen"]) / len(readings),
+                "walkThroughs": sum(1 for r in readings if r["walkThrough"]),
+                "doorStatus": readings[-1]["doorStatus"],
+            })
+        return result
+
+    def put_calendar(self, calendar_hash, events):
+        with self._lock:
+            self._calendars.setdefault(calendar_hash, list(events))
+
+    def get_calendar(self, calendar_hash):
+        with self._lock:
+            events = self._calendars.get(calendar_hash)
+            return list(events) if events is not None else None
+
+
+class TimedStore(WeatherStore):
+    """Wraps a backend and reports every call as observe(operation, seconds, failed)."""
+
+    def __init__(self, store, observe):
+        self.store = store
+        self.observe = observe
+        self.name = store.name
+
+    def _call(self, operation, *args):
+        start = time.perf_counter()
+        try:
+            result = getattr(self.store, operation)(*args)
+        except Exception:
+            self.observe(operation, time.perf_counter() - start, True)
+            raise
+        self.observe(operation, time.perf_counter() - start, False)
+        return result
+
+    def upsert_state(self, doc):
+        return self._call("upsert_state", doc)
+
+    def bulk_upsert_states(self, docs):
+        return self._call("bulk_upsert_states", docs)
+
+    def get_state(self, user_id, fields=None):
+        return self._call("get_state", user_id, fields)
+
+    def append_history(self, readings):
+        return self._call("append_history", readings)
+
+    def query_history(self, user_id, start, end, unit, bin_size):
+        return self._call("query_history", user_id, start, end, unit, bin_size)
+
+    def put_calendar(self, calendar_hash, events):
+        return self._call("put_calendar", calendar_hash, events)
+
+    def get_calendar(self, calendar_hash):
+        return self._call("get_calendar", calendar_hash)
+
+    def close(self):
+        self.store.close()
+
+
+def create_store(kind, **options):
+    """Build the backend named by `kind` ("mongo", "sqlite" or "memory")."""
+    if kind == "mongo":
+        return MongoStore(options.pop("uri"), **options)
+    if kind == "sqlite":
+        return SqliteStore(**options)
+    if kind == "memory":
+        return MemoryStore()
+    raise ValueError(f"Unknown storage backend: {kind}")
@@ -0,0 +1,170 @@
+"""
+In-process pub/sub fan-out of accepted state updates to stream subscribers.
+
+Each subscriber owns a bounded buffer; when a slow consumer falls behind, its
+oldest undelivered updates are dropped (and counted) instead of blocking the
+publisher or growing memory. Only the latest state matters to consumers, so
+the newest update is always kept.
+
+The broker lives in one server process. With several gunicorn workers,
+updates go through a SqliteRelay instead: every worker appends what it
+accepts to a shared SQLite file and polls it for everyone's updates, which
+it then fans out to its own subscribers. Each open stream holds one worker
+thread, so subscribers are capped below WEATHER_THREADS (see weatherApp).
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+
+
+class Subscription:
+    def __init__(self, user_id, max_buffer):
+        self.user_id = user_id
+        self.dropped = 0
+        self._buffer = deque(maxlen=max_buffer)
+        self._cond = threading.Condition()
+
+    def push(self, event):
+        with self._cond:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.dropped += 1
+            self._buffer.append(event)
+            self._cond.notify()
+
+    def get(self, timeout):
+        """Return the next event, or None if nothing arrived within `timeout` seconds."""
+        with self._cond:
+            if not self._buffer:
+                self._cond.wait(timeout)
+            return self._buffer.popleft() if self._buffer else None
+
+
+class StateBroker:
+    def __init__(self, max_buffer=16, max_subscribers=256):
+        self.max_buffer = max_buffer
+        self.max_subscribers = max_subscribers
+        self._lock = threading.Lock()
+        self._subscribers = {}  # userId -> set of Subscription
+        self._count = 0
+        self._seq = 0
+
+    def subscribe(self, user_id):
+        """Register a subscriber for user_id; returns None when the broker is full."""
+        subscription = Subscription(user_id, self.max_buffer)
+        with self._lock:
+            if self._count >= self.max_subscribers:
+                return None
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+            self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers and subscription in subscribers:
+                subscribers.discard(subscription)
+                self._count -= 1
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def publish(self, user_id, doc, seq=None):
+        """Fan a state doc out to user_id's subscribers; returns how many received it.
+
+        `seq` is the event id to send; a relay passes its own so ids agree across workers.
+        """
+        with self._lock:
+            self._seq = self._seq + 1 if seq is None else seq
+            event = (self._seq, doc)
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscription in subscribers:
+            subscription.push(event)
+        return len(subscribers)
+
+    @property
+    def subscriber_count(self):
+        return self._count
+
+
+class SqliteRelay:
+    """Carries published updates between worker processes through one SQLite file.
+
+    publish() appends a row; a poller thread in every process reads the rows
+    added since its last poll and hands them to deliver(user_id, doc, seq),
+    its own included, so all workers see the updates in the same order.
+    Rows older than KEEP_SEC are pruned. Updates reach subscribers within
+    about one poll interval.
+    """
+
+    POLL_SEC = 0.1
+    KEEP_SEC = 60.0
+    PRUNE_EVERY_SEC = 10.0
+
+    def __init__(self, path, deliver, poll_sec=POLL_SEC):
+        self.path = str(path)
+        self.deliver = deliver
+        self.poll_sec = poll_sec
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS stream_events ("
+                " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " user_id TEXT NOT NULL,"
+                " doc TEXT NOT NULL,"
+                " created REAL NOT NULL)"
+            )
+        self._last_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM stream_events").fetchone()[0]
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stream-relay", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopping.set()
+
+    def publish(self, user_id, doc):
+        with self._conn() as conn:
+            conn.execute("INSERT INTO stream_events (user_id, doc, created) VALUES (?, ?, ?)",
+                         (user_id, json.dumps(doc, separators=(",", ":")), time.time()))
+
+    def poll(self):
+        """Deliver the rows added since the last poll; returns how many there were."""
+        rows = self._conn().execute(
+            "SELECT seq, user_id, doc FROM stream_events WHERE seq > ? ORDER BY seq", (self._last_seq,)
+        ).fetchall()
+        for seq, user_id, doc in rows:
+            self.deliver(user_id, json.loads(doc), seq)
+        if rows:
+            self._last_seq = rows[-1][0]
+        return len(rows)
+
+    def prune(self):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM stream_events WHERE created < ?", (time.time() - self.KEEP_SEC,))
+
+    def _run(self):
+        next_prune = time.monotonic() + self.PRUNE_EVERY_SEC
+        while not self._stopping.wait(self.poll_sec):
+            try:
+                self.poll()
+                if time.monotonic() >= next_prune:
+                    self.prune()
+                    next_prune = time.monotonic() + self.PRUNE_EVERY_SEC
+            except sqlite3.Error as exc:
+                # Most likely a lock held past the timeout; the next poll picks up where this left off.
+                print(f"Stream relay poll failed: {exc}")
@@ -0,0 +1,12 @@
+"""
+Production entry point for weatherApp.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Each gunicorn worker imports this module after forking, so every process gets
+its own storage client and connection pool (pymongo clients are not fork-safe).
+"""
+
+from weatherApp import app
+
+__all__ = ["app"]
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Keep a ready snapshot of today's calendar events, refreshed in the background.
+
+A daemon thread owns everything that talks to Google: loading and refreshing
+OAuth credentials (refreshed REFRESH_MARGIN_SEC before they expire, so no
+caller ever meets an expired token), building the Calendar service from a
+locally cached discovery document, and delta-syncing events with CalendarSync.
+Readers only ever see `refresher.snapshot`, an immutable CalendarSnapshot that
+the thread replaces with a single assignment, so reads take no lock and never
+wait on the network.
+
+    refresher = CalendarRefresher(["primary"])
+    refresher.start()
+    events = refresher.events()    # [] until the first sync completes
+"""
+
+import datetime
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from calendar_sync import CalendarSync
+
+DISCOVERY_CACHE_PATH = Path(__file__).resolve().with_name("calendar_v3_discovery.json")
+TOKEN_PATH = "token.json"      # Same relative path get_credentials() reads
+REFRESH_INTERVAL_SEC = 60      # Delta-sync cadence
+RETRY_INTERVAL_SEC = 15        # First retry after a failed refresh
+MAX_RETRY_INTERVAL_SEC = 300
+REFRESH_MARGIN_SEC = 300       # Refresh the access token this long before it expires
+
+
+class CalendarSnapshot:
+    """One immutable view of the calendar; replaced wholesale, never mutated."""
+
+    __slots__ = ("events", "synced_at", "error")
+
+    def __init__(self, events=(), synced_at=None, error=None):
+        self.events = tuple(events)
+        self.synced_at = synced_at   # time.time() of the last successful sync, or None
+        self.error = error           # Message from the last failed refresh, cleared on success
+
+
+def load_credentials():
+    """Credentials via the quickstart helper in google_calendar_events."""
+    from google_calendar_events import get_credentials
+
+    return get_credentials()
+
+
+def refresh_credentials(creds, margin_sec=REFRESH_MARGIN_SEC, token_path=TOKEN_PATH):
+    """Refresh `creds` if they expire within `margin_sec`; returns True if refreshed."""
+    if not getattr(creds, "refresh_token", None):
+        return False
+    expiry = getattr(creds, "expiry", None)   # naive UTC, as google-auth stores it
+    if expiry is None:
+        # No known expiry: only a token that is already invalid needs refreshing.
+        if getattr(creds, "valid", False):
+            return False
+    else:
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        remaining = (expiry - now).total_seconds()
+        if remaining > margin_sec:
+            return False
+    from google.auth.transport.requests import Request
+
+    creds.refresh(Request())
+    if token_path:
+        tmp_path = f"{token_path}.tmp"
+        with open(tmp_path, "w") as token:
+            token.write(creds.to_json())
+        os.replace(tmp_path, token_path)
+    return True
+
+
+def build_service(creds, discovery_path=DISCOVERY_CACHE_PATH):
+    """build("calendar", "v3") from a cached discovery document, caching it on first use."""
+    from googleapiclient.discovery import build, build_from_document
+
+    discovery_path = Path(discovery_path)
+    if discovery_path.exists():
+        try:
+            return build_from_document(discovery_path.read_text(), credentials=creds)
+        except Exception as exc:
+            print(f"Cached Calendar discovery document unusable, rebuilding: {exc}")
+
+    service = build("calendar", "v3", credentials=creds)
+    try:
+        tmp_path = discovery_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(service._rootDesc))
+        os.replace(tmp_path, discovery_path)
+    except (AttributeError, OSError, TypeError) as exc:
+        print(f"Could not cache Calendar discovery document: {exc}")
+    return service
+
+
+class CalendarRefresher:
+    def __init__(self, calendar_ids=("primary",), interval=REFRESH_INTERVAL_SEC,
+                 credentials_fn=load_credentials, service_fn=build_service, sync_factory=CalendarSync):
+        self.calendar_ids = list(calendar_ids)
+        self.interval = interval
+        self.credentials_fn = credentials_fn
+        self.service_fn = service_fn
+        self.sync_factory = sync_factory
+        self.snapshot = CalendarSnapshot()
+        self.ready = threading.Event()   # Set after the first successful sync
+        self._creds = None
+        self._sync = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="calendar-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def events(self):
+        """Today's "start: summary" strings from the latest snapshot; never blocks."""
+        return list(self.snapshot.events)
+
+    def refresh_once(self):
+        """Refresh credentials if due, sync, and publish a new snapshot."""
+        if self._creds is None:
+            self._creds = self.credentials_fn()
+        elif refresh_credentials(self._creds):
+            print("Google credentials refreshed")
+        if self._sync is None:
+            service = self.service_fn(self._creds)
+            self._sync = self.sync_factory(service, self.calendar_ids)
+        self._sync.sync()
+        self.snapshot = CalendarSnapshot(self._sync.events_for_day(), time.time())
+        self.ready.set()
+
+    def _run(self):
+        retry_sec = RETRY_INTERVAL_SEC
+        while not self._stop.is_set():
+            try:
+                self.refresh_once()
+                retry_sec = RETRY_INTERVAL_SEC
+                wait_sec = self.interval
+            except Exception as exc:
+                print(f"Calendar refresh failed: {exc}")
+                # Keep serving the last good events; only the error changes.
+                previous = self.snapshot
+                self.snapshot = CalendarSnapshot(previous.events, previous.synced_at, str(exc))
+                wait_sec = retry_sec
+                retry_sec = min(retry_sec * 2, MAX_RETRY_INTERVAL_SEC)
+            self._stop.wait(wait_sec)
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Incremental Google Calendar sync using sync tokens.
+
+The first sync of each calendar lists a window of events (from yesterday to
+SYNC_HORIZON_DAYS ahead) and stores the returned nextSyncToken; every later
+sync sends that token and receives only events that changed since. Events
+live in a local store persisted to JSON, so restarts and day boundaries do not
+force a re-list. A 410 Gone (expired token) triggers a full resync, pages
+beyond maxResults are followed, and any number of calendars can be synced.
+
+`service` is the object returned by googleapiclient's build("calendar", "v3"),
+or any fake with the same events().list(...).execute() shape.
+"""
+
+import datetime
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+
+SYNC_STATE_PATH = Path(__file__).resolve().with_name("calendar_sync_state.json")
+PAGE_SIZE = 250            # maxResults per page (API maximum is 2500)
+LOOKBACK_DAYS = 1          # Keep yesterday's events around for late readers
+SYNC_HORIZON_DAYS = 7      # Full syncs list this many days ahead
+
+
+def _parse_when(when: dict) -> Optional[datetime.datetime]:
+    """Parse an event start/end; all-day dates become local midnight."""
+    if not when:
+        return None
+    if "dateTime" in when:
+        return datetime.datetime.fromisoformat(when["dateTime"].replace("Z", "+00:00"))
+    if "date" in when:
+        return datetime.datetime.fromisoformat(when["date"]).astimezone()
+    return None
+
+
+def _is_gone(exc: Exception) -> bool:
+    """True for the 410 Gone the API returns when a sync token has expired."""
+    resp = getattr(exc, "resp", None)
+    return str(getattr(resp, "status", "")) == "410"
+
+
+def _start_of_day(day: datetime.date) -> datetime.datetime:
+    return datetime.datetime.combine(day, datetime.time()).astimezone()
+
+
+class CalendarSync:
+    def __init__(self, service, calendar_ids=("primary",), state_path=SYNC_STATE_PATH):
+        self.service = service
+        self.calendar_ids = list(calendar_ids)
+        self.state_path = Path(state_path) if state_path else None
+        self.state = self._load_state()
+        self.api_calls = 0
+
+    def _load_state(self) -> dict:
+        if self.state_path and self.state_path.exists():
+            try:
+                with open(self.state_path, "r") as f:
+                    return json.load(f)
+            except (OSError, ValueError) as exc:
+                print(f"Calendar sync state unreadable, starting fresh: {exc}")
+        return {"calendars": {}}
+
+    def _save_state(self) -> None:
+        if not self.state_path:
+            return
+        tmp_path = self.state_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def sync(self) -> bool:
+        """Bring every calendar up to date; returns True if any event changed."""
+        changed = False
+        for calendar_id in self.calendar_ids:
+            changed |= self._sync_calendar(calendar_id)
+        changed |= self._prune()
+        if changed:
+            self._save_state()
+        return changed
+
+    def _sync_calendar(self, calendar_id: str) -> bool:
+        calendar = self.state["calendars"].setdefault(calendar_id, {"syncToken": None, "events": {}})
+        today = datetime.date.today()
+        window_end = calendar.get("windowEnd")
+        if window_end and datetime.date.fromisoformat(window_end) <= today + datetime.timedelta(days=1):
+            # Events past the original window only arrive via a fresh full sync.
+            calendar["syncToken"] = None
+
+        try:
+            return self._list_changes(calendar_id, calendar, today)
+        except Exception as exc:
+            if not _is_gone(exc):
+                raise
+            print(f"Sync token for {calendar_id} expired; doing a full resync")
+            calendar["syncToken"] = None
+            return self._list_changes(calendar_id, calendar, today)
+
+    def _list_changes(self, calendar_id: str, calendar: dict, today: datetime.date) -> bool:
+        params = {
+            "calendarId": calendar_id,
+            "singleEvents": True,
+            "showDeleted": True,
+            "maxResults": PAGE_SIZE,
+        }
+        full_sync = not calendar.get("syncToken")
+        if full_sync:
+            window_start = today - datetime.timedelta(days=LOOKBACK_DAYS)
+            window_end = today + datetime.timedelta(days=SYNC_HORIZON_DAYS)
+            params["timeMin"] = _start_of_day(window_start).isoformat()
+            params["timeMax"] = _start_of_day(window_end).isoformat()
+            events: Dict[str, dict] = {}
+        else:
+            params["syncToken"] = calendar["syncToken"]
+            events = dict(calendar["events"])
+
+        changed = full_sync and bool(calendar["events"])
+        page_token = None
+        while True:
+            if page_token:
+                params["pageToken"] = page_token
+            result = self.service.events().list(**params).execute()
+            self.api_calls += 1
+            for item in result.get("items", []):
+                event_id = item.get("id")
+                if not event_id:
+                    continue
+                if item.get("status") == "cancelled":
+                    changed |= events.pop(event_id, None) is not None
+                    continue
+                record = {
+                    "summary": item.get("summary", "(No title)"),
+                    "start": item.get("start", {}),
+                    "end": item.get("end", {}),
+                }
+                changed |= events.get(event_id) != record
+                events[event_id] = record
+            page_token = result.get("nextPageToken")
+            if not page_token:
+                calendar["syncToken"] = result.get("nextSyncToken")
+                break
+
+        calendar["events"] = events
+        if full_sync:
+            calendar["windowEnd"] = window_end.isoformat()
+        return changed
+
+    def _prune(self) -> bool:
+        """Drop events that ended before the lookback window so the store stays bounded."""
+        cutoff = _start_of_day(datetime.date.today() - datetime.timedelta(days=LOOKBACK_DAYS))
+        pruned = False
+        for calendar in self.state["calendars"].values():
+            for event_id, record in list(calendar["events"].items()):
+                end = _parse_when(record["end"]) or _parse_when(record["start"])
+                if end is not None and end < cutoff:
+                    del calendar["events"][event_id]
+                    pruned = True
+        return pruned
+
+    def events_for_day(self, day: Optional[datetime.date] = None) -> List[str]:
+        """Same "start: summary" strings as get_events_for_today(), across all calendars."""
+        day = day or datetime.date.today()
+        day_start = _start_of_day(day)
+        day_end = day_start + datetime.timedelta(days=1)
+
+        selected = []
+        for calendar_id in self.calendar_ids:
+            calendar = self.state["calendars"].get(calendar_id, {"events": {}})
+            for record in calendar["events"].values():
+                start = _parse_when(record["start"])
+                end = _parse_when(record["end"]) or start
+                if start is None or not (start < day_end and end > day_start):
+                    continue
+                raw_start = record["start"].get("dateTime") or record["start"].get("date")
+                selected.append((start, raw_start, record["summary"]))
+
+        selected.sort(key=lambda item: item[0])
+        return [f"{raw_start}: {summary}" for _, raw_start, summary in selected]
@@ -0,0 +1,136 @@
+"""
+Tests for calendar_sync.CalendarSync against a fake Calendar API service.
+
+    python3 -m pytest google-calendar/test_calendar_sync.py
+"""
+
+import datetime
+
+import pytest
+
+from calendar_sync import CalendarSync
+
+
+class Gone(Exception):
+    """Shaped like googleapiclient's HttpError for a 410 (expired sync token)."""
+
+    class resp:
+        status = 410
+
+
+class FakeService:
+    """events().list(**params).execute() answers from `respond(params)` and records every call."""
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.calls = []
+
+    def events(self):
+        return self
+
+    def list(self, **params):
+        self.calls.append(dict(params))
+        return _Request(self.respond, dict(params))
+
+
+class _Request:
+    def __init__(self, respond, params):
+        self.respond = respond
+        self.params = params
+
+    def execute(self):
+        return self.respond(self.params)
+
+
+def at(hour, minute=0):
+    """An event time today in the local timezone, as the API returns it."""
+    return datetime.datetime.combine(datetime.date.today(), datetime.time(hour, minute)).astimezone().isoformat()
+
+
+def event(event_id, summary, hour):
+    return {"id": event_id, "summary": summary, "start": {"dateTime": at(hour)}, "end": {"dateTime": at(hour + 1)}}
+
+
+def cancelled(event_id):
+    return {"id": event_id, "status": "cancelled"}
+
+
+def test_full_sync_follows_next_page_token(tmp_path):
+    pages = {
+        None: {"items": [event("a", "Standup", 9)], "nextPageToken": "page-2"},
+        "page-2": {"items": [event("b", "Lab", 14)], "nextSyncToken": "sync-1"},
+    }
+    service = FakeService(lambda params: pages[params.get("pageToken")])
+    sync = CalendarSync(service, state_path=tmp_path / "state.json")
+
+    assert sync.sync() is True
+    assert [call.get("pageToken") for call in service.calls] == [None, "page-2"]
+    assert "timeMin" in service.calls[0] and "syncToken" not in service.calls[0]
+    assert sync.state["calendars"]["primary"]["syncToken"] == "sync-1"
+    assert sync.events_for_day() == [f"{at(9)}: Standup", f"{at(14)}: Lab"]
+
+    # The token and events survive a restart.
+    restarted = CalendarSync(FakeService(lambda params: {"items": [], "nextSyncToken": "sync-2"}),
+                             state_path=tmp_path / "state.json")
+    restarted.sync()
+    assert restarted.service.calls[0]["syncToken"] == "sync-1"
+    assert restarted.events_for_day() == [f"{at(9)}: Standup", f"{at(14)}: Lab"]
+
+
+def test_expired_sync_token_triggers_full_resync():
+    def respond(params):
+        if params.get("syncToken") == "old":
+            raise Gone()
+        return {"items": [event("new", "Office hours", 11)], "nextSyncToken": "fresh"}
+
+    service = FakeService(respond)
+    sync = CalendarSync(service, state_path=None)
+    sync.state["calendars"]["primary"] = {
+        "syncToken": "old",
+        "events": {"stale": event("stale", "Deleted while offline", 10)},
+        "windowEnd": (datetime.date.today() + datetime.timedelta(days=7)).isoformat(),
+    }
+
+    assert sync.sync() is True
+    assert service.calls[0]["syncToken"] == "old"
+    assert "syncToken" not in service.calls[1] and "timeMin" in service.calls[1]
+    assert sync.state["calendars"]["primary"]["syncToken"] == "fresh"
+    assert sync.events_for_day() == [f"{at(11)}: Office hours"]
+
+
+def test_other_errors_are_not_swallowed():
+    def respond(params):
+        raise RuntimeError("quota exceeded")
+
+    with pytest.raises(RuntimeError):
+        CalendarSync(FakeService(respond), state_path=None).sync()
+
+
+def test_cancelled_events_are_removed():
+    responses = iter([
+        {"items": [event("a", "Standup", 9), event("b", "Dentist", 15)], "nextSyncToken": "s1"},
+        {"items": [cancelled("b")], "nextSyncToken": "s2"},
+        {"items": [cancelled("never-seen")], "nextSyncToken": "s3"},
+    ])
+    service = FakeService(lambda params: next(responses))
+    sync = CalendarSync(service, state_path=None)
+
+    sync.sync()
+    assert sync.sync() is True
+    assert service.calls[1]["syncToken"] == "s1"
+    assert sync.events_for_day() == [f"{at(9)}: Standup"]
+    # Cancelling an event the store never had is not a change.
+    assert sync.sync() is False
+
+
+def test_calendars_are_merged_in_start_order():
+    calendars = {
+        "primary": {"items": [event("p1", "Standup", 9), event("p2", "Dinner", 18)], "nextSyncToken": "p"},
+        "class@group": {"items": [event("c1", "CSE 118 lecture", 12)], "nextSyncToken": "c"},
+    }
+    service = FakeService(lambda params: calendars[params["calendarId"]])
+    sync = CalendarSync(service, calendar_ids=["primary", "class@group"], state_path=None)
+
+    sync.sync()
+    assert sorted(call["calendarId"] for call in service.calls) == ["class@group", "primary"]
+    assert sync.events_for_day() == [f"{at(9)}: Standup", f"{at(12)}: CSE 118 lecture", f"{at(18)}: Dinner"]
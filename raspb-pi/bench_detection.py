@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Accuracy and latency benchmark for door / walk-through detection.
+
+Runs DoorDetector (through the same event path as the Pi, via replay.replay)
+over labelled traces and reports, for door openings and for walk-through
+triggers (the POSTs that fire the Alexa routine):
+
+- precision / recall against the labels (a detection matches the first
+  unmatched label at most MATCH_WINDOW_SEC earlier),
+- latency percentiles from the physical event to the POST decision,
+- CPU time per sensor event and tracemalloc peak / retained blocks.
+
+Synthetic traces model a 10 Hz ultrasonic sensor (noise, timeouts, spikes)
+and a break beam, with door openings with and without a walk-through, beam
+breaks with the door shut, and breaks shorter than one 100 ms poll. Recorded
+traces (sensor_trace format) are used when a sidecar `<trace>.labels.json`
+holds {"door_open": [sec, ...], "trigger": [sec, ...]} relative to the trace start.
+
+    python3 bench_detection.py                        # defaults, synthetic traces
+    python3 bench_detection.py --mode poll            # the old 100 ms polling loop
+    python3 bench_detection.py --mode batch --sweep   # poll semantics on NumPy (door_detector_batch)
+    python3 bench_detection.py --trace door.trace     # plus a labelled recording
+    python3 bench_detection.py --sweep --workers 4    # parameter grid on a process pool
+    python3 bench_detection.py --sweep --trace door.trace   # grid scored on synthetic + recorded
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from door_detector import (
+    DISTANCE_THRESHOLD_CM, DOOR_STABILITY_COUNT, EVENT_WINDOW_SEC, STD_DEV_HIGH, DoorDetector,
+)
+from replay import replay
+from sensor_trace import read_trace
+
+SAMPLE_PERIOD_SEC = 0.1
+CLOSED_CM = 20.0
+OPEN_CM = 60.0
+MATCH_WINDOW_SEC = 10.0
+
+SWEEP_GRID = {
+    "distance_threshold_cm": (30.0, DISTANCE_THRESHOLD_CM, 45.0),
+    "std_dev_high": (3.0, STD_DEV_HIGH, 8.0),
+    "stability_count": (2, DOOR_STABILITY_COUNT, 5),
+    "event_window_sec": (3.0, EVENT_WINDOW_SEC, 8.0),
+}
+
+
+def synth_trace(seed, duration_sec=600.0, noise_cm=1.0, timeout_rate=0.01, spike_rate=0.005):
+    """Return (events, labels): sensor_trace-style events and label times in seconds."""
+    rng = random.Random(seed)
+    labels = {"door_open": [], "trigger": []}
+    beam = []       # (start, end) of each beam break
+    swings = []     # (start, end, from_cm, to_cm)
+
+    t = rng.uniform(5.0, 15.0)
+    while t < duration_sec - 40.0:
+        kind = rng.choices(("open_walk", "open_only", "walk_only", "short_walk"), (0.5, 0.2, 0.15, 0.15))[0]
+        if kind == "walk_only":
+            # Someone passes the beam with the door shut: no trigger expected.
+            beam.append((t, t + rng.uniform(0.15, 0.6)))
+            t += rng.uniform(20.0, 60.0)
+            continue
+        swing = rng.uniform(0.6, 1.5)
+        open_for = rng.uniform(6.0, 20.0)
+        swings.append((t, t + swing, CLOSED_CM, OPEN_CM))
+        swings.append((t + swing + open_for, t + 2 * swing + open_for, OPEN_CM, CLOSED_CM))
+        labels["door_open"].append(t)
+        if kind != "open_only":
+            walk_at = t + swing + rng.uniform(0.3, 3.0)
+            # short_walk: a brisk pass that breaks the beam for less than one 100 ms poll.
+            length = rng.uniform(0.02, 0.08) if kind == "short_walk" else rng.uniform(0.15, 0.6)
+            beam.append((walk_at, walk_at + length))
+            labels["trigger"].append(walk_at)
+        t += 2 * swing + open_for + rng.uniform(20.0, 60.0)
+
+    events = []
+    for index in range(int(duration_sec / SAMPLE_PERIOD_SEC)):
+        ts = index * SAMPLE_PERIOD_SEC + rng.uniform(0.0, 0.004)
+        distance = CLOSED_CM
+        for start, end, from_cm, to_cm in swings:
+            if ts >= end:
+                distance = to_cm
+            elif ts >= start:
+                distance = from_cm + (to_cm - from_cm) * (ts - start) / (end - start)
+                distance += rng.gauss(0, 6.0)   # a moving door scatters the echo
+                break
+        roll = rng.random()
+        if roll < timeout_rate:
+            distance = -1
+        elif roll < timeout_rate + spike_rate:
+            distance = rng.uniform(5.0, 150.0)
+        else:
+            distance = max(distance + rng.gauss(0, noise_cm), 2.0)
+        events.append((int(ts * 1e9), "distance", distance))
+    for start, end in beam:
+        events.append((int(start * 1e9), "beam", True))
+        events.append((int(end * 1e9), "beam", False))
+    events.sort(key=lambda event: event[0])
+    return events, labels
+
+
+def load_recorded(path):
+    labels_path = Path(f"{path}.labels.json")
+    if not labels_path.exists():
+        raise SystemExit(f"{path}: no {labels_path.name} with door_open/trigger label times")
+    events = list(read_trace(path))
+    labels = json.loads(labels_path.read_text())
+    return events, {"door_open": labels.get("door_open", []), "trigger": labels.get("trigger", [])}
+
+
+def poll_replay(events, **params):
+    """The original loop: every ultrasonic sample also samples the beam level."""
+    detector = DoorDetector(**params)
+    decisions = []
+    beam_level = False
+    for ts_ns, kind, value in events:
+        if kind == "beam":
+            beam_level = value
+        elif kind == "distance":
+            decision = detector.step(ts_ns / 1e9, value, beam_level)
+            if decision is not None:
+                decisions.append(decision)
+    return decisions
+
+
+def detections(decisions):
+    """Times of door openings and triggers in a decision list, relative to the trace start."""
+    opened, triggers = [], []
+    was_open = False
+    for decision in decisions:
+        if decision.door_open and not was_open:
+            opened.append(decision.ts)
+        if decision.trigger:
+            triggers.append(decision.ts)
+        was_open = decision.door_open
+    return {"door_open": opened, "trigger": triggers}
+
+
+def match(truth, detected):
+    """Greedy in-order matching; returns (true positives, latencies)."""
+    latencies = []
+    pending = sorted(truth)
+    for ts in sorted(detected):
+        while pending and ts - pending[0] > MATCH_WINDOW_SEC:
+            pending.pop(0)
+        if pending and pending[0] <= ts:
+            latencies.append(ts - pending.pop(0))
+    return len(latencies), latencies
+
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+def evaluate(traces, mode="event", params=None, profile=False):
+    """Run every (events, labels) trace; returns a dict of scores."""
+    params = params or {}
+    if mode == "batch":
+        from door_detector_batch import batch_replay as run   # needs numpy
+    else:
+        run = replay if mode == "event" else poll_replay
+    totals = {kind: {"tp": 0, "detected": 0, "truth": 0, "latencies": []} for kind in ("door_open", "trigger")}
+    events_total = 0
+    cpu_sec = 0.0
+    for events, labels in traces:
+        started = time.process_time()
+        decisions = run(events, **params)
+        cpu_sec += time.process_time() - started
+        events_total += len(events)
+        found = detections(decisions)
+        for kind, scores in totals.items():
+            tp, latencies = match(labels[kind], found[kind])
+            scores["tp"] += tp
+            scores["detected"] += len(found[kind])
+            scores["truth"] += len(labels[kind])
+            scores["latencies"].extend(latencies)
+
+    result = {"params": params, "events": events_total, "cpu_us_per_event": cpu_sec / max(events_total, 1) * 1e6}
+    for kind, scores in totals.items():
+        precision = scores["tp"] / scores["detected"] if scores["detected"] else 0.0
+        recall = scores["tp"] / scores["truth"] if scores["truth"] else 0.0
+        result[kind] = {
+            "precision": precision,
+            "recall": recall,
+            "f1": 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+            "p50": percentile(scores["latencies"], 50),
+            "p90": percentile(scores["latencies"], 90),
+            "p99": percentile(scores["latencies"], 99),
+        }
+
+    if profile and traces:
+        events = traces[0][0]
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        run(events, **params)
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        retained = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+        result["alloc_peak_kib"] = peak / 1024
+        result["retained_blocks_per_1k_events"] = retained / len(events) * 1000
+    return result
+
+
+_trace_cache = {}
+_recorded = []   # Labelled recorded traces for sweep workers, set once per process by _use_recorded()
+
+
+def synth_set(count, duration_sec, seed=118):
+    key = (count, duration_sec, seed)
+    if key not in _trace_cache:
+        _trace_cache[key] = [synth_trace(seed + index, duration_sec) for index in range(count)]
+    return _trace_cache[key]
+
+
+def _use_recorded(traces):
+    """Process-pool initializer: the recorded traces reach each worker once, not with every job."""
+    global _recorded
+    _recorded = traces
+
+
+def evaluate_config(job):
+    """Process-pool entry point: synthetic traces are regenerated (and cached) per worker, not pickled."""
+    params, count, duration_sec, mode = job
+    return evaluate(synth_set(count, duration_sec) + _recorded, mode, params)
+
+
+def print_scores(title, result):
+    print(title)
+    for kind in ("door_open", "trigger"):
+        s = result[kind]
+        print(f"  {kind:9s}  precision {s['precision']:.3f}  recall {s['recall']:.3f}  f1 {s['f1']:.3f}  "
+              f"latency p50 {s['p50']:.2f} s  p90 {s['p90']:.2f} s  p99 {s['p99']:.2f} s")
+    line = f"  cpu {result['cpu_us_per_event']:.2f} µs/event over {result['events']} events"
+    if "alloc_peak_kib" in result:
+        line += (f", tracemalloc peak {result['alloc_peak_kib']:.0f} KiB, "
+                 f"{result['retained_blocks_per_1k_events']:.1f} retained blocks/1k events")
+    print(line)
+
+
+def sweep(args):
+    names = list(SWEEP_GRID)
+    jobs = [
+        (dict(zip(names, values)), args.traces, args.duration, args.mode)
+        for values in itertools.product(*(SWEEP_GRID[name] for name in names))
+    ]
+    recorded = [load_recorded(path) for path in args.trace]
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_use_recorded, initargs=(recorded,)) as pool:
+        results = list(pool.map(evaluate_config, jobs))
+    elapsed = time.perf_counter() - started
+    print(f"{len(jobs)} configurations x {args.traces} traces of {args.duration:.0f} s"
+          f"{f' + {len(recorded)} recorded' if recorded else ''} "
+          f"in {elapsed:.1f} s on {args.workers or os.cpu_count()} workers")
+
+    results.sort(key=lambda r: (-r["trigger"]["f1"], -r["door_open"]["f1"], r["trigger"]["p50"]))
+    header = "  ".join(f"{name:>21s}" for name in names)
+    print(f"{header}  trigger f1  p50 s  door f1  p50 s")
+    for result in results[:args.top]:
+        values = "  ".join(f"{result['params'][name]:>21}" for name in names)
+        print(f"{values}  {result['trigger']['f1']:10.3f}  {result['trigger']['p50']:5.2f}"
+              f"  {result['door_open']['f1']:7.3f}  {result['door_open']['p50']:5.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--traces", type=int, default=10, help="synthetic traces per evaluation")
+    parser.add_argument("--duration", type=float, default=900.0, help="seconds per synthetic trace")
+    parser.add_argument("--mode", choices=("event", "poll", "batch"), default="event")
+    parser.add_argument("--trace", action="append", default=[], help="labelled recorded trace (repeatable)")
+    parser.add_argument("--sweep", action="store_true", help="evaluate the SWEEP_GRID on a process pool")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--top", type=int, default=10, help="sweep rows to print")
+    args = parser.parse_args()
+
+    if args.sweep:
+        sweep(args)
+        return
+
+    synthetic = synth_set(args.traces, args.duration)
+    print_scores(f"synthetic: {args.traces} traces x {args.duration:.0f} s, {args.mode} mode",
+                 evaluate(synthetic, args.mode, profile=True))
+    if args.trace:
+        recorded = [load_recorded(path) for path in args.trace]
+        print_scores(f"recorded: {len(recorded)} trace(s), {args.mode} mode",
+                     evaluate(recorded, args.mode, profile=True))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Check the NumPy batch detector against the streaming one, and time both.
+
+For each synthetic trace (bench_detection.synth_trace) and each parameter
+set, door_detector_batch must return exactly the Decisions poll_replay()
+does (DoorDetector.step() once per ultrasonic sample): same times, labels
+and flags. Besides the defaults and the bench_detection sweep grid, random
+parameter sets are drawn, including edge values (stability 1, windows of 1
+and 2 samples, zero cooldowns) and traces with integer-rounded distances,
+whose rolling stdevs land exactly on thresholds more often.
+
+Then times a threshold sweep both ways: the batch side builds one
+BatchDetector per trace (the rolling stdev) and reuses it for every
+parameter set with the same stats window.
+
+    python3 bench_detector_batch.py
+    python3 bench_detector_batch.py --traces 4 --duration 86400 --random 50
+"""
+
+import argparse
+import itertools
+import random
+import sys
+import time
+
+from bench_detection import SWEEP_GRID, poll_replay, synth_trace
+from door_detector_batch import BatchDetector, batch_replay
+
+
+def decision_keys(decisions):
+    return [(d.ts, d.label, d.door_open, d.walk_through, d.trigger) for d in decisions]
+
+
+def random_params(rng):
+    return {
+        "distance_threshold_cm": rng.choice((20.0, 30.0, 35.0, 40.0, 60.0)),
+        "std_dev_high": rng.choice((0.0, 0.5, 1.0, 2.0, 3.0, 5.0, 8.0, 20.0)),
+        "event_window_sec": rng.choice((0.0, 0.05, 1.0, 5.0, 30.0)),
+        "post_cooldown_sec": rng.choice((0.0, 0.1, 2.0, 5.0, 30.0)),
+        "stability_count": rng.choice((1, 2, 3, 5, 10)),
+        "transition_cooldown_sec": rng.choice((0.0, 0.5, 1.0, 10.0)),
+        "stats_window": rng.choice((1, 2, 5, 15, 40)),
+    }
+
+
+def rounded(events):
+    """Whole-centimetre distances, as a sensor driver that rounds would record them."""
+    return [(ts_ns, kind, float(round(value)) if kind == "distance" else value) for ts_ns, kind, value in events]
+
+
+def check(traces, param_sets):
+    """Compare every (trace, params) pair; returns the number of mismatches."""
+    mismatches = 0
+    for (name, events), params in itertools.product(traces, param_sets):
+        expected = decision_keys(poll_replay(events, **params))
+        got = decision_keys(batch_replay(events, **params))
+        if got != expected:
+            mismatches += 1
+            first = next((i for i, (a, b) in enumerate(zip(expected, got)) if a != b), min(len(expected), len(got)))
+            print(f"MISMATCH {name} {params}: {len(expected)} vs {len(got)} decisions, first difference at #{first}: "
+                  f"{expected[first] if first < len(expected) else None} vs {got[first] if first < len(got) else None}")
+    return mismatches
+
+
+def time_sweep(traces, param_sets):
+    started = time.perf_counter()
+    streaming = [decision_keys(poll_replay(events, **params)) for _, events in traces for params in param_sets]
+    streaming_sec = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batched = []
+    for _, events in traces:
+        detectors = {}
+        for params in param_sets:
+            window = params.get("stats_window", 15)
+            if window not in detectors:
+                detectors[window] = BatchDetector.from_events(events, window)
+            batched.append(decision_keys(detectors[window].run(**params)))
+    batch_sec = time.perf_counter() - started
+    return streaming_sec, batch_sec, streaming == batched
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--traces", type=int, default=4, help="synthetic traces to check")
+    parser.add_argument("--duration", type=float, default=3600.0, help="seconds per synthetic trace")
+    parser.add_argument("--random", type=int, default=30, help="random parameter sets per trace")
+    parser.add_argument("--seed", type=int, default=118)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    traces = []
+    for index in range(args.traces):
+        events, _ = synth_trace(args.seed + index, args.duration)
+        traces.append((f"synth-{index}", events))
+    traces.append(("synth-0-rounded", rounded(traces[0][1])))
+    # Non-monotonic timestamps (a clock step backwards) must not break the equivalence either.
+    stepped = [(ts_ns - 30 * 10**9 if ts_ns > 600 * 10**9 else ts_ns, kind, value) for ts_ns, kind, value in traces[0][1]]
+    traces.append(("synth-0-clock-step", stepped))
+    traces.append(("empty", []))
+
+    names = list(SWEEP_GRID)
+    grid = [dict(zip(names, values)) for values in itertools.product(*(SWEEP_GRID[name] for name in names))]
+    param_sets = [{}] + grid + [random_params(rng) for _ in range(args.random)]
+    samples = sum(kind == "distance" for _, events in traces for _, kind, _ in events)
+    print(f"checking {len(traces)} traces ({samples} samples) x {len(param_sets)} parameter sets ...")
+    started = time.perf_counter()
+    mismatches = check(traces, param_sets)
+    print(f"{'ok  ' if not mismatches else 'FAIL'} {len(traces) * len(param_sets) - mismatches}/"
+          f"{len(traces) * len(param_sets)} runs identical ({time.perf_counter() - started:.1f} s)")
+
+    sweep_traces = traces[:args.traces]
+    streaming_sec, batch_sec, same = time_sweep(sweep_traces, grid)
+    hours = len(sweep_traces) * args.duration / 3600
+    print(f"sweep of {len(grid)} configurations over {hours:.1f} h of samples: streaming {streaming_sec:.1f} s, "
+          f"batch {batch_sec:.1f} s ({streaming_sec / batch_sec:.0f}x){'' if same else '  FAIL: results differ'}")
+    sys.exit(1 if mismatches or not same else 0)
+
+
+if __name__ == "__main__":
+    main()
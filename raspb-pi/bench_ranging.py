@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Off-device benchmark: busy-wait echo polling vs. the edge-driven EchoRanger,
+both run against mock_gpio. Reports caller-thread CPU per ping and accuracy.
+
+Usage: python3 bench_ranging.py [pings] [distance_cm]
+"""
+
+import statistics
+import sys
+import time
+
+from mock_gpio import MockGPIO
+from ranging import EchoRanger
+
+TRIG_PIN = 23
+ECHO_PIN = 24
+
+
+def poll_measure(gpio, timeout=0.1):
+    """The original busy-wait measure_distance(), kept here as the baseline."""
+    gpio.output(TRIG_PIN, gpio.LOW)
+    time.sleep(0.00002)
+    gpio.output(TRIG_PIN, gpio.HIGH)
+    time.sleep(0.00001)
+    gpio.output(TRIG_PIN, gpio.LOW)
+
+    start_wait = time.time()
+    while gpio.input(ECHO_PIN) == gpio.LOW:
+        if time.time() - start_wait > timeout:
+            return -1
+    pulse_start = time.time()
+    start_wait = pulse_start
+    while gpio.input(ECHO_PIN) == gpio.HIGH:
+        if time.time() - start_wait > timeout:
+            return -1
+    return ((time.time() - pulse_start) * 34300) / 2
+
+
+def run(label, measure, pings, distance_cm):
+    readings = []
+    cpu_start = time.thread_time()
+    wall_start = time.perf_counter()
+    for _ in range(pings):
+        readings.append(measure())
+        time.sleep(0.005)  # let the echo line settle between pings
+    cpu = time.thread_time() - cpu_start
+    wall = time.perf_counter() - wall_start - pings * 0.005
+
+    good = [r for r in readings if r > 0]
+    errors = [abs(r - distance_cm) for r in good]
+    print(
+        f"{label:>10}: cpu {cpu / pings * 1e3:7.3f} ms/ping  "
+        f"wall {wall / pings * 1e3:7.3f} ms/ping  "
+        f"timeouts {pings - len(good):3d}  "
+        f"mean err {statistics.fmean(errors) if errors else float('nan'):5.2f} cm  "
+        f"stdev {statistics.pstdev(good) if len(good) > 1 else 0.0:5.2f} cm"
+    )
+
+
+def main():
+    pings = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    distance_cm = float(sys.argv[2]) if len(sys.argv) > 2 else 50.0
+
+    gpio = MockGPIO()
+    gpio.setmode(gpio.BCM)
+    gpio.setup(TRIG_PIN, gpio.OUT)
+    gpio.setup(ECHO_PIN, gpio.IN)
+    gpio.attach_echo(TRIG_PIN, ECHO_PIN, lambda: distance_cm)
+
+    run("busy-wait", lambda: poll_measure(gpio), pings, distance_cm)
+
+    ranger = EchoRanger(gpio, TRIG_PIN, ECHO_PIN)
+    ranger.start()
+    try:
+        run("edge", ranger.measure, pings, distance_cm)
+    finally:
+        ranger.stop()
+        gpio.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: per-sample statistics.stdev over a deque (what the door loop
+used to do) vs. RollingStats.add() + .stdev, plus an agreement check.
+
+Usage: python3 bench_rolling_stats.py [samples]
+"""
+
+import random
+import statistics
+import sys
+import time
+from collections import deque
+
+from rolling_stats import RollingStats
+
+
+def bench_stdlib(samples, window):
+    history = deque(maxlen=window)
+    out = []
+    start = time.perf_counter()
+    for value in samples:
+        history.append(value)
+        out.append(statistics.stdev(history) if len(history) >= 2 else 0.0)
+    return time.perf_counter() - start, out
+
+
+def bench_rolling(samples, window):
+    stats = RollingStats(window)
+    out = []
+    start = time.perf_counter()
+    for value in samples:
+        stats.add(value)
+        out.append(stats.stdev)
+    return time.perf_counter() - start, out
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rng = random.Random(118)
+    # Door-like signal: closed ~20 cm, open ~60 cm, sensor noise on top.
+    samples = [(20.0 if (i // 500) % 2 == 0 else 60.0) + rng.gauss(0, 1.5) for i in range(count)]
+
+    for window in (15, 50, 200):
+        stdlib_sec, expected = bench_stdlib(samples, window)
+        rolling_sec, actual = bench_rolling(samples, window)
+        max_err = max(abs(a - b) for a, b in zip(expected, actual))
+        print(
+            f"window {window:4d}: statistics.stdev {stdlib_sec / count * 1e6:7.2f} µs/sample  "
+            f"RollingStats {rolling_sec / count * 1e6:6.2f} µs/sample  "
+            f"speedup {stdlib_sec / rolling_sec:5.1f}x  max |diff| {max_err:.2e}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Bytes on the wire and encode/decode CPU for the door traffic, per wire format.
+
+Compares the current path (requests' json= body: json.dumps with default
+separators) with compact JSON, msgpack with typed fields, and gzip/zstd on
+top (zstd only when the zstandard package is installed). Bodies under
+wire_format.MIN_COMPRESS_BYTES are sent uncompressed, which the "sent as"
+column shows. Encode time is the Pi's side (including to_compact), decode
+time the server's (including normalize_reading). Run it on the Pi for Pi
+numbers; a desktop is roughly 5-10x faster.
+
+    python3 bench_wire_format.py
+    python3 bench_wire_format.py --events 20 --batch 100
+"""
+
+import argparse
+import json
+import time
+
+import telemetry  # noqa: F401  (puts the repo's shared/ folder on sys.path)
+from wire_format import (
+    GZIP, IDENTITY, JSON_TYPE, MSGPACK_TYPE, ZSTD, decode, msgpack, normalize_reading, request_parts, zstandard,
+)
+
+USER_ID = "subhon"
+CALENDAR_HASH = "01b3f8e4b0c008d4b69f5c79a6be34cb"
+# What requests adds for json=, and the Accept header it sends by default.
+CURRENT_HEADERS = {"Content-Type": JSON_TYPE, "Accept": "*/*"}
+
+
+def calendar(count):
+    return [f"2026-10-17T{8 + i % 12:02d}:{(i * 25) % 60:02d}:00-07:00: Event number {i} in Room {100 + i}"
+            for i in range(count)]
+
+
+def reading(index=0, with_calendar=None):
+    payload = {
+        "userId": USER_ID,
+        "doorStatus": "Open" if index % 2 else "Closed",
+        "walkThroughStatus": "True" if index % 3 == 0 else "False",
+        "indoorTemp": f"{68 + index % 7 * 0.3:.1f}",
+        "humidity": f"{40 + index % 5:.0f}",
+        "ts": 1792200000.0 + index * 37.25,
+    }
+    if with_calendar is None:
+        payload["calendarHash"] = CALENDAR_HASH
+    else:
+        payload["calendarEvents"] = with_calendar
+    return payload
+
+
+def header_bytes(headers):
+    return sum(len(f"{name}: {value}\r\n") for name, value in headers.items())
+
+
+def per_call_us(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def paths():
+    yield "current (requests json=)", None, None
+    yield "json", JSON_TYPE, IDENTITY
+    yield "json + gzip", JSON_TYPE, GZIP
+    if zstandard is not None:
+        yield "json + zstd", JSON_TYPE, ZSTD
+    if msgpack is not None:
+        yield "msgpack", MSGPACK_TYPE, IDENTITY
+        yield "msgpack + gzip", MSGPACK_TYPE, GZIP
+        if zstandard is not None:
+            yield "msgpack + zstd", MSGPACK_TYPE, ZSTD
+
+
+def measure(doc, iterations):
+    rows = []
+    for name, content_type, coding in paths():
+        if content_type is None:
+            def encode_once():
+                return json.dumps(doc).encode("utf-8")
+            body, headers = encode_once(), CURRENT_HEADERS
+        else:
+            def encode_once():
+                return request_parts(doc, content_type, coding)
+            body, headers = encode_once()
+
+        def decode_once():
+            value = decode(body, headers.get("Content-Type"), headers.get("Content-Encoding"))
+            for item in value if isinstance(value, list) else [value]:
+                normalize_reading(item)
+
+        rows.append({
+            "path": name,
+            "sent_as": headers.get("Content-Encoding", IDENTITY),
+            "body": len(body),
+            "headers": header_bytes(headers) - header_bytes(CURRENT_HEADERS),
+            "encode_us": per_call_us(encode_once, iterations),
+            "decode_us": per_call_us(decode_once, iterations),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=12, help="calendar events per calendar")
+    parser.add_argument("--batch", type=int, default=50, help="readings per outbox replay batch")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    events = calendar(args.events)
+    cases = {
+        "door POST (calendarHash)": reading(),
+        f"door POST (legacy, {args.events} calendarEvents)": reading(with_calendar=events),
+        f"calendar PUT ({args.events} events)": {"userId": USER_ID, "calendarEvents": events},
+        f"outbox replay ({args.batch} readings)": [reading(i) for i in range(args.batch)],
+        "GET /weather response": dict(reading(), calendarEvents=events),
+    }
+    missing = [name for name, module in (("msgpack", msgpack), ("zstandard", zstandard)) if module is None]
+    if missing:
+        print(f"not installed, skipped: {', '.join(missing)}")
+    for title, doc in cases.items():
+        rows = measure(doc, max(args.iterations // (args.batch if isinstance(doc, list) else 1), 50))
+        baseline = rows[0]["body"]
+        print(title)
+        print(f"  {'path':26s} {'sent as':>8s} {'body B':>7s} {'vs now':>7s} {'+hdr B':>7s} "
+              f"{'encode µs':>10s} {'decode µs':>10s}")
+        for row in rows:
+            print(f"  {row['path']:26s} {row['sent_as']:>8s} {row['body']:7d} {row['body'] / baseline:7.0%} "
+                  f"{row['headers']:+7d} {row['encode_us']:10.1f} {row['decode_us']:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,15 @@
-import RPi.GPIO as GPIO
 import time
 
-# Set the GPIO mode
-GPIO.setmode(GPIO.BCM) 
+from hal import open_hal
 
 # Define the GPIO pin connected to the receiver's signal wire
 SENSOR_PIN = 22 
 
+GPIO = open_hal(beam_pin=SENSOR_PIN).gpio  # DOOR_HAL=sim runs without a Pi
+
+# Set the GPIO mode
+GPIO.setmode(GPIO.BCM) 
+
 # Set up the GPIO pin as an input with a pull-up resistor
 GPIO.setup(SENSOR_PIN, GPIO.IN, pull_up_down=GPIO.PUD_UP)
 
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+DHT11 sampler running on its own 2 s schedule (the humiture.py loop as a thread).
+
+Each cycle makes one sensor read for both values: adafruit_dht measures on the
+first property access and serves the second from that measurement. Readings
+outside the DHT11's range are dropped, and the published values are the median
+of the last MEDIAN_WINDOW good samples, so a single garbage read cannot move
+them. Readers take `sampler.reading`, an immutable HumitureReading that the
+thread replaces with one assignment, so reading it is O(1) and lock-free.
+"""
+
+import statistics
+import threading
+import time
+from collections import deque
+
+from telemetry import dht_reads
+
+READ_INTERVAL_SEC = 2.0        # DHT11 cannot be read faster than about once every 2 s
+MEDIAN_WINDOW = 5              # Good samples the published median is taken over
+TEMP_RANGE_C = (0.0, 50.0)     # DHT11 measuring range
+HUMIDITY_RANGE = (5.0, 95.0)   # DHT11 is specified for 20-90 %RH; allow some slack
+
+DHT_OK = dht_reads.labels("ok")
+DHT_ERRORS = dht_reads.labels("error")
+DHT_REJECTED = dht_reads.labels("rejected")
+
+
+class HumitureReading:
+    """One published sample; replaced wholesale, never mutated."""
+
+    __slots__ = ("temp_f", "humidity", "timestamp", "quality")
+
+    def __init__(self, temp_f=None, humidity=None, timestamp=None, quality=0.0):
+        self.temp_f = temp_f          # Median temperature in Fahrenheit, or None before the first good read
+        self.humidity = humidity      # Median relative humidity in %, or None
+        self.timestamp = timestamp    # time.time() of the newest good sample, or None
+        self.quality = quality        # Share of the last MEDIAN_WINDOW read attempts that were good (0-1)
+
+    def age(self, now=None):
+        """Seconds since the newest good sample (inf if there is none)."""
+        if self.timestamp is None:
+            return float("inf")
+        return (now if now is not None else time.time()) - self.timestamp
+
+
+def in_range(value, bounds):
+    return value is not None and bounds[0] <= value <= bounds[1]
+
+
+class HumitureSampler:
+    def __init__(self, device, interval=READ_INTERVAL_SEC, window=MEDIAN_WINDOW, clock=time.time, listener=None):
+        self.device = device
+        self.interval = interval
+        self.clock = clock
+        self.listener = listener   # Called with each new HumitureReading, on the sampler thread
+        self.reading = HumitureReading()
+        self.reads = 0
+        self.failures = 0
+        self._temps_c = deque(maxlen=window)
+        self._humidities = deque(maxlen=window)
+        self._attempts = deque(maxlen=window)   # True for a good read, False otherwise
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="dht-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.device.exit()
+
+    def sample_once(self):
+        """Read the sensor once and publish a new reading; returns True if the read was good."""
+        good = self._sample()
+        if self.listener is not None:
+            try:
+                self.listener(self.reading)
+            except Exception as error:
+                # A consumer's bug, not a sensor failure: the read is already counted as it was.
+                print(f"DHT listener failed: {error!r}")
+        return good
+
+    def _sample(self):
+        self.reads += 1
+        try:
+            temp_c = self.device.temperature
+            humidity = self.device.humidity
+        except RuntimeError:
+            # Checksum and timing errors are routine on a DHT11; just try next cycle.
+            temp_c = humidity = None
+
+        good = in_range(temp_c, TEMP_RANGE_C) and in_range(humidity, HUMIDITY_RANGE)
+        if good:
+            DHT_OK.inc()
+        elif temp_c is None or humidity is None:
+            DHT_ERRORS.inc()
+        else:
+            DHT_REJECTED.inc()   # a read that passed the checksum but is physically implausible
+        self._attempts.append(good)
+        if good:
+            self._temps_c.append(temp_c)
+            self._humidities.append(humidity)
+        else:
+            self.failures += 1
+
+        previous = self.reading
+        quality = sum(self._attempts) / len(self._attempts)
+        if not self._temps_c:
+            self.reading = HumitureReading(quality=quality)
+            return good
+        self.reading = HumitureReading(
+            statistics.median(self._temps_c) * (9 / 5) + 32,
+            statistics.median(self._humidities),
+            self.clock() if good else previous.timestamp,
+            quality,
+        )
+        return good
+
+    def _record_failure(self):
+        """Count an attempt that raised; the last values stay published with the lower quality."""
+        DHT_ERRORS.inc()
+        self.failures += 1
+        self._attempts.append(False)
+        previous = self.reading
+        quality = sum(self._attempts) / len(self._attempts)
+        self.reading = HumitureReading(previous.temp_f, previous.humidity, previous.timestamp, quality)
+
+    def _run(self):
+        next_at = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                self.sample_once()
+            except Exception as error:
+                # Only _sample() gets here (listener errors are caught in sample_once). Keep the
+                # thread alive: a failing sensor shows up as falling quality and a growing age(),
+                # not as a frozen reading from a dead thread.
+                print(f"DHT sample failed: {error!r}")
+                self._record_failure()
+            # Fixed-rate schedule; after an overrun, skip the missed slots rather
+            # than reading back-to-back faster than the sensor allows.
+            next_at += self.interval
+            now = time.monotonic()
+            if next_at <= now:
+                next_at = now + self.interval
+            self._stop.wait(next_at - now)
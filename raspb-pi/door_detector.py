@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Door / walk-through fusion logic, independent of any sensor hardware.
+
+DoorDetector holds the state the door_sync_poster loop used to keep in
+locals. Feed it timestamped readings with on_distance() and on_beam(), then
+ask decide() whether a POST is due; step() runs one iteration of the original
+fixed-rate polling loop for callers that sample on a schedule. All times are
+seconds on one clock of the caller's choosing (time.time(), perf_counter(),
+or a trace's own timestamps).
+"""
+
+from rolling_stats import RollingStats
+
+# Tuning parameters
+DISTANCE_THRESHOLD_CM = 35.0          # Distance that separates open/closed state
+STD_DEV_HIGH = 5.0                    # What qualifies as "high" standard deviation
+EVENT_WINDOW_SEC = 5.0                # How long two events can be apart and still count together
+POST_COOLDOWN_SEC = 5.0               # Avoid duplicate posts too quickly
+DOOR_STABILITY_COUNT = 3              # Number of consistent readings to accept a door state change
+DOOR_TRANSITION_COOLDOWN_SEC = 1.0    # Minimum time between door state changes
+STATS_WINDOW = 15                     # Ultrasonic readings in the rolling standard deviation
+
+LABELS = ("closed", "closed_walk", "open", "open_walk")
+
+
+class Decision:
+    """A POST the detector wants sent: which payload, and whether to fire the Alexa routine."""
+
+    __slots__ = ("ts", "label", "door_open", "walk_through", "trigger")
+
+    def __init__(self, ts, label, door_open, walk_through):
+        self.ts = ts
+        self.label = label
+        self.door_open = door_open
+        self.walk_through = walk_through
+        self.trigger = door_open and walk_through
+
+    def __repr__(self):
+        return f"Decision({self.ts:.3f}, {self.label!r})"
+
+
+class DoorDetector:
+    def __init__(self, distance_threshold_cm=DISTANCE_THRESHOLD_CM, std_dev_high=STD_DEV_HIGH,
+                 event_window_sec=EVENT_WINDOW_SEC, post_cooldown_sec=POST_COOLDOWN_SEC,
+                 stability_count=DOOR_STABILITY_COUNT, transition_cooldown_sec=DOOR_TRANSITION_COOLDOWN_SEC,
+                 stats_window=STATS_WINDOW, verbose=False):
+        self.distance_threshold_cm = distance_threshold_cm
+        self.std_dev_high = std_dev_high
+        self.event_window_sec = event_window_sec
+        self.post_cooldown_sec = post_cooldown_sec
+        self.stability_count = stability_count
+        self.transition_cooldown_sec = transition_cooldown_sec
+        self.verbose = verbose
+
+        self.distance_stats = RollingStats(stats_window)
+        self.door_state = "closed"
+        self.candidate_state = None
+        self.candidate_count = 0
+        self.last_state_change = float("-inf")
+        self.beam_broken = False
+        self.walked_through = False
+        self.walked_through_at = float("-inf")
+        self.last_post_time = float("-inf")
+        self.last_label = None
+        self._retry_at = None   # When a label change held back by the post cooldown can go out
+
+    def on_distance(self, now, distance):
+        """Fold one ultrasonic reading (cm, or -1 for a timeout) in; returns True if the door state changed."""
+        if distance > 0:
+            self.distance_stats.add(distance)
+        std_dev = self.distance_stats.stdev
+
+        new_state = None
+        if std_dev >= self.std_dev_high and distance > 0:
+            new_state = "open" if distance > self.distance_threshold_cm else "closed"
+
+        if not new_state:
+            self.candidate_state = None
+            self.candidate_count = 0
+            return False
+
+        if new_state == self.candidate_state:
+            self.candidate_count += 1
+        else:
+            self.candidate_state = new_state
+            self.candidate_count = 1
+
+        if (
+            self.candidate_count >= self.stability_count
+            and new_state != self.door_state
+            and (now - self.last_state_change) >= self.transition_cooldown_sec
+        ):
+            self.door_state = new_state
+            self.last_state_change = now
+            if self.verbose:
+                print(f"Door state stabilized: {new_state} (distance {distance:.2f} cm, std {std_dev:.2f})")
+            return True
+        return False
+
+    def on_beam(self, now, broken):
+        """Record the beam level at `now` (an edge, or a sample while it is broken)."""
+        if broken:
+            if self.verbose and not self.walked_through:
+                print("Beam broken")
+            self.walked_through = True
+            self.walked_through_at = now
+        elif self.beam_broken:
+            # The walk-through window runs from the moment the beam cleared.
+            self.walked_through_at = now
+        self.beam_broken = broken
+
+    def walk_recent(self, now):
+        if self.walked_through and not self.beam_broken and (now - self.walked_through_at) > self.event_window_sec:
+            self.walked_through = False
+        return self.walked_through and (self.beam_broken or (now - self.walked_through_at) <= self.event_window_sec)
+
+    def decide(self, now):
+        """Return a Decision if the door/walk label changed and the post cooldown allows it."""
+        walk = self.walk_recent(now)
+        door_open = self.door_state == "open"
+        label = ("open" if door_open else "closed") + ("_walk" if walk else "")
+        if label == self.last_label:
+            self._retry_at = None
+            return None
+        if (now - self.last_post_time) < self.post_cooldown_sec:
+            self._retry_at = self.last_post_time + self.post_cooldown_sec
+            return None
+        self._retry_at = None
+        self.last_post_time = now
+        self.last_label = label
+        return Decision(now, label, door_open, walk)
+
+    def next_deadline(self):
+        """Earliest time decide() could change its answer without a new reading, or None."""
+        deadlines = []
+        if self.walked_through and not self.beam_broken:
+            deadlines.append(self.walked_through_at + self.event_window_sec)
+        if self._retry_at is not None:
+            deadlines.append(self._retry_at)
+        return min(deadlines) if deadlines else None
+
+    def step(self, now, distance, beam_broken):
+        """One iteration of the original polling loop (distance + beam level sampled together)."""
+        self.on_distance(now, distance)
+        if beam_broken:
+            self.on_beam(now, True)
+        else:
+            # A level sample cannot tell when the beam cleared; the window keeps
+            # running from the last sample that saw it broken, as the loop did.
+            self.beam_broken = False
+        return self.decide(now)
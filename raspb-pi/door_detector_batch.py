@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Batch (NumPy) version of the door / walk-through detector, for offline use.
+
+Takes whole arrays of sample timestamps, distances and beam levels, as the
+original polling loop in door_sync_poster sampled them, and returns the same
+Decisions as calling DoorDetector.step() once per sample. The per-sample
+work is array operations: the rolling stdev over sliding windows of the
+valid distances, run lengths of agreeing candidate states, and the
+walk-through window. Only door transitions and label changes, which are
+rare, are resolved one by one.
+
+The rolling stdev does not depend on the thresholds, so a BatchDetector can
+be built once per trace and run() with many parameter sets:
+
+    batch = BatchDetector(ts, distance, beam)
+    for high in (3.0, 5.0, 8.0):
+        decisions = batch.run(std_dev_high=high)
+
+Timestamps must be float seconds (ts_ns / 1e9, as poll_replay computes them)
+for the decision times to match exactly. numpy is needed here only, not on the Pi.
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from door_detector import (
+    DISTANCE_THRESHOLD_CM, DOOR_STABILITY_COUNT, DOOR_TRANSITION_COOLDOWN_SEC, EVENT_WINDOW_SEC,
+    POST_COOLDOWN_SEC, STATS_WINDOW, STD_DEV_HIGH, Decision,
+)
+from rolling_stats import RESYNC_EVERY, RollingStats
+
+# RollingStats updates its variance incrementally, so its variance can differ from
+# the two-pass one here by rounding accumulated over up to RESYNC_EVERY evictions.
+# Samples whose variance is within that bound of std_dev_high ** 2 are recomputed
+# with RollingStats before comparing, so ties come out as the streaming detector has them.
+VARIANCE_TIE_ULPS = 4 * RESYNC_EVERY
+
+CLOSED, OPEN = 0, 1
+NO_STATE = -1
+
+
+def rolling_stdev(values, window):
+    """Sample stdev of each trailing window of `values` (shorter at the start); 0.0 below 2 samples."""
+    values = np.asarray(values, dtype=float)
+    stdev = np.zeros(len(values))
+    head = min(window - 1, len(values))
+    for index in range(1, head):
+        stdev[index] = values[:index + 1].std(ddof=1)
+    if len(values) >= window and window >= 2:
+        stdev[window - 1:] = sliding_window_view(values, window).std(axis=1, ddof=1)
+    return stdev
+
+
+def run_lengths(states):
+    """For each index, how many samples in a row (ending there) share its state; 0 where NO_STATE."""
+    n = len(states)
+    starts = np.ones(n, dtype=bool)
+    starts[1:] = states[1:] != states[:-1]
+    run_start = np.maximum.accumulate(np.where(starts, np.arange(n), 0))
+    return np.where(states == NO_STATE, 0, np.arange(n) - run_start + 1)
+
+
+def segments(values):
+    """(start, end) index pairs of runs of equal values, end exclusive."""
+    if not len(values):
+        return []
+    bounds = np.flatnonzero(values[1:] != values[:-1]) + 1
+    return list(zip(np.r_[0, bounds].tolist(), np.r_[bounds, len(values)].tolist()))
+
+
+def first_at_or_after(ts, start, end, since, cooldown):
+    """First index in [start, end) with ts - since >= cooldown, or None."""
+    ready = np.flatnonzero(ts[start:end] - since >= cooldown)
+    return start + int(ready[0]) if len(ready) else None
+
+
+class BatchDetector:
+    """One trace's samples plus the threshold-independent rolling stdev; run() any parameters on it."""
+
+    def __init__(self, ts, distance, beam_broken, stats_window=STATS_WINDOW):
+        self.ts = np.asarray(ts, dtype=float)
+        self.distance = np.asarray(distance, dtype=float)
+        self.beam = np.asarray(beam_broken, dtype=bool)
+        if not len(self.ts) == len(self.distance) == len(self.beam):
+            raise ValueError("ts, distance and beam_broken must have the same length")
+        self.stats_window = stats_window
+
+        self.valid = self.distance > 0
+        # Timeouts do not enter the window; every sample sees the stdev after the last valid reading.
+        valid_index = np.flatnonzero(self.valid)
+        valid_stdev = rolling_stdev(self.distance[valid_index], stats_window)
+        seen = np.cumsum(self.valid) - 1
+        self.stdev = np.where(seen >= 0, valid_stdev[np.maximum(seen, 0)] if len(valid_stdev) else 0.0, 0.0)
+        largest = float(np.abs(self.distance[valid_index]).max()) if len(valid_index) else 0.0
+        self.variance_tolerance = VARIANCE_TIE_ULPS * np.finfo(float).eps * largest ** 2
+        self._streaming_stdev = None
+
+    @classmethod
+    def from_events(cls, events, stats_window=STATS_WINDOW):
+        """Samples from (ts_ns, kind, value) trace events, as poll_replay sees them."""
+        ts, distance, beam = [], [], []
+        beam_level = False
+        for ts_ns, kind, value in events:
+            if kind == "beam":
+                beam_level = value
+            elif kind == "distance":
+                ts.append(ts_ns / 1e9)
+                distance.append(value)
+                beam.append(beam_level)
+        return cls(ts, distance, beam, stats_window)
+
+    def __len__(self):
+        return len(self.ts)
+
+    def exact_stdev(self, high):
+        """self.stdev, with the values too close to `high` to call replaced by RollingStats' own."""
+        if high < 0:
+            return self.stdev
+        near = np.abs(self.stdev ** 2 - high ** 2) <= self.variance_tolerance
+        if not near.any():
+            return self.stdev
+        if self._streaming_stdev is None:
+            stats = RollingStats(self.stats_window)
+            streaming = np.empty(len(self))
+            for index, value in enumerate(self.distance.tolist()):
+                if value > 0:
+                    stats.add(value)
+                streaming[index] = stats.stdev
+            self._streaming_stdev = streaming
+        return np.where(near, self._streaming_stdev, self.stdev)
+
+    def door_open(self, distance_threshold_cm=DISTANCE_THRESHOLD_CM, std_dev_high=STD_DEV_HIGH,
+                  stability_count=DOOR_STABILITY_COUNT, transition_cooldown_sec=DOOR_TRANSITION_COOLDOWN_SEC):
+        """Door state after each sample, as a bool array (True = open)."""
+        moving = self.valid & (self.exact_stdev(std_dev_high) >= std_dev_high)
+        states = np.where(moving, np.where(self.distance > distance_threshold_cm, OPEN, CLOSED), NO_STATE)
+        stable = (states != NO_STATE) & (run_lengths(states) >= stability_count)
+
+        changes = np.zeros(len(self), dtype=np.int8)   # +1 opened, -1 closed at that sample
+        door, last_change = CLOSED, float("-inf")
+        for start, end in segments(np.where(stable, states, NO_STATE)):
+            state = int(states[start])
+            if not stable[start] or state == door:
+                continue
+            index = first_at_or_after(self.ts, start, end, last_change, transition_cooldown_sec)
+            if index is not None:
+                door, last_change = state, float(self.ts[index])
+                changes[index] = 1 if state == OPEN else -1
+        return np.cumsum(changes) > 0
+
+    def walk_recent(self, event_window_sec=EVENT_WINDOW_SEC):
+        """What DoorDetector.walk_recent() answers after each sample, as a bool array."""
+        n = len(self)
+        last_broken = np.maximum.accumulate(np.where(self.beam, np.arange(n), -1))
+        since = self.ts - self.ts[np.maximum(last_broken, 0)]
+        # The flag is cleared the first time a clear sample finds the window passed, and stays
+        # cleared until the beam breaks again, even if a later timestamp steps backwards.
+        expired = np.cumsum((last_broken >= 0) & ~self.beam & (since > event_window_sec))
+        return self.beam | ((last_broken >= 0) & (expired == expired[np.maximum(last_broken, 0)]))
+
+    def run(self, distance_threshold_cm=DISTANCE_THRESHOLD_CM, std_dev_high=STD_DEV_HIGH,
+            event_window_sec=EVENT_WINDOW_SEC, post_cooldown_sec=POST_COOLDOWN_SEC,
+            stability_count=DOOR_STABILITY_COUNT, transition_cooldown_sec=DOOR_TRANSITION_COOLDOWN_SEC,
+            stats_window=None, verbose=False):
+        """The Decisions DoorDetector(**params).step() would return over these samples."""
+        if stats_window is not None and stats_window != self.stats_window:
+            raise ValueError(f"built with stats_window={self.stats_window}; make a new BatchDetector")
+        door = self.door_open(distance_threshold_cm, std_dev_high, stability_count, transition_cooldown_sec)
+        walk = self.walk_recent(event_window_sec)
+        labels = door * 2 + walk
+
+        decisions = []
+        last_label, last_post = None, float("-inf")
+        for start, end in segments(labels):
+            label = int(labels[start])
+            if label == last_label:
+                continue
+            index = first_at_or_after(self.ts, start, end, last_post, post_cooldown_sec)
+            if index is not None:
+                last_label, last_post = label, float(self.ts[index])
+                door_open, walk_through = bool(door[index]), bool(walk[index])
+                name = ("open" if door_open else "closed") + ("_walk" if walk_through else "")
+                decisions.append(Decision(last_post, name, door_open, walk_through))
+        return decisions
+
+
+def batch_replay(events, **params):
+    """poll_replay() on arrays: the same Decisions for the same (ts_ns, kind, value) events."""
+    return BatchDetector.from_events(events, params.get("stats_window") or STATS_WINDOW).run(**params)
@@ -2,35 +2,57 @@
 """
 Combine ultrasonic and break beam readings to infer door_opened and walked_through,
 then POST to weatherApp when both are true within a short time window.
+
+The sensors run as event sources on runtime.DoorRuntime and the detection
+logic lives in door_detector.DoorDetector (tuning parameters are there).
+Hardware comes from hal.open_hal(): DOOR_HAL=sim runs without a Pi. Set
+DOOR_TRACE to a file path to record every raw sensor event for replay.py.
+Metrics exporters and the sampling profiler are configured in telemetry.py.
+DOOR_WIRE_FORMAT=msgpack and DOOR_WIRE_CODING=gzip|zstd shrink what goes over
+a metered link (see shared/wire_format.py and bench_wire_format.py).
 """
 
-import statistics
+import os
 import sys
 import time
-from collections import deque
 from pathlib import Path
 
-import adafruit_dht
-import board
 import requests
-import RPi.GPIO as GPIO
+
+from dht_sampler import HumitureSampler
+from door_detector import DoorDetector
+from hal import open_hal
+from outbox import Outbox
+from post_sender import PostSender, make_session
+from ranging import EchoRanger
+from runtime import BeamSource, DoorRuntime, HumitureSource, UltrasonicSource
+from sensor_trace import TraceWriter
+from telemetry import observe_http, queue_depth, start_exporters
+
+# Wire formats shared with weatherApp, from the repo's shared/ folder.
+SHARED_DIR = Path(__file__).resolve().parents[1] / "shared"
+if str(SHARED_DIR) not in sys.path:
+    sys.path.append(str(SHARED_DIR))
+from wire_format import (  # noqa: E402
+    GZIP, IDENTITY, JSON_TYPE, MSGPACK_TYPE, ZSTD, WireError, content_codings, decode, format_reading, msgpack,
+    request_parts,
+)
 
 # GPIO pins (BCM numbering)
 TRIG_PIN = 23
 ECHO_PIN = 24
 BREAKBEAM_PIN = 22
+DHT_PIN = 17
 
-# Tuning parameters
-DISTANCE_THRESHOLD_CM = 35.0          # Distance that separates open/closed state
-STD_DEV_HIGH = 5.0                    # What qualifies as "high" standard deviation
-EVENT_WINDOW_SEC = 5.0                # How long two events can be apart and still count together
-POST_COOLDOWN_SEC = 5.0               # Avoid duplicate posts too quickly
-SAMPLE_DELAY_SEC = 0.1                # Main loop sleep between samples
-DOOR_STABILITY_COUNT = 3              # Number of consistent readings to accept a door state change
-DOOR_TRANSITION_COOLDOWN_SEC = 1.0    # Minimum time between door state changes
-CALENDAR_REFRESH_SEC = 600            # Refresh calendar events every 10 minutes
+CALENDAR_REFRESH_SEC = 60             # Background delta-sync of calendar events every minute
+CALENDAR_IDS = ["primary"]            # Calendars merged into calendarEvents
+TRACE_PATH = os.environ.get("DOOR_TRACE")  # Record raw sensor events here when set
 
 POST_URL = "http://localhost:8000/weather"
+POST_BATCH_URL = "http://localhost:8000/weather/batch"
+CALENDAR_URL = "http://localhost:8000/weather/calendar"
+WIRE_FORMAT = os.environ.get("DOOR_WIRE_FORMAT", "json")      # "msgpack": compact typed bodies
+WIRE_CODING = os.environ.get("DOOR_WIRE_CODING", "identity")  # "gzip" / "zstd" for bodies worth compressing
 POST_PAYLOAD_OPEN_NOT_WALKED = {
     "userId": "subhon",
     "doorStatus": "Open",
@@ -63,15 +85,33 @@ POST_PAYLOAD_CLOSED_WALKED = {
     "humidity": "0",
 }
 
+PAYLOADS_BY_LABEL = {
+    "open": POST_PAYLOAD_OPEN_NOT_WALKED,
+    "open_walk": POST_PAYLOAD_OPEN_WALKED,
+    "closed": POST_PAYLOAD_CLOSED_NOT_WALKED,
+    "closed_walk": POST_PAYLOAD_CLOSED_WALKED,
+}
+
 VSH_URL = "https://www.virtualsmarthome.xyz/url_routine_trigger/activate.php?trigger=110aeef9-cc0b-43af-9ddc-a64dd6a1b79c&token=bcfb8f78-72cd-473f-920e-979a43c66d57&response=html"
 
-dht_device = adafruit_dht.DHT11(board.D17)
-last_temp_f = None
-last_humidity = None
-gcal_module = None
-gcal_service = None
-gcal_events_cache = []
-gcal_last_fetch = 0.0
+hal = open_hal(trig_pin=TRIG_PIN, echo_pin=ECHO_PIN, beam_pin=BREAKBEAM_PIN, dht_pin=DHT_PIN)
+GPIO = hal.gpio
+humiture = HumitureSampler(hal.dht)
+ranger = EchoRanger(GPIO, TRIG_PIN, ECHO_PIN)
+session = make_session()
+wire_type = JSON_TYPE
+if WIRE_FORMAT == "msgpack":
+    if msgpack is not None:
+        wire_type = MSGPACK_TYPE
+    else:
+        print("DOOR_WIRE_FORMAT=msgpack but msgpack is not installed; sending JSON")
+wire_coding = WIRE_CODING
+if wire_coding not in content_codings() + [IDENTITY]:
+    # Checked once here: a coding request_parts() cannot apply would fail every large body.
+    wire_coding = GZIP if wire_coding == ZSTD else IDENTITY
+    print(f"DOOR_WIRE_CODING={WIRE_CODING} is not available here; sending {wire_coding}")
+calendar_refresher = None
+uploaded_calendar = None  # (events, calendarHash) last accepted by the server
 
 
 def setup_gpio():
@@ -80,225 +120,182 @@ def setup_gpio():
     GPIO.setup(ECHO_PIN, GPIO.IN)
     GPIO.setup(BREAKBEAM_PIN, GPIO.IN, pull_up_down=GPIO.PUD_UP)
     GPIO.output(TRIG_PIN, GPIO.LOW)
+    ranger.start()
 
 
 def measure_distance():
     """Return a single distance measurement in cm, or -1 on timeout/error."""
-    GPIO.output(TRIG_PIN, GPIO.LOW)
-    time.sleep(0.00002)  # 20 µs settle
-
-    GPIO.output(TRIG_PIN, GPIO.HIGH)
-    time.sleep(0.00001)  # 10 µs pulse
-    GPIO.output(TRIG_PIN, GPIO.LOW)
-
-    timeout = 0.1
-    start_wait = time.time()
-    while GPIO.input(ECHO_PIN) == GPIO.LOW:
-        if time.time() - start_wait > timeout:
-            return -1
-
-    pulse_start = time.time()
-    start_wait = pulse_start
-    while GPIO.input(ECHO_PIN) == GPIO.HIGH:
-        if time.time() - start_wait > timeout:
-            return -1
+    return ranger.measure()
 
-    pulse_end = time.time()
-    duration = pulse_end - pulse_start
-    distance = (duration * 34300) / 2  # cm
-    return distance
 
-
-def send_post(payload, label, trigger=False):
+def enrich_payload(payload):
+    """Attach the latest DHT readings and calendar; runs on the PostSender worker thread."""
     payload = dict(payload)
-    temp_f = read_temperature_f()
-    humidity = read_humidity()
+    reading = humiture.reading
     calendar_events = get_calendar_events()
-    if temp_f is not None:
-        payload["indoorTemp"] = f"{temp_f:.1f}"
-    if humidity is not None:
-        payload["humidity"] = f"{humidity:.0f}"
+    if reading.temp_f is not None:
+        payload["indoorTemp"] = format_reading(reading.temp_f, 1)
+    if reading.humidity is not None:
+        payload["humidity"] = format_reading(reading.humidity, 0)
     if calendar_events:
-        payload["calendarEvents"] = calendar_events
+        calendar_hash = upload_calendar(payload["userId"], calendar_events)
+        if calendar_hash:
+            payload["calendarHash"] = calendar_hash
+        else:
+            # Upload failed; embedding the list still gets the calendar to the server.
+            payload["calendarEvents"] = calendar_events
+    return payload
+
+
+def upload_calendar(user_id, events):
+    """PUT the calendar only when it changed since the last upload; returns its hash or None."""
+    global uploaded_calendar
+    if uploaded_calendar is not None and uploaded_calendar[0] == events:
+        return uploaded_calendar[1]
+    started = time.perf_counter()
     try:
-        resp = requests.post(POST_URL, json=payload, timeout=5)
-        resp.raise_for_status()
-        print(f"POST ({label}) sent. Response: {resp.status_code} {resp.text}")
+        _, body = send_body("PUT", CALENDAR_URL, {"userId": user_id, "calendarEvents": events}, timeout=5)
+        calendar_hash = body["calendarHash"]
+    except (requests.exceptions.RequestException, WireError, TypeError, KeyError) as exc:
+        observe_http("calendar", started, False)
+        print(f"Failed to upload calendar: {exc}")
+        return None
+    observe_http("calendar", started, True)
+    uploaded_calendar = (list(events), calendar_hash)
+    print(f"Calendar uploaded ({len(events)} events, hash {calendar_hash})")
+    return calendar_hash
+
+
+def send_body(method, url, doc, timeout):
+    """Send `doc` in the configured wire format; returns (response, decoded body or None)."""
+    data, headers = request_parts(doc, wire_type, wire_coding)
+    resp = session.request(method, url, data=data, headers=headers, timeout=timeout)
+    resp.raise_for_status()
+    try:
+        # requests has already undone any gzip/zstd Content-Encoding.
+        return resp, decode(resp.content, resp.headers.get("Content-Type"))
+    except WireError:
+        return resp, None
+
+
+def send_post(payload, label, trigger=False):
+    """POST one door event; runs on the PostSender worker thread."""
+    global uploaded_calendar
+    started = time.perf_counter()
+    try:
+        resp, body = send_body("POST", POST_URL, payload, timeout=5)
+        observe_http("post", started, True)
+        print(f"POST ({label}) sent. Response: {resp.status_code} {body}")
+        if isinstance(body, dict) and body.get("calendarMissing"):
+            # The server does not know our calendar hash; upload it again with the next event.
+            uploaded_calendar = None
         if trigger:
             trigger_alexa_routine()
         return True
-    except requests.exceptions.RequestException as exc:
+    except (requests.exceptions.RequestException, WireError) as exc:
+        observe_http("post", started, False)
         print(f"Failed to send POST ({label}): {exc}")
         return False
 
 
-def read_temperature_f():
-    """Read DHT11 temperature in Fahrenheit; returns last good value on transient errors."""
-    global last_temp_f
-    try:
-        temp_c = dht_device.temperature
-        if temp_c is None:
-            return last_temp_f
-        temp_f = temp_c * (9 / 5) + 32
-        last_temp_f = temp_f
-        return temp_f
-    except RuntimeError as error:
-        print(f"DHT read error: {error}")
-        return last_temp_f
-    except Exception as error:
-        dht_device.exit()
-        raise
-
-
-def read_humidity():
-    """Read DHT11 humidity; returns last good value on transient errors."""
-    global last_humidity
+def send_batch(events):
+    """Replay outbox events in one POST to /weather/batch; returns how many were delivered."""
+    readings = [payload for _, _, _, payload in events]
+    started = time.perf_counter()
     try:
-        humidity = dht_device.humidity
-        if humidity is None:
-            return last_humidity
-        last_humidity = humidity
-        return humidity
-    except RuntimeError as error:
-        print(f"DHT humidity read error: {error}")
-        return last_humidity
-    except Exception as error:
-        dht_device.exit()
-        raise
-
-
-def load_calendar_module():
-    """Load the google_calendar_events helper from the repo; returns module or None."""
-    global gcal_module
-    if gcal_module is not None:
-        return gcal_module
+        _, body = send_body("POST", POST_BATCH_URL, readings, timeout=15)
+        results = body["results"]
+    except (requests.exceptions.RequestException, WireError, TypeError, KeyError) as exc:
+        observe_http("batch", started, False)
+        print(f"Failed to replay {len(events)} event(s): {exc}")
+        return 0
+    observe_http("batch", started, True)
+    for result in sorted(results, key=lambda result: result["index"]):
+        if result.get("status") != "error":
+            continue
+        if result.get("retryable"):
+            # The store failed; keep this reading and everything after it queued, in order.
+            print(f"Server could not store replayed event {events[result['index']][2]}: {result.get('error')}")
+            return result["index"]
+        # Rejected readings will never succeed; drop them rather than block the outbox.
+        print(f"Server rejected replayed event {events[result['index']][2]}: {result.get('error')}")
+    return len(events)
+
+
+def start_calendar_refresher():
+    """Start the background calendar refresher from the repo's google-calendar folder."""
+    global calendar_refresher
     try:
         repo_root = Path(__file__).resolve().parents[1]
         gcal_dir = repo_root / "google-calendar"
         if str(gcal_dir) not in sys.path:
             sys.path.append(str(gcal_dir))
-        import google_calendar_events as gcal
+        from calendar_refresher import CalendarRefresher
 
-        gcal_module = gcal
+        calendar_refresher = CalendarRefresher(CALENDAR_IDS, interval=CALENDAR_REFRESH_SEC)
+        calendar_refresher.start()
     except Exception as exc:
-        print(f"Google Calendar module load failed: {exc}")
-        gcal_module = None
-    return gcal_module
+        print(f"Google Calendar refresher failed to start: {exc}")
+        calendar_refresher = None
 
 
 def get_calendar_events():
-    """Fetch today's events with caching to avoid hammering the API."""
-    global gcal_service, gcal_events_cache, gcal_last_fetch
-    module = load_calendar_module()
-    if module is None:
-        return gcal_events_cache
-
-    now = time.time()
-    try:
-        if gcal_service is None:
-            creds = module.get_credentials()
-            gcal_service = module.build("calendar", "v3", credentials=creds)
-
-        if (now - gcal_last_fetch) >= CALENDAR_REFRESH_SEC:
-            gcal_events_cache = module.get_events_for_today(gcal_service)
-            gcal_last_fetch = now
-    except Exception as exc:
-        print(f"Google Calendar fetch failed: {exc}")
-
-    return gcal_events_cache
+    """Today's events from the refresher's latest snapshot; never waits on Google."""
+    if calendar_refresher is None:
+        return []
+    return calendar_refresher.events()
 
 
 def trigger_alexa_routine():
     """Trigger Alexa routine via Virtual Smart Home URL."""
+    started = time.perf_counter()
     try:
-        resp = requests.get(VSH_URL, timeout=3)
+        resp = session.get(VSH_URL, timeout=3)
         resp.raise_for_status()
+        observe_http("routine", started, True)
         print("Triggered Alexa routine successfully.")
     except Exception as exc:
+        observe_http("routine", started, False)
         print(f"Failed to trigger Alexa routine: {exc}")
 
 
 def main():
+    stop_exporters = start_exporters()
     setup_gpio()
-    distance_history = deque(maxlen=15)
-    stable_door_state = "closed"
-    candidate_state = None
-    candidate_count = 0
-    last_state_change_time = 0.0
-    walked_through = False
-    walked_through_at = 0.0
-    last_post_time = 0.0
-    last_payload_signature = None
+    start_calendar_refresher()
+    outbox = Outbox()
+    sender = PostSender(send_post, outbox, prepare_fn=enrich_payload, replay_fn=send_batch)
+    queue_depth.labels("memory").set_function(lambda: sender.depth)
+    queue_depth.labels("outbox").set_function(lambda: len(outbox))
+    sender.start()
+
+    def on_decision(decision):
+        payload = PAYLOADS_BY_LABEL[decision.label]
+        # ts is the event time, so replayed events land at the right place in server history.
+        sender.submit(dict(payload, ts=runtime.to_epoch(decision.ts)), decision.label, trigger=decision.trigger)
+
+    runtime = DoorRuntime(DoorDetector(verbose=True), on_decision)
+    recorder = TraceWriter(TRACE_PATH) if TRACE_PATH else None
+    emit = recorder.tap(runtime.emit) if recorder else runtime.emit
+    runtime.add_source(UltrasonicSource(ranger, emit))
+    runtime.add_source(BeamSource(GPIO, BREAKBEAM_PIN, emit))
+    runtime.add_source(HumitureSource(humiture, emit))
 
     try:
-        while True:
-            distance = measure_distance()
-            if distance > 0:
-                distance_history.append(distance)
-
-            if len(distance_history) >= 2:
-                std_dev = statistics.stdev(distance_history)
-            else:
-                std_dev = 0.0
-
-            now = time.time()
-
-            new_state = None
-            if std_dev >= STD_DEV_HIGH and distance > 0:
-                new_state = "open" if distance > DISTANCE_THRESHOLD_CM else "closed"
-
-            if new_state:
-                if new_state == candidate_state:
-                    candidate_count += 1
-                else:
-                    candidate_state = new_state
-                    candidate_count = 1
-
-                if (
-                    candidate_count >= DOOR_STABILITY_COUNT
-                    and new_state != stable_door_state
-                    and (now - last_state_change_time) >= DOOR_TRANSITION_COOLDOWN_SEC
-                ):
-                    stable_door_state = new_state
-                    last_state_change_time = now
-                    print(f"Door state stabilized: {stable_door_state} (distance {distance:.2f} cm, std {std_dev:.2f})")
-            else:
-                candidate_state = None
-                candidate_count = 0
-
-            beam_broken = GPIO.input(BREAKBEAM_PIN) == GPIO.LOW
-            if beam_broken:
-                if not walked_through:
-                    print("Beam broken")
-                walked_through = True
-                walked_through_at = now
-            else:
-                if walked_through and (now - walked_through_at) > EVENT_WINDOW_SEC:
-                    walked_through = False
-
-            walk_recent = walked_through and (now - walked_through_at) <= EVENT_WINDOW_SEC
-
-            if stable_door_state == "open":
-                payload = POST_PAYLOAD_OPEN_WALKED if walk_recent else POST_PAYLOAD_OPEN_NOT_WALKED
-                label = "open_walk" if walk_recent else "open"
-            else:
-                payload = POST_PAYLOAD_CLOSED_WALKED if walk_recent else POST_PAYLOAD_CLOSED_NOT_WALKED
-                label = "closed_walk" if walk_recent else "closed"
-
-            payload_signature = (label, payload["doorStatus"], payload["walkThroughStatus"])
-            if (now - last_post_time) >= POST_COOLDOWN_SEC and payload_signature != last_payload_signature:
-                should_trigger = payload["doorStatus"] == "Open" and payload["walkThroughStatus"] == "True"
-                if send_post(payload, label, trigger=should_trigger):
-                    last_post_time = now
-                    last_payload_signature = payload_signature
-
-            time.sleep(SAMPLE_DELAY_SEC)
-
+        runtime.run()
     except KeyboardInterrupt:
         print("\nStopping due to keyboard interrupt.")
     finally:
+        runtime.stop()
+        if recorder is not None:
+            recorder.close()
+            print(f"Recorded {recorder.records} sensor events to {TRACE_PATH}")
+        sender.stop()
+        if calendar_refresher is not None:
+            calendar_refresher.stop()
         GPIO.cleanup()
         print("GPIO cleaned up.")
+        stop_exporters()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Hardware abstraction layer for the door sensors.
+
+open_hal("real") imports RPi.GPIO, board and adafruit_dht only when it is
+called, so code built on the HAL imports cleanly anywhere; open_hal("sim")
+wires MockGPIO to a simulated HC-SR04 and break beam plus a FakeDHT, driven
+with set_distance() / set_beam(). The DOOR_HAL environment variable picks the
+default backend, so `DOOR_HAL=sim python3 door_sync_poster.py` runs off a Pi.
+"""
+
+import os
+import random
+
+DOOR_HAL = os.environ.get("DOOR_HAL", "real")
+DHT_PIN = 17                  # board.D17
+SIM_DISTANCE_NOISE_CM = 0.5   # Gaussian noise on simulated echoes
+
+
+class RealHal:
+    name = "real"
+
+    def __init__(self, dht_pin=DHT_PIN):
+        import RPi.GPIO as GPIO
+
+        self.gpio = GPIO
+        self.dht_pin = dht_pin
+        self._dht = None
+
+    @property
+    def dht(self):
+        """The DHT11, opened on first use so GPIO-only scripts leave the pin alone."""
+        if self._dht is None:
+            import adafruit_dht
+            import board
+
+            self._dht = adafruit_dht.DHT11(getattr(board, f"D{self.dht_pin}"))
+        return self._dht
+
+
+class SimHal:
+    """MockGPIO + FakeDHT; the door distance and beam are set by the caller."""
+
+    name = "sim"
+
+    def __init__(self, trig_pin=23, echo_pin=24, beam_pin=22, distance_cm=20.0, seed=None):
+        from mock_dht import FakeDHT
+        from mock_gpio import MockGPIO
+
+        self.gpio = MockGPIO()
+        self.dht = FakeDHT()
+        self.beam_pin = beam_pin
+        self.distance_cm = distance_cm   # None means no echo (timeout)
+        self._rng = random.Random(seed)
+        self.gpio.attach_echo(trig_pin, echo_pin, self._echo_distance)
+
+    def _echo_distance(self):
+        if self.distance_cm is None:
+            return None
+        return max(self.distance_cm + self._rng.gauss(0, SIM_DISTANCE_NOISE_CM), 2.0)
+
+    def set_distance(self, distance_cm):
+        self.distance_cm = distance_cm
+
+    def set_beam(self, broken):
+        self.gpio.set_input(self.beam_pin, self.gpio.LOW if broken else self.gpio.HIGH)
+
+
+def open_hal(kind=None, trig_pin=23, echo_pin=24, beam_pin=22, dht_pin=DHT_PIN):
+    """Build the backend named by `kind` ("real" or "sim"; default DOOR_HAL)."""
+    kind = kind or DOOR_HAL
+    if kind == "real":
+        return RealHal(dht_pin)
+    if kind == "sim":
+        return SimHal(trig_pin, echo_pin, beam_pin)
+    raise ValueError(f"Unknown HAL backend: {kind}")
@@ -1,11 +1,9 @@
 import time
 
-import board
+from hal import open_hal
 
-import adafruit_dht
-
-# Initial the dht device, with data pin connected to:
-dhtDevice = adafruit_dht.DHT11(board.D17)
+# Initial the dht device, with data pin connected to D17 (DOOR_HAL=sim runs without a Pi):
+dhtDevice = open_hal(dht_pin=17).dht
 
 # you can pass DHT22 use_pulseio=False if you wouldn't like to use pulseio.
 # This may be necessary on a Linux single board computer like the Raspberry Pi,
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+In-process stand-in for an adafruit_dht.DHT11 so the sampler can run off the Pi.
+
+Like the real driver, a property access triggers a measurement unless one was
+taken less than `min_interval` seconds ago, in which case the cached values
+are returned. Measurements fail with RuntimeError at `failure_rate` and come
+back as garbage at `glitch_rate`, which is how a DHT11 on long wires behaves.
+"""
+
+import random
+import time
+
+
+class FakeDHT:
+    def __init__(self, temp_c_fn=lambda t: 21.0, humidity_fn=lambda t: 45.0, failure_rate=0.0,
+                 glitch_rate=0.0, read_delay=0.0, min_interval=2.0, clock=time.monotonic, seed=None):
+        self.temp_c_fn = temp_c_fn
+        self.humidity_fn = humidity_fn
+        self.failure_rate = failure_rate
+        self.glitch_rate = glitch_rate
+        self.read_delay = read_delay          # Seconds a measurement blocks, like the bit-banged read
+        self.min_interval = min_interval
+        self.clock = clock
+        self.measurements = 0
+        self._rng = random.Random(seed)
+        self._last_called = None
+        self._temperature = None
+        self._humidity = None
+
+    def measure(self):
+        now = self.clock()
+        if self._last_called is not None and now - self._last_called < self.min_interval:
+            return
+        self._last_called = now
+        self.measurements += 1
+        if self.read_delay:
+            time.sleep(self.read_delay)
+        roll = self._rng.random()
+        if roll < self.failure_rate:
+            raise RuntimeError("Checksum did not validate. Try again.")
+        # DHT11 resolution is 1 °C / 1 %RH.
+        self._temperature = float(round(self.temp_c_fn(now)))
+        self._humidity = float(round(self.humidity_fn(now)))
+        if roll < self.failure_rate + self.glitch_rate:
+            # Bit errors that slip past the checksum: either out-of-range garbage
+            # or a plausible-looking spike.
+            if self._rng.random() < 0.5:
+                self._temperature = float(self._rng.choice((0, 63, 127, 255)))
+                self._humidity = float(self._rng.choice((0, 1, 99, 255)))
+            else:
+                self._temperature += self._rng.choice((-12, -8, 8, 12))
+                self._humidity += self._rng.choice((-20, -15, 15, 20))
+
+    @property
+    def temperature(self):
+        self.measure()
+        return self._temperature
+
+    @property
+    def humidity(self):
+        self.measure()
+        return self._humidity
+
+    def exit(self):
+        pass
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+In-process stand-in for RPi.GPIO so the sensor code can run off the Pi.
+
+Inputs are driven with set_input(); edge callbacks registered through
+add_event_detect() fire from the thread that changes the level, like the
+RPi.GPIO callback thread does. attach_echo() wires a simulated HC-SR04 to a
+trigger/echo pin pair.
+"""
+
+import threading
+import time
+
+BCM = 11
+BOARD = 10
+OUT = 0
+IN = 1
+LOW = 0
+HIGH = 1
+PUD_OFF = 20
+PUD_DOWN = 21
+PUD_UP = 22
+RISING = 31
+FALLING = 32
+BOTH = 33
+
+ECHO_START_DELAY_SEC = 0.0002   # HC-SR04 sends its burst ~200 µs after the trigger
+
+
+class MockGPIO:
+    """Mimics the module-level RPi.GPIO API on an instance."""
+
+    BCM = BCM
+    BOARD = BOARD
+    OUT = OUT
+    IN = IN
+    LOW = LOW
+    HIGH = HIGH
+    PUD_OFF = PUD_OFF
+    PUD_DOWN = PUD_DOWN
+    PUD_UP = PUD_UP
+    RISING = RISING
+    FALLING = FALLING
+    BOTH = BOTH
+
+    def __init__(self):
+        self.mode = None
+        self._lock = threading.Lock()
+        self._levels = {}
+        self._directions = {}
+        self._detectors = {}
+        self._echoes = {}
+
+    # --- RPi.GPIO surface -------------------------------------------------
+
+    def setmode(self, mode):
+        self.mode = mode
+
+    def setwarnings(self, flag):
+        pass
+
+    def setup(self, pin, direction, pull_up_down=PUD_OFF, initial=LOW):
+        with self._lock:
+            self._directions[pin] = direction
+            if direction == OUT:
+                self._levels[pin] = initial
+            else:
+                self._levels.setdefault(pin, HIGH if pull_up_down == PUD_UP else LOW)
+
+    def input(self, pin):
+        return self._levels.get(pin, LOW)
+
+    def output(self, pin, value):
+        previous = self._set_level(pin, value)
+        echo = self._echoes.get(pin)
+        if echo is not None and previous == HIGH and value == LOW:
+            echo_pin, distance_fn = echo
+            threading.Thread(target=self._play_echo, args=(echo_pin, distance_fn), daemon=True).start()
+
+    def add_event_detect(self, pin, edge, callback=None, bouncetime=None):
+        with self._lock:
+            if pin in self._detectors:
+                raise RuntimeError(f"Conflicting edge detection already enabled for pin {pin}")
+            self._detectors[pin] = (edge, [callback] if callback else [])
+
+    def add_event_callback(self, pin, callback):
+        with self._lock:
+            self._detectors[pin][1].append(callback)
+
+    def remove_event_detect(self, pin):
+        with self._lock:
+            self._detectors.pop(pin, None)
+
+    def cleanup(self, pins=None):
+        with self._lock:
+            if pins is None:
+                self._levels.clear()
+                self._directions.clear()
+                self._detectors.clear()
+                self._echoes.clear()
+            else:
+                for pin in pins if isinstance(pins, (list, tuple)) else [pins]:
+                    self._levels.pop(pin, None)
+                    self._directions.pop(pin, None)
+                    self._detectors.pop(pin, None)
+
+    # --- Simulation helpers ------------------------------------------------
+
+    def set_input(self, pin, value):
+        """Drive an input pin from the outside world, firing edge callbacks."""
+        self._set_level(pin, value)
+
+    def attach_echo(self, trig_pin, echo_pin, distance_fn):
+        """Answer each trigger pulse with an echo for distance_fn() cm (None = no echo)."""
+        self._echoes[trig_pin] = (echo_pin, distance_fn)
+
+    def _set_level(self, pin, value):
+        with self._lock:
+            previous = self._levels.get(pin, LOW)
+            self._levels[pin] = value
+            detector = self._detectors.get(pin)
+        if detector is not None and previous != value:
+            edge, callbacks = detector
+            rising = value == HIGH
+            if edge == BOTH or (edge == RISING and rising) or (edge == FALLING and not rising):
+                for callback in callbacks:
+                    callback(pin)
+        return previous
+
+    def _play_echo(self, echo_pin, distance_fn):
+        distance = distance_fn()
+        if distance is None:
+            return
+        time.sleep(ECHO_START_DELAY_SEC)
+        self._set_level(echo_pin, HIGH)
+        time.sleep((distance * 2) / 34300)
+        self._set_level(echo_pin, LOW)
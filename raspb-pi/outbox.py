@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Durable FIFO outbox for door events that could not be delivered.
+
+Events are appended to a SQLite database in WAL mode with synchronous=FULL, so
+an event that append() returned for survives a crash or power cut. The table
+holds at most `max_events` rows; appending beyond that evicts the oldest.
+Readers peek() a batch in insertion order and ack() it once it is delivered.
+"""
+
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+OUTBOX_PATH = Path(__file__).resolve().with_name("door_outbox.db")
+MAX_EVENTS = 10_000   # ~a few MB with calendar lists attached
+
+
+class Outbox:
+    def __init__(self, path=OUTBOX_PATH, max_events=MAX_EVENTS):
+        self.path = str(path)
+        self.max_events = max_events
+        # Autocommit mode: every statement below is its own durable transaction.
+        self._conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " created_at REAL NOT NULL,"
+            " label TEXT NOT NULL,"
+            " payload TEXT NOT NULL)"
+        )
+        self._count = self._conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def __len__(self):
+        return self._count
+
+    def append(self, payload, label, created_at=None):
+        """Persist one event, evicting the oldest rows if the outbox is full."""
+        created_at = time.time() if created_at is None else created_at
+        with self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute(
+                "INSERT INTO outbox (created_at, label, payload) VALUES (?, ?, ?)",
+                (created_at, label, json.dumps(payload, separators=(",", ":"))),
+            )
+            overflow = self._count + 1 - self.max_events
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM outbox WHERE id IN (SELECT id FROM outbox ORDER BY id LIMIT ?)",
+                    (overflow,),
+                )
+                print(f"Outbox full, evicted {overflow} oldest event(s)")
+        self._count = min(self._count + 1, self.max_events)
+
+    def peek(self, limit):
+        """Return up to `limit` oldest events as (id, created_at, label, payload) tuples."""
+        rows = self._conn.execute(
+            "SELECT id, created_at, label, payload FROM outbox ORDER BY id LIMIT ?", (limit,)
+        ).fetchall()
+        return [(row_id, created_at, label, json.loads(payload)) for row_id, created_at, label, payload in rows]
+
+    def ack(self, last_id):
+        """Drop every event up to and including `last_id` (they were delivered in order)."""
+        with self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            deleted = self._conn.execute("DELETE FROM outbox WHERE id <= ?", (last_id,)).rowcount
+        self._count -= deleted
+        if self._count == 0:
+            self._conn.execute("PRAGMA incremental_vacuum")
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Background sender for door events so the sampling loop never blocks on I/O.
+
+submit() only appends to a bounded in-memory queue; a worker thread does the
+payload enrichment and HTTP calls through a pooled keep-alive requests.Session.
+A newer door state supersedes any older state still waiting in the queue,
+except events that fire the Alexa routine, which are always delivered.
+Undeliverable events are parked in an on-disk outbox (see outbox.py) and
+replayed in order once the server is reachable again.
+"""
+
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from telemetry import send_dropped
+
+MAX_PENDING = 32              # Queue bound; the oldest event is dropped beyond this
+RETRY_BACKOFF_SEC = 1.0       # First wait after a failed send
+RETRY_BACKOFF_MAX_SEC = 60.0  # Cap for the exponential backoff
+REPLAY_BATCH = 50             # Outbox events replayed per attempt
+
+
+def make_session(pool_size=2, retries=3, backoff_factor=0.5):
+    """Keep-alive session that retries connection errors and 5xx with backoff."""
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(500, 502, 503, 504),
+        # The /weather POST and calendar PUT are idempotent upserts, so retrying them is safe.
+        allowed_methods=frozenset({"GET", "POST", "PUT"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class PostSender:
+    """Deliver (payload, label, trigger) events via send_fn on a worker thread.
+
+    prepare_fn(payload) runs on the worker before anything is sent or stored
+    (sensor reads, calendar lookup). send_fn(payload, label, trigger) must
+    return True on success. Events that fail go to the durable `outbox`; while
+    it holds a backlog, new events are appended behind it so delivery stays in
+    order, and the backlog is replayed in batches of `replay_batch` through
+    replay_fn(events), which returns how many leading events were delivered.
+    Failed replays back off exponentially instead of hot-looping. An exception
+    from any of the callbacks is logged and handled like a failed send, so it
+    never ends the worker.
+    """
+
+    def __init__(self, send_fn, outbox, prepare_fn=None, replay_fn=None,
+                 max_pending=MAX_PENDING, replay_batch=REPLAY_BATCH):
+        self.send_fn = send_fn
+        self.outbox = outbox
+        self.prepare_fn = prepare_fn
+        self.replay_fn = replay_fn or self._replay_sequential
+        self.max_pending = max_pending
+        self.replay_batch = replay_batch
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread = None
+        self._backoff = RETRY_BACKOFF_SEC
+        self._retry_at = 0.0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="post-sender", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Stop the worker; events still queued in memory are saved to the outbox."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    @property
+    def depth(self):
+        return len(self._pending)
+
+    def submit(self, payload, label, trigger=False):
+        """Queue an event without blocking; older plain door states are coalesced away."""
+        event = (dict(payload), label, trigger, time.time())
+        with self._cond:
+            superseded = [item for item in self._pending if not item[2]]
+            for item in superseded:
+                self._pending.remove(item)
+            while len(self._pending) >= self.max_pending:
+                dropped = self._pending.popleft()
+                send_dropped.inc()
+                print(f"Send queue full, dropping {dropped[1]} event")
+            self._pending.append(event)
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopping and not self._pending:
+                    if len(self.outbox) and time.monotonic() >= self._retry_at:
+                        break
+                    timeout = max(self._retry_at - time.monotonic(), 0.0) if len(self.outbox) else None
+                    self._cond.wait(timeout)
+                if self._stopping:
+                    pending = list(self._pending)
+                    self._pending.clear()
+                    break
+                event = self._pending.popleft() if self._pending else None
+
+            if event is not None:
+                try:
+                    event = self._prepare(event)
+                    self._deliver(event)
+                except Exception as exc:
+                    self._recover(event, exc)
+            else:
+                try:
+                    self._replay()
+                except Exception as exc:
+                    self._recover(None, exc)
+
+        for event in pending:
+            # Enrich before parking it, or the replay would carry the placeholder readings.
+            try:
+                event = self._prepare(event)
+            except Exception as exc:
+                print(f"Could not prepare {event[1]} event, saving it as queued: {exc!r}")
+            self._store(event)
+
+    def _prepare(self, event):
+        payload, label, trigger, created_at = event
+        if self.prepare_fn is not None:
+            payload = self.prepare_fn(payload)
+        return payload, label, trigger, created_at
+
+    def _store(self, event):
+        payload, label, _, created_at = event
+        self.outbox.append(payload, label, created_at)
+
+    def _deliver(self, event):
+        if len(self.outbox):
+            # Keep FIFO order behind the backlog; a late replay never re-fires the routine.
+            self._store(event)
+            return
+        payload, label, trigger, _ = event
+        if self.send_fn(payload, label, trigger):
+            return
+        self._store(event)
+        self._schedule_retry()
+
+    def _replay(self):
+        batch = self.outbox.peek(self.replay_batch)
+        delivered = self.replay_fn(batch)
+        if delivered:
+            self.outbox.ack(batch[delivered - 1][0])
+            print(f"Replayed {delivered} outbox event(s), {len(self.outbox)} left")
+        if delivered < len(batch):
+            self._schedule_retry()
+        else:
+            self._backoff = RETRY_BACKOFF_SEC
+            self._retry_at = 0.0
+
+    def _recover(self, event, exc):
+        """Keep the only delivery thread alive after an unexpected error: park the event and back off."""
+        print(f"Post sender error: {exc!r}")
+        if event is not None:
+            try:
+                self._store(event)
+            except Exception as store_exc:
+                send_dropped.inc()
+                print(f"Could not save {event[1]} event to the outbox, dropping it: {store_exc!r}")
+        self._schedule_retry()
+
+    def _schedule_retry(self):
+        print(f"Delivery failed, retrying outbox in {self._backoff:.0f}s")
+        self._retry_at = time.monotonic() + self._backoff
+        self._backoff = min(self._backoff * 2, RETRY_BACKOFF_MAX_SEC)
+
+    def _replay_sequential(self, events):
+        delivered = 0
+        for _, _, label, payload in events:
+            if not self.send_fn(payload, label, False):
+                break
+            delivered += 1
+        return delivered
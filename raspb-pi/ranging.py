@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Edge-driven HC-SR04 ranging: the echo pulse is timed from GPIO edge callbacks
+(time.perf_counter_ns timestamps) instead of busy-waiting on the echo pin.
+"""
+
+import threading
+import time
+
+SPEED_OF_SOUND_CM_PER_NS = 34300 / 1e9   # 343 m/s
+ECHO_TIMEOUT_SEC = 0.1                   # Give up on a ping after 100 ms
+
+
+class EchoRanger:
+    """Fire the trigger pin and wait (without spinning) for the echo edges.
+
+    `gpio` is anything with the RPi.GPIO interface, so `mock_gpio.MockGPIO`
+    can be passed in to run the engine off-device.
+    """
+
+    def __init__(self, gpio, trig_pin, echo_pin, timeout=ECHO_TIMEOUT_SEC):
+        self.gpio = gpio
+        self.trig_pin = trig_pin
+        self.echo_pin = echo_pin
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._armed = False
+        self._stale = False
+        self._rise_ns = None
+        self._fall_ns = None
+
+    def start(self):
+        """Register the echo edge callback; call after the pins are set up."""
+        self.gpio.add_event_detect(self.echo_pin, self.gpio.BOTH, callback=self._on_edge)
+
+    def stop(self):
+        self.gpio.remove_event_detect(self.echo_pin)
+
+    def _on_edge(self, channel):
+        now_ns = time.perf_counter_ns()
+        with self._lock:
+            if not self._armed:
+                return
+            # Edges are told apart by order, not by re-reading the pin: on a short
+            # echo the level is often already low again when the callback runs.
+            if self._stale:
+                # The fall of an echo that was still high when we armed.
+                self._stale = False
+                return
+            if self._rise_ns is None:
+                self._rise_ns = now_ns
+                return
+            self._fall_ns = now_ns
+            self._armed = False
+        self._done.set()
+
+    def measure(self):
+        """Return a single distance measurement in cm, or -1 on timeout/error."""
+        with self._lock:
+            self._rise_ns = None
+            self._fall_ns = None
+            self._stale = self.gpio.input(self.echo_pin) == self.gpio.HIGH
+            self._armed = True
+            self._done.clear()
+
+        self.gpio.output(self.trig_pin, self.gpio.LOW)
+        time.sleep(0.00002)  # 20 µs settle
+        self.gpio.output(self.trig_pin, self.gpio.HIGH)
+        time.sleep(0.00001)  # 10 µs pulse
+        self.gpio.output(self.trig_pin, self.gpio.LOW)
+
+        if not self._done.wait(self.timeout):
+            with self._lock:
+                self._armed = False
+            return -1
+
+        duration_ns = self._fall_ns - self._rise_ns
+        return (duration_ns * SPEED_OF_SOUND_CM_PER_NS) / 2  # cm
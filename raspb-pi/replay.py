@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Replay recorded sensor traces through the door detector faster than real time.
+
+Events go through the same DoorRuntime.handle() path as on the Pi, with the
+runtime's deadline wake-ups simulated from trace time, so decisions match what
+the live pipeline would have posted. Parameters can be overridden to see how a
+threshold change would have behaved on captured data:
+
+    python3 replay.py door.trace
+    python3 replay.py door.trace --set std_dev_high=4 --set distance_threshold_cm=30 --diff
+    python3 replay.py door.trace --speed 10     # paced at 10x real time
+"""
+
+import argparse
+import time
+
+from door_detector import DoorDetector
+from runtime import DoorRuntime
+from sensor_trace import read_trace
+
+
+def replay(events, speed=0.0, **params):
+    """Feed (ts_ns, kind, value) events to a fresh DoorDetector; returns the Decisions.
+
+    speed=0 runs as fast as possible; otherwise events are paced at `speed`x real time.
+    """
+    decisions = []
+    runtime = DoorRuntime(DoorDetector(**params), decisions.append)
+    started = time.perf_counter()
+    first_ts = None
+    for ts_ns, kind, value in events:
+        ts = ts_ns / 1e9
+        if speed > 0:
+            if first_ts is None:
+                first_ts = ts
+            delay = (ts - first_ts) / speed - (time.perf_counter() - started)
+            if delay > 0:
+                time.sleep(delay)
+        runtime.advance(ts)
+        runtime.handle(ts_ns, kind, value)
+    return decisions
+
+
+def parse_params(pairs):
+    params = {}
+    for pair in pairs:
+        name, sep, value = pair.partition("=")
+        if not sep:
+            raise argparse.ArgumentTypeError(f"expected name=value, got {pair!r}")
+        params[name] = int(value) if name in ("stability_count", "stats_window") else float(value)
+    return params
+
+
+def print_decisions(decisions, prefix=""):
+    for decision in decisions:
+        print(f"{prefix}{decision.ts:12.3f}  {decision.label}{'  (trigger)' if decision.trigger else ''}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("trace")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE",
+                        help="DoorDetector keyword argument, e.g. std_dev_high=4")
+    parser.add_argument("--diff", action="store_true", help="compare against the default parameters")
+    parser.add_argument("--speed", type=float, default=0.0, help="pace at this multiple of real time (0 = max)")
+    args = parser.parse_args()
+    params = parse_params(args.set)
+
+    events = list(read_trace(args.trace))
+    if not events:
+        print("empty trace")
+        return
+    span = (events[-1][0] - events[0][0]) / 1e9
+
+    start = time.perf_counter()
+    decisions = replay(events, args.speed, **params)
+    elapsed = time.perf_counter() - start
+    print(f"{len(events)} events, {span:.1f} s of data replayed in {elapsed:.3f} s "
+          f"({span / elapsed if elapsed else float('inf'):.0f}x real time)")
+
+    if not args.diff:
+        print_decisions(decisions)
+        return
+
+    baseline = replay(events)
+    base_keys = {(d.label, round(d.ts, 3)) for d in baseline}
+    new_keys = {(d.label, round(d.ts, 3)) for d in decisions}
+    print(f"baseline {len(baseline)} decisions, with {params or 'defaults'} {len(decisions)}")
+    print_decisions([d for d in baseline if (d.label, round(d.ts, 3)) not in new_keys], "- ")
+    print_decisions([d for d in decisions if (d.label, round(d.ts, 3)) not in base_keys], "+ ")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Fixed-window rolling statistics with incremental (Welford-style) updates.
+
+Each add() evicts the oldest sample once the window is full and updates the
+running mean / sum of squared deviations in O(1), so mean, variance and stdev
+can be read every sample without rescanning the window. Min and max come from
+monotonic deques (amortised O(1)); median reads are O(1) off a sorted copy
+that is maintained with bisect.
+"""
+
+import math
+from bisect import bisect_left, insort
+from collections import deque
+
+# Recompute mean/M2 exactly from the window after this many evictions to shed
+# accumulated floating-point drift.
+RESYNC_EVERY = 4096
+
+
+class RollingStats:
+    """Rolling mean/variance/stdev/min/max/median over the last `window` samples."""
+
+    def __init__(self, window):
+        if window < 1:
+            raise ValueError("window must be >= 1")
+        self.window = window
+        self._values = deque()
+        self._sorted = []
+        self._mins = deque()   # (seq, value), values increasing
+        self._maxes = deque()  # (seq, value), values decreasing
+        self._seq = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._evictions = 0
+
+    def __len__(self):
+        return len(self._values)
+
+    def add(self, value):
+        """Append a sample, evicting the oldest one when the window is full."""
+        value = float(value)
+        if len(self._values) == self.window:
+            old = self._values.popleft()
+            del self._sorted[bisect_left(self._sorted, old)]
+            # Combined evict+add keeps n fixed.
+            old_mean = self._mean
+            self._mean += (value - old) / self.window
+            self._m2 += (value - old) * (value - self._mean + old - old_mean)
+            self._evictions += 1
+        else:
+            n = len(self._values) + 1
+            delta = value - self._mean
+            self._mean += delta / n
+            self._m2 += delta * (value - self._mean)
+
+        self._values.append(value)
+        insort(self._sorted, value)
+
+        seq = self._seq
+        self._seq += 1
+        oldest = seq - len(self._values) + 1
+        while self._mins and self._mins[-1][1] >= value:
+            self._mins.pop()
+        self._mins.append((seq, value))
+        while self._mins[0][0] < oldest:
+            self._mins.popleft()
+        while self._maxes and self._maxes[-1][1] <= value:
+            self._maxes.pop()
+        self._maxes.append((seq, value))
+        while self._maxes[0][0] < oldest:
+            self._maxes.popleft()
+
+        if self._evictions >= RESYNC_EVERY:
+            self._resync()
+
+    def clear(self):
+        self.__init__(self.window)
+
+    def _resync(self):
+        n = len(self._values)
+        self._mean = math.fsum(self._values) / n
+        self._m2 = math.fsum((v - self._mean) ** 2 for v in self._values)
+        self._evictions = 0
+
+    @property
+    def mean(self):
+        return self._mean if self._values else 0.0
+
+    @property
+    def variance(self):
+        """Sample variance (n - 1), matching statistics.variance; 0.0 below 2 samples."""
+        n = len(self._values)
+        if n < 2:
+            return 0.0
+        return max(self._m2, 0.0) / (n - 1)
+
+    @property
+    def stdev(self):
+        """Sample standard deviation, matching statistics.stdev; 0.0 below 2 samples."""
+        return math.sqrt(self.variance)
+
+    @property
+    def min(self):
+        return self._mins[0][1] if self._mins else None
+
+    @property
+    def max(self):
+        return self._maxes[0][1] if self._maxes else None
+
+    @property
+    def median(self):
+        n = len(self._sorted)
+        if n == 0:
+            return None
+        mid = n // 2
+        if n % 2:
+            return self._sorted[mid]
+        return (self._sorted[mid - 1] + self._sorted[mid]) / 2
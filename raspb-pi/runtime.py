@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Event-driven sensor runtime for the door pipeline.
+
+Every sensor is a source running on its own schedule and emitting timestamped
+events (ts_ns from time.perf_counter_ns, kind, value) onto one queue. A single
+fusion loop feeds them to a DoorDetector in arrival order and hands each POST
+decision to a callback. Between events the loop sleeps until the detector's
+next deadline (walk-through window expiry, post cooldown), so nothing polls.
+
+- UltrasonicSource pings at FAST_PERIOD_SEC while the door is moving and
+  drops to IDLE_PERIOD_SEC once readings have been still for IDLE_AFTER_SEC;
+  a beam break wakes it straight back up.
+- BeamSource timestamps break-beam edges in the GPIO callback, so breaks far
+  shorter than the old 100 ms poll are seen, with the edge time.
+- HumitureSource forwards each HumitureSampler reading (its own 2 s rate).
+"""
+
+import queue
+import threading
+import time
+
+from telemetry import event_lag, measure_seconds, measure_timeouts, sample_lateness
+
+FAST_PERIOD_SEC = 0.1        # Ultrasonic rate while the door moves (the rate the detector was tuned at)
+IDLE_PERIOD_SEC = 0.5        # Ultrasonic rate once the door has been still for a while
+IDLE_AFTER_SEC = 3.0         # Stillness before dropping to the idle rate
+MOTION_CM = 3.0              # Reading-to-reading change that counts as movement
+PULSE_DEDUPE_NS = 1_000_000  # Second callback of a pulse shorter than callback latency
+MAX_WAIT_SEC = 1.0           # Longest the fusion loop blocks before rechecking stop()
+
+
+class UltrasonicSource:
+    def __init__(self, ranger, emit, fast_period=FAST_PERIOD_SEC, idle_period=IDLE_PERIOD_SEC,
+                 idle_after=IDLE_AFTER_SEC, motion_cm=MOTION_CM):
+        self.ranger = ranger
+        self.emit = emit
+        self.fast_period = fast_period
+        self.idle_period = idle_period
+        self.idle_after = idle_after
+        self.motion_cm = motion_cm
+        self.samples = 0
+        self._active_until = 0.0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._active_until = time.perf_counter() + self.idle_after
+        self._thread = threading.Thread(target=self._run, name="ultrasonic", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def wake(self):
+        """Switch to the fast rate now (e.g. the beam just broke)."""
+        self._active_until = time.perf_counter() + self.idle_after
+        self._wake.set()
+
+    @property
+    def period(self):
+        return self.fast_period if time.perf_counter() < self._active_until else self.idle_period
+
+    def _run(self):
+        last = None
+        scheduled = None
+        while not self._stop.is_set():
+            started_ns = time.perf_counter_ns()
+            if scheduled is not None and started_ns / 1e9 >= scheduled:
+                # Early starts are wake() calls, not jitter.
+                sample_lateness.observe(started_ns / 1e9 - scheduled)
+            distance = self.ranger.measure()
+            measure_seconds.observe((time.perf_counter_ns() - started_ns) / 1e9)
+            if distance < 0:
+                measure_timeouts.inc()
+            self.samples += 1
+            self.emit(started_ns, "distance", distance)
+            if distance > 0:
+                if last is not None and abs(distance - last) >= self.motion_cm:
+                    self._active_until = started_ns / 1e9 + self.idle_after
+                last = distance
+            scheduled = started_ns / 1e9 + self.period
+            self._wake.wait(max(scheduled - time.perf_counter(), 0.0))
+            self._wake.clear()
+
+
+class BeamSource:
+    """Break-beam receiver on an input pin with pull-up: LOW means broken."""
+
+    def __init__(self, gpio, pin, emit):
+        self.gpio = gpio
+        self.pin = pin
+        self.emit = emit
+        self.edges = 0
+        self.short_pulses = 0
+        self._lock = threading.Lock()
+        self._broken = False
+        self._last_pulse_ns = None
+
+    def start(self):
+        self._broken = self.gpio.input(self.pin) == self.gpio.LOW
+        self.emit(time.perf_counter_ns(), "beam", self._broken)
+        self.gpio.add_event_detect(self.pin, self.gpio.BOTH, callback=self._on_edge)
+
+    def stop(self):
+        self.gpio.remove_event_detect(self.pin)
+
+    def _on_edge(self, channel):
+        now_ns = time.perf_counter_ns()
+        broken = self.gpio.input(channel) == self.gpio.LOW
+        with self._lock:
+            self.edges += 1
+            if broken != self._broken:
+                self._broken = broken
+                self.emit(now_ns, "beam", broken)
+                return
+            # The level flipped back before we could read it: a pulse shorter than
+            # the callback latency. Latch it as a break and a clear at this instant,
+            # once per pulse (both of its edges land here).
+            if self._last_pulse_ns is not None and now_ns - self._last_pulse_ns < PULSE_DEDUPE_NS:
+                return
+            self._last_pulse_ns = now_ns
+            self.short_pulses += 1
+            self.emit(now_ns, "beam", not broken)
+            self.emit(now_ns, "beam", broken)
+
+
+class HumitureSource:
+    """Forwards each HumitureSampler reading as a "humiture" event."""
+
+    def __init__(self, sampler, emit):
+        self.sampler = sampler
+        self.emit = emit
+
+    def start(self):
+        self.sampler.listener = lambda reading: self.emit(time.perf_counter_ns(), "humiture", reading)
+        self.sampler.start()
+
+    def stop(self):
+        self.sampler.stop()
+        self.sampler.listener = None
+
+
+class DoorRuntime:
+    def __init__(self, detector, on_decision):
+        self.detector = detector
+        self.on_decision = on_decision
+        self.sources = []
+        self.latest = {}   # kind -> (ts_ns, value) of the newest event
+        self.counts = {}   # kind -> events processed
+        self._events = queue.Queue()
+        self._stop = threading.Event()
+        # perf_counter has no fixed epoch; this maps event times to wall-clock time.
+        self._epoch_offset = time.time() - time.perf_counter()
+
+    def emit(self, ts_ns, kind, value):
+        """Queue one event; safe to call from any source thread or GPIO callback."""
+        self._events.put((ts_ns, kind, value))
+
+    def add_source(self, source):
+        self.sources.append(source)
+        return source
+
+    def to_epoch(self, ts):
+        """Wall-clock seconds for a detector time (perf_counter seconds)."""
+        return ts + self._epoch_offset
+
+    def run(self):
+        """Start every source and process events until stop(); blocks the calling thread."""
+        self._stop.clear()
+        for source in self.sources:
+            source.start()
+        while not self._stop.is_set():
+            deadline = self.detector.next_deadline()
+            timeout = MAX_WAIT_SEC
+            if deadline is not None:
+                # +1 ms so a window that must be strictly exceeded has been.
+                timeout = min(max(deadline - time.perf_counter() + 0.001, 0.0), MAX_WAIT_SEC)
+            try:
+                event = self._events.get(timeout=timeout)
+            except queue.Empty:
+                self._decide(time.perf_counter())
+                continue
+            if event is None:
+                break
+            event_lag.observe((time.perf_counter_ns() - event[0]) / 1e9)
+            self.handle(*event)
+
+    def handle(self, ts_ns, kind, value):
+        """Feed one event to the detector and act on any resulting decision."""
+        self.latest[kind] = (ts_ns, value)
+        self.counts[kind] = self.counts.get(kind, 0) + 1
+        ts = ts_ns / 1e9
+        if kind == "distance":
+            self.detector.on_distance(ts, value)
+        elif kind == "beam":
+            self.detector.on_beam(ts, value)
+            if value:
+                for source in self.sources:
+                    if hasattr(source, "wake"):
+                        source.wake()
+        self._decide(ts)
+
+    def advance(self, until):
+        """Make the timer-driven decide() calls run() would have made up to `until`.
+
+        For replays, which drive time from the trace instead of waiting on it.
+        """
+        deadline = self.detector.next_deadline()
+        while deadline is not None and deadline + 0.001 <= until:
+            self._decide(deadline + 0.001)
+            following = self.detector.next_deadline()
+            if following == deadline:
+                break
+            deadline = following
+
+    def _decide(self, ts):
+        decision = self.detector.decide(ts)
+        if decision is not None:
+            self.on_decision(decision)
+
+    def stop(self):
+        self._stop.set()
+        self._events.put(None)
+        for source in self.sources:
+            try:
+                source.stop()
+            except Exception as exc:
+                print(f"Failed to stop {type(source).__name__}: {exc}")
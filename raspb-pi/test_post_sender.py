@@ -0,0 +1,77 @@
+"""
+Tests for post_sender.PostSender with in-process send functions and a real outbox.
+
+    python3 -m pytest raspb-pi/test_post_sender.py
+"""
+
+import time
+
+from outbox import Outbox
+from post_sender import PostSender
+
+WAIT_SEC = 5.0
+
+
+def wait_for(condition):
+    deadline = time.monotonic() + WAIT_SEC
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def make_sender(tmp_path, send_fn, **kwargs):
+    sender = PostSender(send_fn, Outbox(tmp_path / "outbox.db"), **kwargs)
+    sender._backoff = 0.01   # retry the outbox right away instead of after a second
+    sender.start()
+    return sender
+
+
+def test_prepare_error_does_not_stop_delivery(tmp_path):
+    sent = []
+    prepared = []
+
+    def prepare(payload):
+        prepared.append(payload["doorStatus"])
+        if len(prepared) == 1:
+            raise RuntimeError("sensor read failed")
+        return {**payload, "indoorTemp": "70"}
+
+    sender = make_sender(tmp_path, lambda payload, label, trigger: sent.append(payload) or True, prepare_fn=prepare)
+    sender.submit({"userId": "u", "doorStatus": "Open"}, "open")
+    wait_for(lambda: prepared)
+    sender.submit({"userId": "u", "doorStatus": "Closed"}, "closed")
+    wait_for(lambda: len(sent) == 2)
+    sender.stop()
+
+    # The failed event was parked as queued and replayed ahead of the later one.
+    assert sent == [{"userId": "u", "doorStatus": "Open"},
+                    {"userId": "u", "doorStatus": "Closed", "indoorTemp": "70"}]
+    assert len(sender.outbox) == 0
+
+
+def test_send_and_replay_errors_are_retried(tmp_path):
+    sent = []
+    failures = {"send": 1, "replay": 1}
+
+    def send(payload, label, trigger):
+        if failures["send"]:
+            failures["send"] -= 1
+            raise ValueError("cannot encode")
+        sent.append(label)
+        return True
+
+    def replay(events):
+        if failures["replay"]:
+            failures["replay"] -= 1
+            raise OSError("database is locked")
+        for _, _, label, _ in events:
+            sent.append(label)
+        return len(events)
+
+    sender = make_sender(tmp_path, send, replay_fn=replay)
+    sender.submit({"userId": "u"}, "open")
+    wait_for(lambda: sent == ["open"])
+    sender.submit({"userId": "u"}, "closed")
+    wait_for(lambda: sent == ["open", "closed"])
+    sender.stop()
+    assert len(sender.outbox) == 0
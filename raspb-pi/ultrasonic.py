@@ -1,7 +1,9 @@
-import RPi.GPIO as GPIO
 import time
 import sys
-import statistics
+
+from hal import open_hal
+from ranging import EchoRanger
+from rolling_stats import RollingStats
 
 # Define GPIO pin numbers
 TRIG_PIN = 23  # Corresponds to your Arduino trigPin
@@ -13,8 +15,11 @@ THRESHOLD = 20
 counter = 0
 sum_distance = 0.0
 
-changes = [0]*15
-idx = 0
+# Rolling window over the last 15 good readings (timeouts are not included)
+changes = RollingStats(15)
+
+GPIO = open_hal(trig_pin=TRIG_PIN, echo_pin=ECHO_PIN).gpio  # DOOR_HAL=sim runs without a Pi
+ranger = EchoRanger(GPIO, TRIG_PIN, ECHO_PIN)
 
 def setup():
     """Initializes GPIO and serial communication (equivalent to Arduino setup)."""
@@ -24,57 +29,26 @@ def setup():
     # Set up pins
     GPIO.setup(TRIG_PIN, GPIO.OUT)
     GPIO.setup(ECHO_PIN, GPIO.IN)
+    ranger.start()
 
     # Initial output print (equivalent to Serial.println)
     print("The code started working.")
 
 def measure_distance():
-    """Performs the distance measurement cycle."""
-    # 1. Clear the trigger pin
-    GPIO.output(TRIG_PIN, GPIO.LOW)
-    time.sleep(0.00002)  # 20 µs just to be safe
-
-    # 2. Send the 10 microsecond pulse
-    GPIO.output(TRIG_PIN, GPIO.HIGH)
-    time.sleep(0.00001)  # 10 µs
-    GPIO.output(TRIG_PIN, GPIO.LOW)
-
-    # 3. Wait for ECHO to go HIGH (start time)
-    timeout = 0.1  # 100 ms timeout
-    start_wait = time.time()
-    while GPIO.input(ECHO_PIN) == GPIO.LOW:
-        if time.time() - start_wait > timeout:
-            # print("Timeout waiting for ECHO HIGH")
-            return -1  # error / timeout
-
-    pulse_start = time.time()
-
-    # 4. Wait for ECHO to go LOW (end time)
-    start_wait = time.time()
-    while GPIO.input(ECHO_PIN) == GPIO.HIGH:
-        if time.time() - start_wait > timeout:
-            # print("Timeout waiting for ECHO LOW")
-            return -1
-
-    pulse_end = time.time()
-
-    # 5. Calculate duration and distance
-    duration = pulse_end - pulse_start
-    distance = (duration * 34300) / 2  # cm
-
-    return distance
+    """Performs the distance measurement cycle (edge-timed, no busy-wait)."""
+    return ranger.measure()
 
 
 def loop():
     """The main loop (equivalent to Arduino loop)."""
-    global counter, sum_distance, changes, idx # Declare we're using the global variables
+    global counter, sum_distance # Declare we're using the global variables
 
     # Get the distance
     distance = measure_distance()
-    changes[idx] = distance
-    idx = (idx + 1)%15
+    if distance > 0:
+        changes.add(distance)
 
-    std = statistics.stdev(changes)
+    std = changes.stdev
         
     print("Standard Deviation: ",std)
     # Process and print the result
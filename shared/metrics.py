@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+"""
+Lightweight in-process metrics shared by the server and the Pi agent.
+
+Counters, gauges and fixed-bucket histograms live in a Registry and render
+as Prometheus text (exposition format 0.0.4), so the server can serve them
+on /metrics and the Pi can serve them locally (serve()) or write them for
+node_exporter's textfile collector (FileDumper). Standard library only.
+
+Metrics with labels hand out one child per label-value tuple; resolve the
+child once with .labels(...) outside hot paths and the per-update cost is
+one lock and an add (a histogram adds one bisect).
+
+SamplingProfiler is the opt-in profiler hook: a daemon thread that samples
+the stacks of other threads every few milliseconds and aggregates them into
+collapsed stacks (flamegraph.pl / speedscope input). Nothing is sampled
+unless it is started.
+"""
+
+import bisect
+import math
+import os
+import sys
+import threading
+import time
+from collections import Counter as _Tally
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Seconds; spans sub-millisecond GPIO work up to slow HTTP calls.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Bytes.
+SIZE_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 65536, 262144, 1048576)
+PROFILE_INTERVAL_SEC = 0.01
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{_escape(value)}"' for name, value in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def labels(self, *values, **named):
+        """The child for one label-value tuple, created on first use."""
+        if named:
+            values = tuple(named[name] for name in self.labelnames)
+        values = tuple(str(value) for value in values)
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _default(self):
+        if self.labelnames:
+            raise ValueError(f"{self.name} has labels {self.labelnames}; use .labels(...)")
+        return self._children[()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values, child):
+        return [f"{self.name}{_label_text(self.labelnames, values)} {_format_value(child.value)}"]
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        if amount < 0:
+            raise ValueError("counters only go up")
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    kind = "counter"
+    _new_child = _CounterChild
+
+    def inc(self, amount=1.0):
+        self._default().inc(amount)
+
+
+class _GaugeChild:
+    __slots__ = ("_value", "_lock", "fn")
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+        self.fn = None
+
+    @property
+    def value(self):
+        if self.fn is not None:
+            try:
+                return float(self.fn())
+            except Exception:
+                return math.nan
+        return self._value
+
+    def set(self, value):
+        self._value = float(value)
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1.0):
+        self.inc(-amount)
+
+    def set_function(self, fn):
+        """Read the value from fn() at render time (queue depths, cache sizes)."""
+        self.fn = fn
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+    _new_child = _GaugeChild
+
+    def set(self, value):
+        self._default().set(value)
+
+    def inc(self, amount=1.0):
+        self._default().inc(amount)
+
+    def dec(self, amount=1.0):
+        self._default().dec(amount)
+
+    def set_function(self, fn):
+        self._default().set_function(fn)
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)   # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        """Context manager observing the elapsed perf_counter seconds."""
+        return _Timer(self)
+
+    def quantile(self, q):
+        """Bucket upper bound holding the q-quantile (an estimate, as in Prometheus)."""
+        with self._lock:
+            counts, total = list(self.counts), self.count
+        if not total:
+            return math.nan
+        rank = q * total
+        running = 0
+        for bound, count in zip(self.bounds + (math.inf,), counts):
+            running += count
+            if running >= rank:
+                return bound
+        return math.inf
+
+
+class _Timer:
+    __slots__ = ("child", "start")
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.start)
+        return False
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(float(bound) for bound in buckets if bound != math.inf))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+    def _render_child(self, values, child):
+        with child._lock:
+            counts, total, observed_sum = list(child.counts), child.count, child.sum
+        lines = []
+        running = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            running += count
+            labels = _label_text(self.labelnames, values, (("le", _format_value(bound)),))
+            lines.append(f"{self.name}_bucket{labels} {running}")
+        labels = _label_text(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(observed_sum)}")
+        lines.append(f"{self.name}_count{labels} {total}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, documentation, labelnames, **options):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **options)
+            elif type(metric) is not cls or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"metric {name} already registered as a different {metric.kind}")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self):
+        """All metrics in Prometheus text format."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def serve(registry=REGISTRY, port=9108, host="127.0.0.1", profiler=None):
+    """Serve /metrics (and /profile when a profiler is given) on a daemon thread; returns the server."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split("?", 1)[0]
+            if path == "/metrics":
+                body = registry.render().encode()
+                content_type = CONTENT_TYPE
+            elif path == "/profile" and profiler is not None:
+                body = profiler.collapsed().encode()
+                content_type = "text/plain; charset=utf-8"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+class FileDumper:
+    """Rewrite `path` with the rendered registry every `interval` seconds (atomic rename)."""
+
+    def __init__(self, path, interval=30.0, registry=REGISTRY):
+        self.path = str(path)
+        self.interval = interval
+        self.registry = registry
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="metrics-dump", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.dump()
+
+    def dump(self):
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w") as handle:
+                handle.write(self.registry.render())
+            os.replace(tmp_path, self.path)
+        except OSError as exc:
+            print(f"Failed to write metrics to {self.path}: {exc}")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.dump()
+
+
+class SamplingProfiler:
+    """Sample other threads' stacks every `interval` seconds; aggregate them as collapsed stacks.
+
+    `thread_names` limits sampling to threads with those names (e.g. the
+    sensor loop); by default every thread but the profiler's own is sampled.
+    """
+
+    def __init__(self, interval=PROFILE_INTERVAL_SEC, thread_names=None, max_depth=64):
+        self.interval = interval
+        self.thread_names = set(thread_names) if thread_names else None
+        self.max_depth = max_depth
+        self.samples = 0
+        self._stacks = _Tally()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            # Raw (code, line) tuples only; formatting waits until someone reads the profile.
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                name = names.get(ident, ident)
+                if ident == own or (self.thread_names is not None and name not in self.thread_names):
+                    continue
+                stack = [name]
+                while frame is not None and len(stack) <= self.max_depth:
+                    stack.append((frame.f_code, frame.f_lineno))
+                    frame = frame.f_back
+                with self._lock:
+                    self._stacks[tuple(stack)] += 1
+            self.samples += 1
+
+    @staticmethod
+    def _frame_text(frame):
+        code, line = frame
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{line})"
+
+    def collapsed(self):
+        """One "thread;outer;...;inner count" line per distinct stack."""
+        with self._lock:
+            items = sorted(self._stacks.items(), key=lambda item: -item[1])
+        return "".join(
+            f"{stack[0]};{';'.join(self._frame_text(frame) for frame in reversed(stack[1:]))} {count}\n"
+            for stack, count in items
+        )
+
+    def top(self, limit=15):
+        """(frame, self samples) for the innermost frames seen most often."""
+        leaves = _Tally()
+        with self._lock:
+            for stack, count in self._stacks.items():
+                if len(stack) > 1:
+                    leaves[stack[1]] += count
+        return [(self._frame_text(frame), count) for frame, count in leaves.most_common(limit)]
+
+
+def profiler_from_env(variable, **options):
+    """Start a SamplingProfiler when `variable` is set to a sampling interval in ms; else None."""
+    value = os.environ.get(variable)
+    if not value:
+        return None
+    try:
+        interval = float(value) / 1000
+    except ValueError:
+        interval = PROFILE_INTERVAL_SEC
+    return SamplingProfiler(interval=interval if interval > 0 else PROFILE_INTERVAL_SEC, **options).start()
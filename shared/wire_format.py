@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Wire formats for door readings between the Pi agent and weatherApp.
+
+JSON is the default and the fallback. Clients that have msgpack installed
+can send and ask for the compact form instead (Content-Type / Accept
+`application/msgpack`): short keys and typed values (booleans for the door
+and walk-through flags, tenths as integers for temperature and humidity,
+the calendar hash as 16 raw bytes). Either body can also be gzip- or
+zstd-compressed (Content-Encoding / Accept-Encoding; zstd needs the
+zstandard package). Bodies under MIN_COMPRESS_BYTES are sent uncompressed,
+because a door reading is smaller than the compression framing saves.
+
+The server stores the legacy string values ("Open", "True", "68.5", "68")
+no matter how a reading arrived; normalize_reading() does that conversion
+with format_reading(), which the Pi also uses for its JSON bodies.
+"""
+
+import gzip
+import json
+import zlib
+
+try:
+    import msgpack
+except ImportError:  # JSON only
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # gzip only
+    zstandard = None
+
+JSON_TYPE = "application/json"
+MSGPACK_TYPE = "application/msgpack"
+MSGPACK_TYPES = (MSGPACK_TYPE, "application/x-msgpack", "application/vnd.msgpack")
+GZIP = "gzip"
+ZSTD = "zstd"
+IDENTITY = "identity"
+MIN_COMPRESS_BYTES = 256
+MAX_BODY_BYTES = 8 << 20       # Decompressed size limit, so a tiny body cannot expand without bound
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+# Long field name -> compact key; other keys (status, error, ...) pass through unchanged.
+COMPACT_KEYS = {
+    "userId": "u",
+    "doorStatus": "d",
+    "walkThroughStatus": "w",
+    "indoorTemp": "t",
+    "humidity": "h",
+    "ts": "s",
+    "calendarHash": "c",
+    "calendarEvents": "e",
+}
+LONG_KEYS = {short: name for name, short in COMPACT_KEYS.items()}
+TENTHS_FIELDS = ("indoorTemp", "humidity")
+
+
+class WireError(ValueError):
+    """A body the server cannot decode at all; `status` is the HTTP status to answer with."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def media_types():
+    """Body types this process can produce, in order of preference for a tie."""
+    return [JSON_TYPE, MSGPACK_TYPE] if msgpack is not None else [JSON_TYPE]
+
+
+def content_codings():
+    """Compressed codings this process supports, best first."""
+    return [ZSTD, GZIP] if zstandard is not None else [GZIP]
+
+
+def _flag(value, true_word):
+    if isinstance(value, str):
+        return value.strip().lower() in (true_word, "true", "1", "yes")
+    return bool(value)
+
+
+def _number(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def to_compact(doc):
+    """Short keys and typed values for msgpack; values that do not parse are kept as they are."""
+    compact = {}
+    for name, value in doc.items():
+        if value is not None:
+            if name == "doorStatus":
+                value = _flag(value, "open")
+            elif name == "walkThroughStatus":
+                value = _flag(value, "true")
+            elif name in TENTHS_FIELDS:
+                number = _number(value)
+                value = round(number * 10) if number is not None else value
+            elif name == "calendarHash" and isinstance(value, str):
+                try:
+                    value = bytes.fromhex(value)
+                except ValueError:
+                    pass
+        compact[COMPACT_KEYS.get(name, name)] = value
+    return compact
+
+
+def from_compact(compact):
+    """Inverse of to_compact(): long keys, typed values (bool, float, hex string)."""
+    doc = {}
+    for key, value in compact.items():
+        name = LONG_KEYS.get(key, key)
+        if name in TENTHS_FIELDS and isinstance(value, int) and not isinstance(value, bool):
+            value = value / 10
+        elif name == "calendarHash" and isinstance(value, bytes):
+            value = value.hex()
+        doc[name] = value
+    return doc
+
+
+def format_reading(value, digits):
+    """A temperature or humidity as the server stores it: `digits` decimals, whole values without them."""
+    text = f"{value:.{digits}f}"
+    return text.rstrip("0").rstrip(".") if "." in text else text
+
+
+def normalize_reading(data):
+    """Legacy string values for typed fields, in place: True -> "Open"/"True", 68.5 -> "68.5", 68.0 -> "68"."""
+    if isinstance(data.get("doorStatus"), bool):
+        data["doorStatus"] = "Open" if data["doorStatus"] else "Closed"
+    if isinstance(data.get("walkThroughStatus"), bool):
+        data["walkThroughStatus"] = "True" if data["walkThroughStatus"] else "False"
+    for name, digits in (("indoorTemp", 1), ("humidity", 0)):
+        value = data.get(name)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            data[name] = format_reading(value, digits)
+    if isinstance(data.get("calendarHash"), bytes):
+        data["calendarHash"] = data["calendarHash"].hex()
+    return data
+
+
+def compress(body, coding):
+    if coding == GZIP:
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    if coding == ZSTD and zstandard is not None:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    if coding in (None, "", IDENTITY):
+        return body
+    raise WireError(f"Unsupported content coding: {coding}", 415)
+
+
+def decompress(body, coding, limit=MAX_BODY_BYTES):
+    """Undo a content coding; the limit guards against bodies that expand enormously."""
+    coding = (coding or IDENTITY).strip().lower()
+    if coding == IDENTITY:
+        return body
+    if coding in (GZIP, "x-gzip"):
+        decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            data = decoder.decompress(body, limit + 1)
+        except zlib.error as exc:
+            raise WireError(f"Invalid gzip body: {exc}") from exc
+    elif coding == ZSTD and zstandard is not None:
+        try:
+            data = zstandard.ZstdDecompressor().stream_reader(body, read_across_frames=True).read(limit + 1)
+        except zstandard.ZstdError as exc:
+            raise WireError(f"Invalid zstd body: {exc}") from exc
+    else:
+        raise WireError(f"Unsupported content coding: {coding}", 415)
+    if len(data) > limit:
+        raise WireError(f"Body too large (max {limit} bytes)", 413)
+    return data
+
+
+def is_msgpack(content_type):
+    return (content_type or "").split(";", 1)[0].strip().lower() in MSGPACK_TYPES
+
+
+def encode(doc, content_type=JSON_TYPE, coding=IDENTITY):
+    """Serialize a document (or a list of them), then compress it if it is worth it.
+
+    Returns (body, content coding actually applied).
+    """
+    if is_msgpack(content_type):
+        if msgpack is None:
+            raise WireError("msgpack is not installed", 406)
+        items = [to_compact(item) for item in doc] if isinstance(doc, list) else to_compact(doc)
+        body = msgpack.packb(items, use_bin_type=True)
+    else:
+        body = json.dumps(doc, separators=(",", ":")).encode("utf-8")
+    if coding in (None, IDENTITY) or len(body) < MIN_COMPRESS_BYTES:
+        return body, IDENTITY
+    return compress(body, coding), coding
+
+
+def decode(body, content_type=None, coding=None, limit=MAX_BODY_BYTES):
+    """Parse a request or response body into long-key documents.
+
+    Raises WireError for codings or types this process cannot read; returns
+    None for a body that is not valid JSON / msgpack, as get_json(silent=True) would.
+    """
+    data = decompress(body, coding, limit)
+    if is_msgpack(content_type):
+        if msgpack is None:
+            raise WireError("msgpack is not installed", 415)
+        try:
+            value = msgpack.unpackb(data, raw=False)
+        except (ValueError, TypeError):   # every msgpack unpack error is a ValueError
+            return None
+        if isinstance(value, list):
+            return [from_compact(item) if isinstance(item, dict) else item for item in value]
+        return from_compact(value) if isinstance(value, dict) else value
+    try:
+        return json.loads(data)
+    except ValueError:
+        return None
+
+
+def request_parts(doc, content_type=JSON_TYPE, coding=IDENTITY):
+    """(body, headers) for a client request that also asks for the same format back."""
+    body, applied = encode(doc, content_type, coding)
+    # A server without msgpack answers JSON anyway, so no explicit JSON fallback is needed.
+    headers = {"Content-Type": content_type, "Accept": content_type}
+    if applied != IDENTITY:
+        headers["Content-Encoding"] = applied
+    return body, headers